@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+import serial
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import coalesce
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import models
+from storm32_gimbal_control import simulator
+
+# Burst of pan mode + standby + camera trigger, as sent before a capture
+BURST = [
+    (constants.CMD_SETPANMODE, [models.PanMode.HOLD_HOLD_PAN.value], 6),
+    (constants.CMD_SETSTANDBY, [models.StandBySwitch.OFF.value], 6),
+    (constants.CMD_DOCAMERA, [0x00, models.DoCameraMode.IRSHUTTER.value, 0x00, 0x00, 0x00, 0x00], 6),
+]
+ROUNDS = 300
+
+def sequential(serial_port):
+    core.set_pan_mode(serial_port, models.PanMode.HOLD_HOLD_PAN)
+    core.set_standby(serial_port, models.StandBySwitch.OFF)
+    core.do_camera(serial_port, models.DoCameraMode.IRSHUTTER)
+
+def pipelined(serial_port):
+    coalesce.pipeline(serial_port, BURST)
+
+def measure(name, burst, transfer_latency):
+    with simulator.PtyGimbal(transfer_latency=transfer_latency) as device:
+        serial_port = serial.Serial(device.port, 115200, timeout=0.5)
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            burst(serial_port)
+        elapsed = time.perf_counter() - start
+        serial_port.close()
+    commands = ROUNDS * len(BURST)
+    print(f"{name:<12} latency {transfer_latency * 1000:.1f} ms: {commands / elapsed:8.0f} commands/s, "
+          f"{elapsed / ROUNDS * 1000:6.2f} ms/burst, {device.transfers / ROUNDS:.1f} transfers/burst")
+
+if __name__ == "__main__":
+    for transfer_latency in (0.0, 0.001):
+        measure("sequential", sequential, transfer_latency)
+        measure("pipelined", pipelined, transfer_latency)
@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import link_budget
+
+def parse_mix(text):
+    """Parses "get_data=50,set_angle=100" into a mix dict."""
+    mix = {}
+    for item in text.split(","):
+        name, _, rate = item.partition("=")
+        mix[name.strip()] = float(rate or 1)
+    return mix
+
+def print_costs(mix, baudrate):
+    print(f"{'command':<24} {'request':>8} {'response':>9} {'wire ms':>8}")
+    for name in mix:
+        cost = link_budget.COMMAND_COSTS[name]
+        print(f"{name:<24} {cost.request:>7}B {cost.response:>8}B {cost.wire_time(baudrate) * 1000:8.3f}")
+
+def print_projection(projection):
+    print(f"\nprojection at {projection.baudrate} baud: {projection.rate:.0f} exchanges/s requested, "
+          f"utilization {projection.utilization:.0%}, mean latency {projection.latency() * 1000:.2f} ms")
+    print(f"  saturation {projection.capacity:.0f} exchanges/s: " +
+          ", ".join(f"{name} {rate:.0f}/s" for name, rate in projection.saturation_rates.items()))
+    print(f"  latency knee {projection.knee:.0f} exchanges/s ({projection.knee / projection.capacity:.0%} of saturation)")
+
+def print_sweep(projection, points):
+    print("\nmeasured against a pty paced with the projected wire time: agreement checks host overhead "
+          "and queueing, not the wire model; use a real link for that")
+    print(f"\n{'offered/s':>10} {'achieved/s':>11} {'model ms':>9} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'errors':>7}")
+    for point in points:
+        print(f"{point.offered:10.0f} {point.achieved:11.0f} {projection.latency(point.offered) * 1000:9.2f} "
+              f"{point.mean_latency * 1000:8.2f} {point.percentile(0.5) * 1000:7.2f} "
+              f"{point.percentile(0.95) * 1000:7.2f} {point.percentile(0.99) * 1000:7.2f} {point.errors:7d}")
+
+    knee = link_budget.latency_knee(points)
+    print(f"measured saturation {link_budget.saturation(points):.0f} exchanges/s "
+          f"(projected {projection.capacity:.0f}), latency knee " +
+          ("not reached" if knee is None else f"at {knee.offered:.0f} offered (projected {projection.knee:.0f})"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Project and measure what a command mix needs from the serial link.")
+    parser.add_argument("--mix", default="get_data=50,set_angle=50",
+                        help="Comma separated command=rate pairs, command names as in core")
+    parser.add_argument("--baud", type=int, nargs="+", default=[115200], help="Baud rates to evaluate")
+    parser.add_argument("--turnaround", type=float, default=0.0, help="Seconds the device adds per exchange")
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds measured per offered load")
+    parser.add_argument("--no-measure", action="store_true", help="Only print the projection")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    for baudrate in args.baud:
+        print(f"=== {baudrate} baud ===")
+        print_costs(mix, baudrate)
+        projection = link_budget.project(mix, baudrate, turnaround=args.turnaround)
+        print_projection(projection)
+        if not args.no_measure:
+            points = link_budget.sweep(mix, baudrate, duration=args.duration, turnaround=args.turnaround)
+            print_sweep(projection, points)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from storm32_gimbal_control import export
+from storm32_gimbal_control import orientation
+
+SAMPLES = 1_000_000
+LOOP_SAMPLES = 50_000
+
+def boresight_loop(pitch, roll, yaw):
+    """Per-sample conversion as written by hand in consumers."""
+    result = []
+    for p, r, y in zip(pitch, roll, yaw):
+        p, r, y = math.radians(p), math.radians(r), math.radians(y)
+        cp, sp, cr, sr, cy, sy = math.cos(p), math.sin(p), math.cos(r), math.sin(r), math.cos(y), math.sin(y)
+        matrix = ((cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr),
+                  (sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr),
+                  (-sp, cp * sr, cp * cr))
+        result.append(tuple(row[0] for row in matrix))
+    return result
+
+def main():
+    random = np.random.default_rng(0)
+    records = np.zeros(SAMPLES, dtype=export.CHUNK_DTYPE)
+    records["imu1_pitch"] = random.uniform(-90, 90, SAMPLES)
+    records["imu1_roll"] = random.uniform(-45, 45, SAMPLES)
+    records["imu1_yaw"] = random.uniform(-180, 180, SAMPLES)
+
+    pitch, roll, yaw = (records[name][:LOOP_SAMPLES].tolist() for name in ("imu1_pitch", "imu1_roll", "imu1_yaw"))
+    start = time.perf_counter()
+    boresight_loop(pitch, roll, yaw)
+    loop_rate = LOOP_SAMPLES / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    orientation.boresight(orientation.batch_to_matrix(records))
+    batch_rate = SAMPLES / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    orientation.quaternion_to_euler(orientation.batch_to_quaternion(records))
+    quaternion_rate = SAMPLES / (time.perf_counter() - start)
+
+    rates = random.normal(0, 50, (SAMPLES, 3))
+    times = np.arange(SAMPLES) * 0.002
+    start = time.perf_counter()
+    orientation.integrate_rates(rates, times)
+    integrate_rate = SAMPLES / (time.perf_counter() - start)
+
+    print(f"boresight, Python loop:     {loop_rate / 1e6:6.2f} M samples/s")
+    print(f"boresight, batch:           {batch_rate / 1e6:6.2f} M samples/s ({batch_rate / loop_rate:.0f}x)")
+    print(f"euler -> quat -> euler:      {quaternion_rate / 1e6:6.2f} M samples/s")
+    print(f"integrate_rates:            {integrate_rate / 1e6:6.2f} M samples/s")
+
+if __name__ == "__main__":
+    main()
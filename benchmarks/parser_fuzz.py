@@ -0,0 +1,35 @@
+import argparse
+import itertools
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests")))
+
+import fuzz_harness
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz utils.read_from_serial and report parse throughput.")
+    parser.add_argument("--cases", type=int, default=200000, help="Number of frames per mode")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--mutation-rate", type=float, default=0.7, help="Fraction of damaged frames")
+    args = parser.parse_args()
+
+    failed = False
+    for match_commands, verify_crc in itertools.product((False, True), repeat=2):
+        report = fuzz_harness.run(args.cases, args.seed, args.mutation_rate, verify_crc,
+                                  match_commands=match_commands)
+        rejected = ", ".join(f"{name} {count}" for name, count in report.rejected.most_common())
+        print(f"verify_crc={verify_crc!s:<5} match_commands={match_commands!s:<5}: {report.cases} frames, {report.bytes / 1e6:.1f} MB, "
+              f"{report.throughput:.2f} MB/s, {report.cases / report.seconds:,.0f} frames/s")
+        print(f"  decoded {report.decoded}, rejected {rejected}")
+        print(f"  crashes {len(report.crashes)}, hangs {len(report.hangs)}, "
+              f"mis-decoded {len(report.misdecoded)}, undetected {report.undetected}")
+        for kind, label, detail, data in (report.crashes + report.misdecoded)[:10]:
+            print(f"    {kind}/{label}: {detail} <- {data}")
+        failed |= not report.ok
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
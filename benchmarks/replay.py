@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dataclasses import replace
+from storm32_gimbal_control import core
+from storm32_gimbal_control import replay
+from storm32_gimbal_control import simulator
+from storm32_gimbal_control import stats
+
+def record(path, polls, interval):
+    """Records a polling session with a simulated gimbal, timestamps spread as at interval."""
+    device = simulator.SimulatedGimbal(timeout=0.1)
+    started = time.monotonic()
+    polled = [0]
+    # Shift the recording clock instead of sleeping, so hours of traffic record in seconds
+    clock = lambda: time.monotonic() - started + polled[0] * interval
+    with replay.RecordingTransport(device, path, clock) as port:
+        for index in range(polls):
+            device.data = replace(device.data, imu1_pitch=round((index % 2000) / 100, 2))
+            core.get_data(port, 0)
+            polled[0] += 1
+
+def run(port, polls):
+    aggregator = stats.TelemetryAggregator(fields=("imu1_pitch",))
+    for _ in range(polls):
+        aggregator.update(core.get_data(port, 0, timeout=1.0))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded GETDATA session through the decoders.")
+    parser.add_argument("--polls", type=int, default=50000, help="Polls in the recorded session")
+    parser.add_argument("--interval", type=float, default=0.02, help="Recorded poll interval in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.s32")
+        record(path, args.polls, args.interval)
+        start = time.perf_counter()
+        session = replay.load_session(path)
+        load_seconds = time.perf_counter() - start
+        print(f"session: {len(session.exchanges)} exchanges, {session.duration:.0f} s recorded, "
+              f"{(session.bytes_sent + session.bytes_received) / 1e6:.1f} MB, loaded in {load_seconds:.2f} s")
+
+        modes = [(None, args.polls), (1000.0, args.polls), (1.0, 100)]
+        for speed, polls in modes:
+            port = replay.ReplayTransport(session, speed=speed)
+            run(port, polls)
+            name = "as fast as possible" if speed is None else f"{speed:g}x"
+            print(f"{name:>20}: {polls} polls, {port.stats.throughput:6.2f} MB/s, "
+                  f"{polls / port.stats.elapsed:8.0f} polls/s, {port.stats.speedup:8.1f} s recorded per s")
+
+if __name__ == "__main__":
+    main()
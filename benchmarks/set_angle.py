@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import core
+from storm32_gimbal_control import models
+from storm32_gimbal_control import pointing
+from storm32_gimbal_control import simulator
+
+RATE = 500
+DURATION = 2.0
+ACK = simulator.build_ack()
+
+class AckingPort:
+    """Minimal in-memory port that ACKs every frame, so only host-side CPU is measured."""
+    timeout = 1
+
+    def write(self, data):
+        return len(data)
+
+    def readinto(self, buffer):
+        buffer[:len(ACK)] = ACK
+        return len(ACK)
+
+class SplitAckPort(AckingPort):
+    """Answers read_from_serial's header read and remainder read in turn."""
+    def __init__(self):
+        self._header = True
+
+    def read(self, size=1):
+        chunk = ACK[:3] if self._header else ACK[3:3 + size]
+        self._header = not self._header
+        return chunk
+
+def run(name, send):
+    period = 1.0 / RATE
+    calls = int(RATE * DURATION)
+    cpu = 0.0
+    next_tick = time.perf_counter()
+    late = 0
+    for index in range(calls):
+        angle = (index % 360) - 180.0
+        start = time.process_time()
+        send(angle / 4, 0.0, angle)
+        cpu += time.process_time() - start
+        next_tick += period
+        remaining = next_tick - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        else:
+            late += 1
+    print(f"{name:<16} {cpu / calls * 1e6:7.1f} us CPU/call at {RATE} Hz, {late} late ticks of {calls}")
+    return cpu / calls
+
+def tight(name, send, calls=200000):
+    start = time.perf_counter()
+    for index in range(calls):
+        send(1.5, 0.0, float(index & 0xFF))
+    per_call = (time.perf_counter() - start) / calls
+    print(f"{name:<16} {per_call * 1e6:7.2f} us/call back to back")
+    return per_call
+
+if __name__ == "__main__":
+    flags = models.SetAngleFlags.from_axes(pitch=True, roll=True, yaw=True)
+    core_port = SplitAckPort()
+    handle = pointing.PointingHandle(AckingPort(), flags)
+
+    baseline = tight("core.set_angle", lambda p, r, y: core.set_angle(core_port, p, r, y, flags))
+    fast = tight("PointingHandle", handle.set_angle)
+    print(f"speedup {baseline / fast:.1f}x")
+
+    run("core.set_angle", lambda p, r, y: core.set_angle(core_port, p, r, y, flags))
+    run("PointingHandle", handle.set_angle)
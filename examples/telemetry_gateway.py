@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import gateway
+from storm32_gimbal_control import models
+
+# The gateway owns the port; run it once, e.g.
+#   python -m storm32_gimbal_control.gateway /dev/ttyACM0 /tmp/storm32.sock 127.0.0.1:5760
+# and connect any number of clients like this one.
+
+with gateway.GatewayClient("/tmp/storm32.sock") as client:
+    print(client.send_command(constants.CMD_GETVERSION, [], 11))
+    print(client.send_command(constants.CMD_SETPANMODE, [models.PanMode.HOLD_HOLD_PAN.value], 6))
+
+    while True:
+        received_at, data = client.read_telemetry()
+        print(f"{received_at:.3f} IMU1 Pitch: {data.imu1_pitch} Roll: {data.imu1_roll} Yaw: {data.imu1_yaw}")
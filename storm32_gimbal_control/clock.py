@@ -0,0 +1,149 @@
+from storm32_gimbal_control import core
+from storm32_gimbal_control import models
+from storm32_gimbal_control import transport
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+import time
+
+@dataclass
+class AlignedSample:
+    """A telemetry sample tagged with device and host time."""
+    sample: models.DataStreamResponse
+    device_ticks: int
+    device_time: float
+    host_time: float
+    requested_at: float
+    received_at: float
+
+    @property
+    def latency(self) -> float:
+        """Seconds from the device taking the sample to the host receiving it."""
+        return self.received_at - self.host_time
+
+class TimestampUnwrapper:
+    """
+    Turns the wrapping signed 16-bit device timestamp into a monotonic tick count.
+
+    A step back of less than half a period, also across the wrap point, is jitter:
+    the count stays at its highest value until the timestamp passes it again. A
+    forward step of half a period or more looks the same, so it is only accepted
+    once resync_after advancing samples in a row stayed behind, e.g. after a link
+    outage; resyncs counts these. A gap of a whole period or more is missed without
+    notice.
+    """
+    def __init__(self, bits: int = 16, resync_after: int = 3):
+        """
+        :param bits: Width of the device timestamp.
+        :param resync_after: Advancing samples in a row behind the count that make it jump forward.
+        """
+        self.resync_after = resync_after
+        self.resyncs = 0
+        self._modulus = 1 << bits
+        self._half = self._modulus >> 1
+        self._last = None
+        self._ticks = 0
+        self._behind = None
+        self._behind_count = 0
+
+    def unwrap(self, timestamp: int) -> int:
+        """
+        :param timestamp: Raw timestamp, signed or unsigned.
+        :return: Ticks since the first timestamp seen.
+        """
+        value = timestamp % self._modulus
+        if self._last is not None:
+            delta = (value - self._last) % self._modulus
+            if delta >= self._half:
+                advancing = self._behind is not None and 0 < (value - self._behind) % self._modulus < self._half
+                self._behind_count = self._behind_count + 1 if advancing else 1
+                self._behind = value
+                if self._behind_count < self.resync_after:
+                    # Backwards jitter, not a wrap: keep the high-water mark so forward steps count from it
+                    return self._ticks
+                self.resyncs += 1
+            self._ticks += delta
+        self._behind = None
+        self._behind_count = 0
+        self._last = value
+        return self._ticks
+
+class ClockAligner:
+    """
+    Estimates the mapping from device time to host time.monotonic().
+
+    Each GETDATA exchange brackets the device timestamp between the host request and
+    response times. The midpoint of the exchange is fitted against device time by
+    least squares, using only the exchanges with the shortest round trips in a
+    sliding window because those bound the true time most tightly. The fit gives an
+    offset and a drift. A constant delay inside the device between sampling and
+    answering cannot be told apart from the offset.
+    """
+    def __init__(self, tick_seconds: float = 1e-4, window: int = 256, quantile: float = 0.25):
+        """
+        :param tick_seconds: Duration of one device timestamp tick.
+        :param window: Number of recent exchanges considered.
+        :param quantile: Fraction of the window, by shortest round trip, used for the fit.
+        """
+        self.tick_seconds = tick_seconds
+        self.quantile = quantile
+        self.unwrapper = TimestampUnwrapper()
+        self.offset = None
+        self.drift = 0.0
+        self._observations = deque(maxlen=window)
+
+    def observe(self, sample: models.DataStreamResponse, requested_at: float, received_at: float) -> AlignedSample:
+        """
+        Adds one timed exchange and tags its sample.
+
+        :param sample: DataStreamResponse received.
+        :param requested_at: Host time the request was sent.
+        :param received_at: Host time the response was complete.
+        :return: AlignedSample with the device time mapped onto the host clock.
+        """
+        resyncs = self.unwrapper.resyncs
+        ticks = self.unwrapper.unwrap(sample.timestamp)
+        if self.unwrapper.resyncs != resyncs:
+            # The jump over a gap is a guess, so fit only what comes after it
+            self._observations.clear()
+        device_time = ticks * self.tick_seconds
+        self._observations.append((device_time, (requested_at + received_at) / 2, received_at - requested_at))
+        self._fit()
+
+        return AlignedSample(sample=sample, device_ticks=ticks, device_time=device_time,
+                             host_time=self.to_host(device_time), requested_at=requested_at,
+                             received_at=received_at)
+
+    def to_host(self, device_time: float) -> float:
+        """Maps device time in seconds onto the host monotonic clock."""
+        if self.offset is None:
+            raise ValueError("No exchange observed yet")
+        return self.offset + device_time * (1.0 + self.drift)
+
+    def poll(self, serial_port: transport.Transport, timeout: Optional[float] = None) -> AlignedSample:
+        """
+        Requests one sample with core.get_data and aligns it.
+
+        :param serial_port: Open serial port connection
+        :param timeout: Overall time budget in seconds
+        """
+        requested_at = time.monotonic()
+        sample = core.get_data(serial_port, 0, timeout)
+        return self.observe(sample, requested_at, time.monotonic())
+
+    def _fit(self):
+        observations = sorted(self._observations, key=lambda observation: observation[2])
+        best = observations[:max(2, int(len(observations) * self.quantile))]
+
+        if len(best) < 2:
+            device_time, host_time, _ = best[0]
+            self.offset = host_time - device_time * (1.0 + self.drift)
+            return
+
+        mean_device = sum(o[0] for o in best) / len(best)
+        mean_host = sum(o[1] for o in best) / len(best)
+        spread = sum((o[0] - mean_device) ** 2 for o in best)
+        if spread > 0:
+            slope = sum((o[0] - mean_device) * (o[1] - mean_host) for o in best) / spread
+            self.drift = slope - 1.0
+        self.offset = mean_host - mean_device * (1.0 + self.drift)
@@ -0,0 +1,129 @@
+from storm32_gimbal_control import transport
+from storm32_gimbal_control import utils
+from typing import Optional
+import threading
+import time
+
+class CoalescingWriter(transport.TransportWrapper):
+    """
+    Serial port wrapper that gathers outgoing frames and writes them together.
+
+    Pending bytes are flushed in a single write once max_bytes have accumulated,
+    once the oldest pending frame has waited max_delay seconds, on flush(), or
+    before any read so that a command never waits for its own request. It can be
+    passed to every core.py function in place of the port it wraps.
+    """
+    def __init__(self, serial_port: transport.Transport, max_bytes: int = 512, max_delay: float = 0.002):
+        """
+        :param serial_port: Open serial port connection
+        :param max_bytes: Flush as soon as this many bytes are pending.
+        :param max_delay: Longest time in seconds a frame may sit in the buffer.
+        """
+        super().__init__(serial_port)
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        # queued_writes counts write() calls, one of which may carry a whole burst of frames
+        self.stats = {"queued_writes": 0, "writes": 0, "bytes": 0}
+
+        self._buffer = bytearray()
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._running = True
+        self._timer = threading.Thread(target=self._flush_on_time, name="coalescing-writer", daemon=True)
+        self._timer.start()
+
+    def write(self, data) -> int:
+        """Queues data for the next flush."""
+        with self._condition:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+                self._condition.notify()
+            self._buffer += data
+            self.stats["queued_writes"] += 1
+            if len(self._buffer) >= self.max_bytes:
+                self._flush_locked()
+        return len(data)
+
+    def flush(self):
+        """Writes everything pending in one write."""
+        with self._condition:
+            self._flush_locked()
+
+    def read(self, size: int = 1) -> bytes:
+        self.flush()
+        return self.serial_port.read(size)
+
+    def reset_input_buffer(self):
+        self.flush()
+        utils.resync(self.serial_port)
+
+    def close(self):
+        """Flushes pending frames and stops the flush timer; the wrapped port stays open."""
+        with self._condition:
+            self._flush_locked()
+            self._running = False
+            self._condition.notify()
+        self._timer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        self.serial_port.write(bytes(self._buffer))
+        self.stats["writes"] += 1
+        self.stats["bytes"] += len(self._buffer)
+        self._buffer.clear()
+        self._oldest = None
+
+    def _flush_on_time(self):
+        with self._condition:
+            while self._running:
+                if self._oldest is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._oldest + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                self._flush_locked()
+
+def pipeline(serial_port: transport.Transport, requests: list, timeout: Optional[float] = None,
+             return_exceptions: bool = False) -> list:
+    """
+    Sends a burst of commands in a single write, then reads their responses in order.
+
+    Unlike calling core.py functions one after another, no command waits for the
+    previous ACK before it is sent, so the burst costs one transfer out instead of
+    one per command.
+
+    :param serial_port: Serial port object.
+    :param requests: List of (command, data, expected_length) tuples.
+    :param timeout: Overall time budget in seconds for the whole burst.
+    :param return_exceptions: Return errors in place of results instead of raising the first one.
+    :return: Responses in request order.
+    """
+    frames = bytearray()
+    for command, data, _ in requests:
+        frames += utils.build_frame(command, data)
+
+    utils.logger_serial.info(' '.join(f'{byte:02X}' for byte in frames))
+    serial_port.write(frames)
+    if isinstance(serial_port, CoalescingWriter):
+        serial_port.flush()
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    results = []
+    for command, _, expected_length in requests:
+        try:
+            results.append(utils.read_from_serial(serial_port, expected_length, deadline, command=command))
+        except Exception as error:
+            if not return_exceptions:
+                utils.resync(serial_port)
+                raise
+            results.append(error)
+    return results
@@ -1,55 +1,56 @@
-import serial
+from storm32_gimbal_control import transport
 from storm32_gimbal_control import utils
 from storm32_gimbal_control import constants
 from storm32_gimbal_control import models
 import logging
 import struct
+from typing import Optional
 
 logging.basicConfig(level=logging.INFO)
 
-def get_version(serial_port: serial.Serial) -> models.VersionResponse:
+def get_version(serial_port: transport.Transport, timeout: Optional[float] = None) -> models.VersionResponse:
     """
     Retrieves the firmware version of the Storm32 gimbal controller.
     
     :param serial_port: Open serial port connection
+    :param timeout: Overall time budget in seconds, retries included
     :return: VersionResponse object containing firmware version details
     """
-    utils.send_command(serial_port, constants.CMD_GETVERSION, [])
-    return utils.read_from_serial(serial_port, 11)
+    return utils.transact(serial_port, constants.CMD_GETVERSION, [], 11, models.RETRY_IDEMPOTENT, timeout)
     
-def get_version_str(serial_port: serial.Serial) -> models.VersionStringResponse:
+def get_version_str(serial_port: transport.Transport, timeout: Optional[float] = None) -> models.VersionStringResponse:
     """
     Retrieves the firmware version as a string.
     
     :param serial_port: Open serial port connection
+    :param timeout: Overall time budget in seconds, retries included
     :return: VersionStringResponse object containing firmware version string
     """
-    utils.send_command(serial_port, constants.CMD_GETVERSIONSTR, [])
-    return utils.read_from_serial(serial_port, 5+16*3)
+    return utils.transact(serial_port, constants.CMD_GETVERSIONSTR, [], 5+16*3, models.RETRY_IDEMPOTENT, timeout)
     
-def get_parameter(serial_port: serial.Serial, param_id: int) -> int:
+def get_parameter(serial_port: transport.Transport, param_id: int, timeout: Optional[float] = None) -> int:
     """
     Retrieves the value of a specific parameter from the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param param_id: ID of the parameter to retrieve (0-65535)
+    :param timeout: Overall time budget in seconds, retries included
     :return: Parameter value as an integer
     """
     if not (0 <= param_id <= 65535):
         raise ValueError("Parameter ID must be between 0 and 65535.")
 
     data = [param_id & 0xFF, (param_id >> 8) & 0xFF]
-    utils.send_command(serial_port, constants.CMD_GETPARAMETER, data)
-    
-    return utils.read_from_serial(serial_port, 9)
+    return utils.transact(serial_port, constants.CMD_GETPARAMETER, data, 9, models.RETRY_IDEMPOTENT, timeout)
 
-def set_parameter(serial_port: serial.Serial, param_id: int, param_value: int):
+def set_parameter(serial_port: transport.Transport, param_id: int, param_value: int, timeout: Optional[float] = None):
     """
     Sets a specific parameter value on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param param_id: ID of the parameter to set (0-65535)
     :param param_value: Value to set for the parameter
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not (0 <= param_id <= 65535):
         raise ValueError("Parameter ID must be between 0 and 65535.")
@@ -59,16 +60,15 @@ def set_parameter(serial_port: serial.Serial, param_id: int, param_value: int):
         param_value & 0xFF, (param_value >> 8) & 0xFF
     ]
 
-    utils.send_command(serial_port, constants.CMD_SETPARAMETER, data)
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_SETPARAMETER, data, 6, models.RETRY_UNLESS_ACKED, timeout)
 
-def get_data(serial_port: serial.Serial, type_byte: int):
+def get_data(serial_port: transport.Transport, type_byte: int, timeout: Optional[float] = None):
     """
     Retrieves live data from the gimbal.
     
     :param serial_port: Open serial port connection
     :param type_byte: Type of data to request (Currently only type 0 is supported)
+    :param timeout: Overall time budget in seconds, retries included
     :return: DataStreamResponse object containing live data
     """
     if type_byte != 0:
@@ -76,16 +76,15 @@ def get_data(serial_port: serial.Serial, type_byte: int):
 
     data = [type_byte]
 
-    utils.send_command(serial_port, constants.CMD_GETDATA, data)
-    
-    return utils.read_from_serial(serial_port, 74)
+    return utils.transact(serial_port, constants.CMD_GETDATA, data, 71, models.RETRY_IDEMPOTENT, timeout)
 
-def get_data_fields(serial_port: serial.Serial, bitmask: models.LiveDataFields) -> tuple:
+def get_data_fields(serial_port: transport.Transport, bitmask: models.LiveDataFields, timeout: Optional[float] = None) -> tuple:
     """
     Retrieves live data fields from the gimbal.
     
     :param serial_port: Open serial port connection
     :param bitmask: Bitmask of fields to request (LiveDataFields enum values)
+    :param timeout: Overall time budget in seconds, retries included
     :return: Tuple containing the bitmask and data fields
     """
     if not isinstance(bitmask, models.LiveDataFields):
@@ -93,120 +92,116 @@ def get_data_fields(serial_port: serial.Serial, bitmask: models.LiveDataFields)
     
     data = [bitmask & 0xFF, (bitmask >> 8) & 0xFF]
 
-    utils.send_command(serial_port, constants.CMD_GETDATAFIELDS, data)
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_GETDATAFIELDS, data, 6, models.RETRY_IDEMPOTENT, timeout)
 
-def set_axis(serial_port: serial.Serial, command: int, value: int):
+def set_axis(serial_port: transport.Transport, command: int, value: int, timeout: Optional[float] = None):
     """
     Sets a specific axis value on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param command: Command ID for the axis to set
     :param value: Value to set for the axis
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not (700 <= value <= 2300) and not value == 0:
         raise ValueError("Invalid axis value. Must be 0 to recenter or between 700 and 2300.")
     
     data = [value & 0xFF, (value >> 8) & 0xFF]
 
-    utils.send_command(serial_port, command, data)
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, command, data, 6, models.RETRY_UNLESS_ACKED, timeout)
 
-def set_pitch(serial_port: serial.Serial, value : int):
+def set_pitch(serial_port: transport.Transport, value : int, timeout: Optional[float] = None):
     """
     Sets the pitch value on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param value: Value to set for the pitch axis
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not 700 <= value <= 2300 and not value == 0:
         raise ValueError("Invalid pitch value. Must be 0 to recenter or between 700 and 2300.")
     
-    return set_axis(serial_port, constants.CMD_SETPITCH, value)
+    return set_axis(serial_port, constants.CMD_SETPITCH, value, timeout)
 
-def set_roll(serial_port: serial.Serial, value: int):
+def set_roll(serial_port: transport.Transport, value: int, timeout: Optional[float] = None):
     """
     Sets the roll value on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param value: Value to set for the roll axis
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not 700 <= value <= 2300 and not value == 0:
         raise ValueError("Invalid pitch value. Must be 0 to recenter or between 700 and 2300.")
     
-    return set_axis(serial_port, constants.CMD_SETROLL, value)
+    return set_axis(serial_port, constants.CMD_SETROLL, value, timeout)
 
-def set_yaw(serial_port: serial.Serial, value: int):
+def set_yaw(serial_port: transport.Transport, value: int, timeout: Optional[float] = None):
     """
     Sets the yaw value on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param value: Value to set for the yaw axis
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not 700 <= value <= 2300 and not value == 0:
         raise ValueError("Invalid pitch value. Must be 0 to recenter or between 700 and 2300.")
     
-    return set_axis(serial_port, constants.CMD_SETYAW, value)
+    return set_axis(serial_port, constants.CMD_SETYAW, value, timeout)
 
-def set_pan_mode(serial_port: serial.Serial, pan_mode: models.PanMode):
+def set_pan_mode(serial_port: transport.Transport, pan_mode: models.PanMode, timeout: Optional[float] = None):
     """
     Sets the pan mode on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param pan_mode: PanMode enum value
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not isinstance(pan_mode, models.PanMode):
         raise ValueError("Invalid pan mode. Use PanMode enum values.")
 
-    utils.send_command(serial_port, constants.CMD_SETPANMODE, [pan_mode.value])
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_SETPANMODE, [pan_mode.value], 6, models.RETRY_UNLESS_ACKED, timeout)
 
-def set_standby(serial_port: serial.Serial, standby_switch: models.StandBySwitch):
+def set_standby(serial_port: transport.Transport, standby_switch: models.StandBySwitch, timeout: Optional[float] = None):
     """
     Sets the standby mode on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param standby_switch: StandBySwitch enum value
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not isinstance(standby_switch, models.StandBySwitch):
         raise ValueError("Invalid standby switch. Use StandBySwitch enum values.")
     
-    utils.send_command(serial_port, constants.CMD_SETSTANDBY, [standby_switch.value])
+    return utils.transact(serial_port, constants.CMD_SETSTANDBY, [standby_switch.value], 6, models.RETRY_UNLESS_ACKED, timeout)
     
-    return utils.read_from_serial(serial_port, 6)
-    
-def do_camera(serial_port: serial.Serial, camera_mode: models.DoCameraMode):
+def do_camera(serial_port: transport.Transport, camera_mode: models.DoCameraMode, timeout: Optional[float] = None):
     """
     Sets the camera mode on the gimbal controller.
 
     :param serial_port: Open serial port connection
     :param camera_mode: DoCameraMode enum value
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not isinstance(camera_mode, models.DoCameraMode):
         raise ValueError("Invalid camera mode. Use DoCameraMode enum values.")
     
-    utils.send_command(serial_port, constants.CMD_DOCAMERA, [0x00, camera_mode.value, 0x00, 0x00, 0x00, 0x00])
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_DOCAMERA, [0x00, camera_mode.value, 0x00, 0x00, 0x00, 0x00], 6, models.RETRY_UNLESS_ACKED, timeout)
     
-def set_script_control(serial_port: serial.Serial, script_control_mode: models.ScriptControlMode):
+def set_script_control(serial_port: transport.Transport, script_control_mode: models.ScriptControlMode, timeout: Optional[float] = None):
     """
     Sets the script control mode on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param script_control_mode: ScriptControlMode enum value
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not isinstance(script_control_mode, models.ScriptControlMode):
         raise ValueError("Invalid camera mode. Use DoCameraMode enum values.")
     
-    utils.send_command(serial_port, constants.CMD_SETSCRIPTCONTROL, [0x00, script_control_mode.value, 0x00, 0x00, 0x00, 0x00])
+    return utils.transact(serial_port, constants.CMD_SETSCRIPTCONTROL, [0x00, script_control_mode.value, 0x00, 0x00, 0x00, 0x00], 6, models.RETRY_UNLESS_ACKED, timeout)
     
-    return utils.read_from_serial(serial_port, 6)
-    
-def set_angle(serial_port: serial.Serial, pitch_degree: float, roll_degree: float, yaw_degree: float, flags: models.SetAngleFlags):
+def set_angle(serial_port: transport.Transport, pitch_degree: float, roll_degree: float, yaw_degree: float, flags: models.SetAngleFlags, timeout: Optional[float] = None):
     """
     Sets the pitch, roll, and yaw angles on the gimbal controller.
     
@@ -215,6 +210,7 @@ def set_angle(serial_port: serial.Serial, pitch_degree: float, roll_degree: floa
     :param roll_degree: Roll angle in degrees
     :param yaw_degree: Yaw angle in degrees
     :param flags: SetAngleFlags enum value
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not isinstance(flags, models.SetAngleFlags):
         raise ValueError("Invalid flags. Use SetAngleFlags enum values.")
@@ -223,11 +219,9 @@ def set_angle(serial_port: serial.Serial, pitch_degree: float, roll_degree: floa
     roll_bytes = list(struct.pack('<f', roll_degree))
     yaw_bytes = list(struct.pack('<f', yaw_degree))
     
-    utils.send_command(serial_port, constants.CMD_SETANGLE, pitch_bytes + roll_bytes + yaw_bytes + [flags.value, 0x00])
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_SETANGLE, pitch_bytes + roll_bytes + yaw_bytes + [flags.value, 0x00], 6, models.RETRY_UNLESS_ACKED, timeout)
     
-def set_pitch_roll_yaw(serial_port: serial.Serial, pitch: int, roll: int, yaw: int):
+def set_pitch_roll_yaw(serial_port: transport.Transport, pitch: int, roll: int, yaw: int, timeout: Optional[float] = None):
     """
     Sets the pitch, roll, and yaw values on the gimbal controller.
     
@@ -235,6 +229,7 @@ def set_pitch_roll_yaw(serial_port: serial.Serial, pitch: int, roll: int, yaw: i
     :param pitch: Pitch value (0-2300)
     :param roll: Roll value (0-2300)
     :param yaw: Yaw value (0-2300)
+    :param timeout: Overall time budget in seconds, retries included
     """
     if (pitch != 0) and not (700 <= pitch <= 2300):
         raise ValueError("Pitch value must be between 0 and 2300.")
@@ -249,16 +244,15 @@ def set_pitch_roll_yaw(serial_port: serial.Serial, pitch: int, roll: int, yaw: i
 
     data = pitch_data + roll_data + yaw_data
 
-    utils.send_command(serial_port, constants.CMD_SETPITCHROLLYAW, data)
+    return utils.transact(serial_port, constants.CMD_SETPITCHROLLYAW, data, 6, models.RETRY_UNLESS_ACKED, timeout)
     
-    return utils.read_from_serial(serial_port, 6)
-    
-def set_pwm_out(serial_port: serial.Serial, input: int):
+def set_pwm_out(serial_port: transport.Transport, input: int, timeout: Optional[float] = None):
     """
     Sets the PWM output value on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param input: PWM output value (700-2300)
+    :param timeout: Overall time budget in seconds, retries included
     """
     
     if (input != 0) and not (700 <= input <= 2300):
@@ -266,48 +260,43 @@ def set_pwm_out(serial_port: serial.Serial, input: int):
     
     data = [input & 0xFF, (input >> 8) & 0xFF]
     
-    utils.send_command(serial_port, constants.CMD_SETPWMOUT, data)
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_SETPWMOUT, data, 6, models.RETRY_UNLESS_ACKED, timeout)
     
-def restore_parameter(serial_port: serial.Serial, param: int):
+def restore_parameter(serial_port: transport.Transport, param: int, timeout: Optional[float] = None):
     """
     Restores a specific parameter to its default value.
     
     :param serial_port: Open serial port connection
     :param param: ID of the parameter to restore (0-65535)
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not (0 <= param <= 65535):
         raise ValueError("Parameter ID must be between 0 and 65535.")
     
     data = [param & 0xFF, (param >> 8) & 0xFF]
     
-    utils.send_command(serial_port, constants.CMD_RESTOREPARAMETER, data)
+    return utils.transact(serial_port, constants.CMD_RESTOREPARAMETER, data, 6, models.RETRY_UNLESS_ACKED, timeout)
     
-    return utils.read_from_serial(serial_port, 6)
-    
-def restore_all_parameters(serial_port: serial.Serial):
+def restore_all_parameters(serial_port: transport.Transport, timeout: Optional[float] = None):
     """
     Restores all parameters to their default values.
     
     :param serial_port: Open serial port connection
+    :param timeout: Overall time budget in seconds, retries included
     """
-    utils.send_command(serial_port, constants.CMD_RESTOREALLPARAMETER, [])
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_RESTOREALLPARAMETER, [], 6, models.RETRY_NEVER, timeout)
     
-def active_pan_mode_setting(serial_port: serial.Serial, pan_mode_setting: models.PanModeSetting):
+def active_pan_mode_setting(serial_port: transport.Transport, pan_mode_setting: models.PanModeSetting, timeout: Optional[float] = None):
     """
     Sets the active pan mode setting on the gimbal controller.
     
     :param serial_port: Open serial port connection
     :param pan_mode_setting: PanModeSetting enum value
+    :param timeout: Overall time budget in seconds, retries included
     """
     if not isinstance(pan_mode_setting, models.PanModeSetting):
         raise ValueError("Invalid pan mode setting. Use PanModeSetting enum values.")
     
     data = [pan_mode_setting.value & 0xFF, (pan_mode_setting.value >> 8) & 0xFF]
     
-    utils.send_command(serial_port, constants.CMD_ACTIVEPANMODESETTING, data)
-    
-    return utils.read_from_serial(serial_port, 6)
+    return utils.transact(serial_port, constants.CMD_ACTIVEPANMODESETTING, data, 6, models.RETRY_UNLESS_ACKED, timeout)
@@ -0,0 +1,239 @@
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import transport
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+import hashlib
+import json
+import logging
+import os
+
+logger_profile = logging.getLogger("LoggerProfile")
+
+NOT_SUPPORTED = 3
+
+# Commands whose payload is only a setpoint, so a refusal holds for every payload.
+# Any other command with a payload (a GETDATAFIELDS mask, a DOCAMERA mode, a
+# parameter ID) is only gated for the payload the gimbal refused.
+SETPOINT_COMMANDS = frozenset((constants.CMD_SETPITCH, constants.CMD_SETROLL, constants.CMD_SETYAW,
+                               constants.CMD_SETANGLE, constants.CMD_SETPITCHROLLYAW, constants.CMD_SETPWMOUT))
+
+def unsupported_key(command: int, payload: bytes = b"") -> tuple:
+    """Entry of DeviceProfile.unsupported_commands for a refused command: (command, payload or None)."""
+    if not payload or command in SETPOINT_COMMANDS:
+        return command, None
+    return command, bytes(payload)
+
+@dataclass
+class DeviceProfile:
+    """What the host knows about one gimbal firmware and board."""
+    version: models.VersionResponse
+    version_str: models.VersionStringResponse
+    parameters: dict = field(default_factory=dict)
+    # unsupported_key() tuples; a None payload means the whole command is refused
+    unsupported_commands: set = field(default_factory=set)
+    from_cache: bool = False
+
+    @property
+    def key(self) -> str:
+        """Cache key built from the board, name and version strings and board capabilities."""
+        return (f"{self.version_str.board}|{self.version_str.name}|{self.version_str.version}|"
+                f"{self.version.firmware_version}|{self.version.setup_layout_version}|"
+                f"{self.version.board_capabilities:#06x}")
+
+    @property
+    def parameter_hash(self) -> str:
+        """Digest of the parameter table, guarding the cache file against corruption."""
+        table = ",".join(f"{param_id}={value}" for param_id, value in sorted(self.parameters.items()))
+        return hashlib.sha1(table.encode("ascii")).hexdigest()
+
+    def supports(self, command: int, payload: bytes = b"") -> bool:
+        """Whether the command, with this payload, is not known to be refused by this device."""
+        return ((command, None) not in self.unsupported_commands and
+                (command, bytes(payload)) not in self.unsupported_commands)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": asdict(self.version),
+            "version_str": asdict(self.version_str),
+            "parameters": {str(param_id): value for param_id, value in self.parameters.items()},
+            "parameter_hash": self.parameter_hash,
+            "unsupported_commands": [[command, None if payload is None else payload.hex()] for command, payload
+                                     in sorted(self.unsupported_commands, key=lambda entry: (entry[0], entry[1] or b""))],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DeviceProfile":
+        profile = cls(
+            version=models.VersionResponse(**data["version"]),
+            version_str=models.VersionStringResponse(**data["version_str"]),
+            parameters={int(param_id): value for param_id, value in data["parameters"].items()},
+            # Bare command IDs of older caches may stand for one refused payload; they are relearned
+            unsupported_commands={(command, None if payload is None else bytes.fromhex(payload))
+                                  for command, payload in (entry for entry in data["unsupported_commands"]
+                                                           if isinstance(entry, list))},
+            from_cache=True,
+        )
+        if profile.parameter_hash != data["parameter_hash"]:
+            raise ValueError("Parameter table does not match its hash")
+        return profile
+
+class ProfileCache:
+    """
+    JSON file of DeviceProfiles, keyed by DeviceProfile.key.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> dict:
+        """Returns all cached profiles, an empty dict if the file is missing or unreadable."""
+        try:
+            with open(self.path) as cache_file:
+                entries = json.load(cache_file)["profiles"]
+            return {key: DeviceProfile.from_dict(entry) for key, entry in entries.items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError, TypeError) as error:
+            logger_profile.warning(f"Ignoring unreadable profile cache {self.path}: {error}")
+            return {}
+
+    def find(self, version: models.VersionResponse, version_str: models.VersionStringResponse) -> Optional[DeviceProfile]:
+        """Returns the cached profile matching a GETVERSION and a GETVERSIONSTR response, if any."""
+        for profile in self.load().values():
+            if profile.version == version and profile.version_str == version_str:
+                return profile
+        return None
+
+    def save(self, profile: DeviceProfile):
+        """Adds or replaces a profile, writing the file atomically."""
+        profiles = self.load()
+        profiles[profile.key] = profile
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", "w") as cache_file:
+            json.dump({"profiles": {key: entry.to_dict() for key, entry in profiles.items()}}, cache_file, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+def connect(serial_port: transport.Transport, cache_path: str, parameter_ids: tuple = (),
+            timeout: Optional[float] = None, refresh: bool = False) -> DeviceProfile:
+    """
+    Identifies the gimbal, reusing a cached profile when nothing has changed.
+
+    GETVERSION and GETVERSIONSTR are always exchanged. If the cache holds a profile
+    with the same versions, board capabilities, board and name, and it covers every
+    requested parameter, that profile is returned as is. Otherwise one GETPARAMETER
+    per ID is read and the result is cached.
+
+    Parameter writes made through GatedPort drop the values they change from the
+    cache. Writes made any other way, e.g. by another tool, cannot be seen; pass
+    refresh to read the parameters again.
+
+    :param serial_port: Open serial port connection
+    :param cache_path: Path of the profile cache file
+    :param parameter_ids: Parameters to read and keep in the profile
+    :param timeout: Overall time budget per exchange
+    :param refresh: Read the parameters even if the cache holds them, and forget
+                    which commands the gimbal refused
+    :return: DeviceProfile, with from_cache telling which path was taken
+    """
+    cache = ProfileCache(cache_path)
+    version = core.get_version(serial_port, timeout)
+    version_str = core.get_version_str(serial_port, timeout)
+
+    cached = cache.find(version, version_str)
+    if cached is not None and not refresh and set(parameter_ids) <= cached.parameters.keys():
+        logger_profile.info(f"Using cached profile {cached.key}")
+        return cached
+
+    profile = DeviceProfile(version=version, version_str=version_str)
+    if cached is not None and not refresh:
+        profile.unsupported_commands = set(cached.unsupported_commands)
+    for param_id in parameter_ids:
+        profile.parameters[param_id] = core.get_parameter(serial_port, param_id, timeout)
+
+    cache.save(profile)
+    logger_profile.info(f"Cached new profile {profile.key}")
+    return profile
+
+class GatedPort(transport.TransportWrapper):
+    """
+    Serial port wrapper that refuses commands the device profile marks unsupported.
+
+    Refused commands raise the same AckError the gimbal would send, without a round
+    trip. Commands are marked unsupported when call() sees the gimbal answer
+    SERIALRCCMD_ACK_ERR_NOT_SUPPORTED, and the cache is updated so later sessions
+    gate them from the start. Only setpoint and payload-less commands are gated as
+    a whole, any other only with the payload that was refused; forget_unsupported()
+    lifts the gate, e.g. after a firmware setting changed.
+
+    SETPARAMETER, RESTOREPARAMETER and RESTOREALLPARAMETER sent through the port
+    drop the values they change from the profile and the cache, so the next
+    connect() reads them from the gimbal again.
+    """
+    def __init__(self, serial_port: transport.Transport, profile: DeviceProfile, cache_path: Optional[str] = None):
+        """
+        :param serial_port: Open serial port connection
+        :param profile: Profile returned by connect()
+        :param cache_path: Cache file to update when a command is found unsupported
+        """
+        super().__init__(serial_port)
+        self.profile = profile
+        self.cache_path = cache_path
+        self._last_command = None
+
+    def write(self, data) -> int:
+        frames = list(transport.split_frames(bytearray(data)))
+        for command, payload in frames:
+            if not self.profile.supports(command, payload):
+                self._last_command = unsupported_key(command, payload)
+                raise exceptions.AckError(constants.ACK_CODES[NOT_SUPPORTED], NOT_SUPPORTED)
+        for command, payload in frames:
+            self._last_command = unsupported_key(command, payload)
+            self._forget_parameters(command, payload)
+        return self.serial_port.write(data)
+
+    def _forget_parameters(self, command: int, payload: bytes):
+        """Drops parameter values a command is about to change, whether or not the gimbal accepts it."""
+        parameters = self.profile.parameters
+        if command in (constants.CMD_SETPARAMETER, constants.CMD_RESTOREPARAMETER) and len(payload) >= 2:
+            changed = parameters.pop(payload[0] | (payload[1] << 8), None) is not None
+        elif command == constants.CMD_RESTOREALLPARAMETER:
+            changed = bool(parameters)
+            parameters.clear()
+        else:
+            return
+        if changed:
+            self._save()
+
+    def call(self, function: Callable, *args, **kwargs):
+        """
+        Runs a core.py command through this port and learns from a NOT_SUPPORTED answer.
+
+        :param function: core.py function, called as function(self, *args, **kwargs)
+        """
+        try:
+            return function(self, *args, **kwargs)
+        except exceptions.AckError as error:
+            if error.code == NOT_SUPPORTED and self._last_command is not None and \
+                    self._last_command not in self.profile.unsupported_commands:
+                self.profile.unsupported_commands.add(self._last_command)
+                self._save()
+            raise
+
+    def forget_unsupported(self, command: Optional[int] = None):
+        """
+        Lets refused commands through again, in this profile and the cache.
+
+        :param command: Command ID to lift the gate of, None for all commands
+        """
+        unsupported = self.profile.unsupported_commands
+        forgotten = {entry for entry in unsupported if command is None or entry[0] == command}
+        if forgotten:
+            unsupported -= forgotten
+            self._save()
+
+    def _save(self):
+        if self.cache_path is not None:
+            ProfileCache(self.cache_path).save(self.profile)
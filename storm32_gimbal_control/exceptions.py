@@ -7,5 +7,15 @@ class CRCMismatchException(Exception):
 class AckError(Exception):
     """
     Exception raised when an ACK response indicates an error.
+
+    :ivar code: Raw ACK code received from the gimbal, if known.
+    """
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code
+
+class DeadlineExceeded(TimeoutError):
     """
-    pass
\ No newline at end of file
+    Exception raised when a command does not complete before its deadline.
+    """
+    pass
@@ -0,0 +1,183 @@
+from storm32_gimbal_control import models
+from typing import Optional
+import json
+import numpy as np
+import os
+import re
+import time
+
+# Column name, index into the 32 int16 values of the data stream and the divisor applied
+# by DataStreamResponse.from_data_stream (None keeps the raw integer)
+DATA_STREAM_COLUMNS = [
+    ("state", 0, None), ("status", 1, None), ("status2", 2, None), ("i2c_errors", 3, None),
+    ("lipo_voltage", 4, None), ("timestamp", 5, None), ("cycle_time", 6, None),
+    ("imu1_gyro_x", 7, None), ("imu1_gyro_y", 8, None), ("imu1_gyro_z", 9, None),
+    ("imu1_acc_x", 10, None), ("imu1_acc_y", 11, None), ("imu1_acc_z", 12, None),
+    ("imu1_rotation_x", 13, None), ("imu1_rotation_y", 14, None), ("imu1_rotation_z", 15, None),
+    ("imu1_pitch", 16, 100.0), ("imu1_roll", 17, 100.0), ("imu1_yaw", 18, 100.0),
+    ("pid_pitch", 19, 100.0), ("pid_roll", 20, 100.0), ("pid_yaw", 21, 100.0),
+    ("input_pitch", 22, None), ("input_roll", 23, None), ("input_yaw", 24, None),
+    ("imu2_pitch", 25, 100.0), ("imu2_roll", 26, 100.0), ("imu2_yaw", 27, 100.0),
+    ("mag_yaw", 28, 100.0), ("mag_pitch", 29, 100.0),
+    ("imu_acc_confidence", 30, 10000.0), ("extra_function_input", 31, None),
+]
+
+CHUNK_DTYPE = np.dtype([("received_at", "<f8")] + [
+    (name, "<i2" if scale is None else "<f4") for name, _, scale in DATA_STREAM_COLUMNS
+])
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = 1
+CHUNK_NAME = re.compile(r"chunk_(\d+)\.npy")
+
+class ColumnarExporter:
+    """
+    Streams telemetry into fixed-size chunk files of columnar data.
+
+    Each chunk is a structured .npy array with one field per column, so it can be
+    opened with np.load(path, mmap_mode='r') and sliced by column without decoding.
+    Only one chunk is held in memory. manifest.json lists the chunks written so far
+    and is replaced atomically, so a session interrupted mid-flight stays readable.
+
+    A directory that already holds an export is refused unless append is set, in
+    which case the new chunks are added to it, numbered after every chunk file
+    already there. Appending needs the chunk size and column layout of the export.
+    """
+    def __init__(self, directory: str, chunk_size: int = 4096, append: bool = False):
+        """
+        :param directory: Output directory, created if missing.
+        :param chunk_size: Number of samples per chunk file.
+        :param append: Continue an existing export in directory instead of refusing it.
+        """
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be at least 1.")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.rows = 0
+
+        # Chunk files missing from the manifest, e.g. after a crash, must not be overwritten either
+        numbers = [int(match.group(1)) for match in map(CHUNK_NAME.fullmatch, os.listdir(directory)) if match]
+        has_manifest = os.path.exists(os.path.join(directory, MANIFEST_NAME))
+        if (numbers or has_manifest) and not append:
+            raise FileExistsError(f"{directory} already holds an export, pass append=True to continue it")
+        if has_manifest:
+            manifest = read_manifest(directory)
+            if manifest["chunk_size"] != chunk_size:
+                raise ValueError(f"{directory} holds chunks of {manifest['chunk_size']} samples, not {chunk_size}")
+            if np.dtype([tuple(column) for column in manifest["dtype"]]) != CHUNK_DTYPE:
+                raise ValueError(f"{directory} holds an export with other columns")
+            self.chunks = manifest["chunks"]
+            self.rows = manifest["rows"]
+        self._next_chunk = max(numbers, default=-1) + 1
+
+        self._raw = np.empty((chunk_size, 32), dtype="<i2")
+        self._received_at = np.empty(chunk_size, dtype="<f8")
+        self._raw_bytes = memoryview(self._raw).cast("B")
+        self._fill = 0
+
+    def append(self, sample: models.DataStreamResponse, received_at: Optional[float] = None):
+        """
+        Appends a decoded sample.
+
+        :param sample: DataStreamResponse to export.
+        :param received_at: Host receive time, defaults to now.
+        """
+        self.append_raw(sample.to_data_stream(), time.monotonic() if received_at is None else received_at)
+
+    def append_raw(self, data_stream: bytes, received_at: float):
+        """
+        Appends a raw 64-byte data stream without decoding it.
+
+        :param data_stream: Data stream as received in a GETDATA response.
+        :param received_at: Host receive time.
+        """
+        offset = self._fill * 64
+        self._raw_bytes[offset:offset + 64] = data_stream
+        self._received_at[self._fill] = received_at
+        self._fill += 1
+        if self._fill == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the samples collected so far as a chunk, even if it is not full."""
+        if not self._fill:
+            return
+
+        rows = self._fill
+        chunk = np.empty(rows, dtype=CHUNK_DTYPE)
+        chunk["received_at"] = self._received_at[:rows]
+        raw = self._raw[:rows]
+        for name, index, scale in DATA_STREAM_COLUMNS:
+            chunk[name] = raw[:, index] if scale is None else raw[:, index] / np.float32(scale)
+
+        file_name = f"chunk_{self._next_chunk:06d}.npy"
+        np.save(os.path.join(self.directory, file_name), chunk)
+        self._next_chunk += 1
+
+        self.chunks.append({
+            "file": file_name,
+            "rows": rows,
+            "first_received_at": float(chunk["received_at"][0]),
+            "last_received_at": float(chunk["received_at"][-1]),
+        })
+        self.rows += rows
+        self._fill = 0
+        self._write_manifest()
+
+    def close(self):
+        """Writes the final partial chunk."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_manifest(self):
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "chunk_size": self.chunk_size,
+            "rows": self.rows,
+            "columns": list(CHUNK_DTYPE.names),
+            "dtype": CHUNK_DTYPE.descr,
+            "chunks": self.chunks,
+        }
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with open(path + ".tmp", "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=1)
+        os.replace(path + ".tmp", path)
+
+def read_manifest(directory: str) -> dict:
+    """Loads the manifest of an export directory."""
+    with open(os.path.join(directory, MANIFEST_NAME)) as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise ValueError(f"Unsupported export format in {directory}")
+    return manifest
+
+def load_chunks(directory: str) -> list:
+    """
+    Memory-maps every chunk of an export.
+
+    :param directory: Export directory.
+    :return: List of read-only structured arrays, in recording order.
+    """
+    manifest = read_manifest(directory)
+    return [np.load(os.path.join(directory, chunk["file"]), mmap_mode="r") for chunk in manifest["chunks"]]
+
+def load_column(directory: str, name: str) -> np.ndarray:
+    """
+    Reads one column across all chunks.
+
+    :param directory: Export directory.
+    :param name: Column name, e.g. "imu1_pitch" or "received_at".
+    :return: Concatenated column.
+    """
+    chunks = load_chunks(directory)
+    if not chunks:
+        return np.empty(0, dtype=CHUNK_DTYPE[name])
+    return np.concatenate([chunk[name] for chunk in chunks])
@@ -0,0 +1,531 @@
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import models
+from storm32_gimbal_control import scheduler
+from storm32_gimbal_control import shared_telemetry
+from storm32_gimbal_control import transport
+from storm32_gimbal_control import utils
+from collections import deque
+from concurrent.futures import CancelledError
+from dataclasses import asdict, is_dataclass
+from typing import Callable, Optional, Union
+import argparse
+import itertools
+import json
+import logging
+import os
+import selectors
+import socket
+import stat
+import struct
+import threading
+import time
+
+logger_gateway = logging.getLogger("LoggerGateway")
+
+# Frame: magic | kind | priority | sequence | payload length, followed by the payload
+FRAME_HEADER = struct.Struct("<2sBBIH")
+FRAME_MAGIC = b"SG"
+
+KIND_TELEMETRY = 0x01
+KIND_COMMAND = 0x02
+KIND_RESULT = 0x03
+
+# Telemetry payload: host receive time (time.monotonic) followed by the 64-byte data stream
+TELEMETRY_PAYLOAD = struct.Struct("<d64s")
+# Command payload: command ID and expected response length, followed by the command data
+COMMAND_PAYLOAD = struct.Struct("<BB")
+
+# Frames still queued for a client beyond this many bytes are dropped instead of stalling the poller
+MAX_CLIENT_BACKLOG = 64 * 1024
+
+Address = Union[str, tuple]
+
+def encode_frame(kind: int, payload: bytes, sequence: int = 0, priority: int = 0) -> bytes:
+    """
+    Encodes one gateway frame.
+
+    :param kind: Frame kind (KIND_* constant).
+    :param payload: Frame payload.
+    :param sequence: Sequence number, echoed back in command results.
+    :param priority: CommandPriority of a command frame.
+    :return: Encoded frame.
+    """
+    return FRAME_HEADER.pack(FRAME_MAGIC, kind, priority, sequence, len(payload)) + payload
+
+def decode_frames(buffer: bytearray):
+    """
+    Yields (kind, priority, sequence, payload) for each complete frame and removes it from the buffer.
+
+    :param buffer: Receive buffer, consumed in place.
+    """
+    while len(buffer) >= FRAME_HEADER.size:
+        magic, kind, priority, sequence, length = FRAME_HEADER.unpack_from(buffer)
+        if magic != FRAME_MAGIC:
+            raise ValueError("Invalid gateway frame magic")
+        end = FRAME_HEADER.size + length
+        if len(buffer) < end:
+            return
+        payload = bytes(buffer[FRAME_HEADER.size:end])
+        del buffer[:end]
+        yield kind, priority, sequence, payload
+
+def encode_telemetry(sample: models.DataStreamResponse, received_at: float) -> bytes:
+    """Encodes a telemetry sample as a gateway frame."""
+    return encode_frame(KIND_TELEMETRY, TELEMETRY_PAYLOAD.pack(received_at, sample.to_data_stream()))
+
+def decode_telemetry(payload: bytes) -> tuple:
+    """
+    Decodes a telemetry frame payload.
+
+    :return: Tuple of host receive time and DataStreamResponse.
+    """
+    received_at, data_stream = TELEMETRY_PAYLOAD.unpack(payload)
+    return received_at, models.DataStreamResponse.from_data_stream(data_stream)
+
+def retry_policy_for(command: int) -> models.RetryPolicy:
+    """Returns the retry policy core.py applies to a command."""
+    if command in (constants.CMD_GETVERSION, constants.CMD_GETVERSIONSTR, constants.CMD_GETPARAMETER,
+                   constants.CMD_GETDATA, constants.CMD_GETDATAFIELDS):
+        return models.RETRY_IDEMPOTENT
+    if command == constants.CMD_RESTOREALLPARAMETER:
+        return models.RETRY_NEVER
+    return models.RETRY_UNLESS_ACKED
+
+def _to_json(result):
+    if is_dataclass(result):
+        return asdict(result)
+    return result
+
+def _remove_stale_socket(path: str):
+    """Removes a Unix socket nobody listens on any more; anything else at path raises FileExistsError."""
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise FileExistsError(f"Another process is listening on {path}")
+
+def _file_identity(path: str) -> Optional[tuple]:
+    try:
+        status = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return status.st_dev, status.st_ino
+
+def _open_listener(address: Address) -> socket.socket:
+    if isinstance(address, str):
+        _remove_stale_socket(address)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(address)
+    listener.listen()
+    listener.setblocking(False)
+    return listener
+
+class _Client:
+    """Connection state of one subscriber."""
+    def __init__(self, connection: socket.socket):
+        self.connection = connection
+        self.fileno = connection.fileno()
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.dropped = 0
+        self.closed = False
+
+class TelemetryGateway:
+    """
+    Owns the serial port, polls telemetry once and fans it out to any number of socket clients.
+
+    Every connected client receives each telemetry sample. Clients may also send
+    commands; these go through a CommandScheduler together with the telemetry poll,
+    so a control command waits for at most the exchange already on the wire.
+    """
+    def __init__(self, serial_port: transport.Transport, addresses: list, poll_interval: float = 0.02,
+                 command_timeout: float = 0.5, rate_limits: Optional[dict] = None):
+        """
+        :param serial_port: Open serial port connection
+        :param addresses: Unix socket paths and/or (host, port) TCP tuples to listen on
+        :param poll_interval: Seconds between telemetry polls, None to disable polling
+        :param command_timeout: Overall time budget for each exchange on the port
+        :param rate_limits: Per-class budgets, see CommandScheduler
+        """
+        self.serial_port = serial_port
+        self.scheduler = scheduler.CommandScheduler(serial_port, rate_limits)
+        self.poll_interval = poll_interval
+        self.command_timeout = command_timeout
+        self.stats = {"polls": 0, "poll_errors": 0, "commands": 0, "dropped_frames": 0}
+
+        self._listeners = [_open_listener(address) for address in addresses]
+        # Socket files this gateway created, so stop() never removes one another process bound since
+        self._socket_files = {address: _file_identity(address) for address in addresses if isinstance(address, str)}
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self._sinks = []
+
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+
+        self._stopped = threading.Event()
+        self._running = False
+        self._threads = []
+
+    @property
+    def addresses(self) -> list:
+        """Actual bound addresses, useful when listening on TCP port 0."""
+        return [listener.getsockname() for listener in self._listeners]
+
+    def add_sink(self, sink: models.TelemetrySink):
+        """
+        Registers a local callable receiving every telemetry sample on the poller thread.
+
+        :param sink: Called as sink(sample, received_at), see models.TelemetrySink. The
+                     feed methods of the library fit as they are: TelemetryAggregator.update,
+                     Downsampler.update, ColumnarExporter.append, TriggerEngine.feed,
+                     TelemetryPublisher.publish and TrackingController.feed.
+        """
+        self._sinks.append(sink)
+
+    def submit(self, command: int, data: list[int], expected_length: int,
+               priority: models.CommandPriority = models.CommandPriority.CONTROL,
+               callback: Optional[Callable] = None):
+        """
+        Queues a command for the serial port.
+
+        :param command: Command ID.
+        :param data: Command data.
+        :param expected_length: Expected response length.
+        :param priority: CommandPriority of the command.
+        :param callback: Called as callback(result, error) once the exchange finishes.
+        """
+        future = self.scheduler.submit(priority, self._execute, command, data, expected_length)
+        if callback is None:
+            return
+
+        def done(future):
+            error = CancelledError("Gateway stopped") if future.cancelled() else future.exception()
+            callback(None if error else future.result(), error)
+
+        future.add_done_callback(done)
+
+    def start(self):
+        """Starts the scheduler, poller and socket threads."""
+        self._running = True
+        self._stopped.clear()
+        self.scheduler.start()
+        for listener in self._listeners:
+            self._selector.register(listener, selectors.EVENT_READ, None)
+        self._selector.register(self._wakeup_reader, selectors.EVENT_READ, None)
+        self._threads = [
+            threading.Thread(target=self._poll_loop, name="gateway-poller", daemon=True),
+            threading.Thread(target=self._socket_loop, name="gateway-sockets", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stops the gateway and closes every client connection."""
+        self._running = False
+        self._stopped.set()
+        self._wake()
+        for thread in self._threads:
+            thread.join()
+        self.scheduler.stop()
+        for listener in self._listeners:
+            address = listener.getsockname()
+            listener.close()
+            if isinstance(address, str) and _file_identity(address) == self._socket_files.get(address):
+                os.unlink(address)
+        with self._clients_lock:
+            for client in self._clients.values():
+                client.connection.close()
+            self._clients.clear()
+        self._selector.close()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _poll_loop(self):
+        next_poll = time.monotonic()
+        while not self._stopped.is_set():
+            if self.poll_interval is None:
+                self._stopped.wait(0.5)
+                continue
+            # Keyed so that a poll still queued behind control traffic is not doubled up
+            self.scheduler.submit(models.CommandPriority.TELEMETRY, self._poll, key="telemetry-poll")
+            next_poll = max(next_poll + self.poll_interval, time.monotonic())
+            self._stopped.wait(next_poll - time.monotonic())
+
+    def _poll(self, serial_port: transport.Transport):
+        try:
+            sample = core.get_data(serial_port, 0, timeout=self.command_timeout)
+        except Exception as error:
+            self.stats["poll_errors"] += 1
+            logger_gateway.warning(f"Telemetry poll failed: {error}")
+            return
+
+        received_at = time.monotonic()
+        self.stats["polls"] += 1
+        for sink in self._sinks:
+            try:
+                sink(sample, received_at)
+            except Exception:
+                logger_gateway.exception("Telemetry sink failed")
+        self._broadcast(encode_telemetry(sample, received_at))
+
+    def _execute(self, serial_port: transport.Transport, command: int, data: list[int], expected_length: int):
+        self.stats["commands"] += 1
+        try:
+            return utils.transact(serial_port, command, data, expected_length,
+                                  retry_policy_for(command), self.command_timeout)
+        except Exception as error:
+            logger_gateway.warning(f"Command {command:#04x} failed: {error}")
+            raise
+
+    def _broadcast(self, frame: bytes):
+        with self._clients_lock:
+            for client in self._clients.values():
+                if len(client.outbox) + len(frame) > MAX_CLIENT_BACKLOG:
+                    client.dropped += 1
+                    self.stats["dropped_frames"] += 1
+                    continue
+                client.outbox += frame
+        self._wake()
+
+    def _send_to(self, connection: socket.socket, frame: bytes):
+        with self._clients_lock:
+            client = self._clients.get(connection.fileno())
+            if client is not None:
+                client.outbox += frame
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeup_writer.send(b"\x00")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _socket_loop(self):
+        while self._running:
+            with self._clients_lock:
+                for client in self._clients.values():
+                    events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbox else 0)
+                    self._selector.modify(client.connection, events, client)
+
+            for key, events in self._selector.select(timeout=0.5):
+                if key.fileobj is self._wakeup_reader:
+                    try:
+                        while self._wakeup_reader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif key.data is None:
+                    self._accept(key.fileobj)
+                else:
+                    if events & selectors.EVENT_READ:
+                        self._receive(key.data)
+                    if events & selectors.EVENT_WRITE and not key.data.closed:
+                        self._flush(key.data)
+
+    def _accept(self, listener: socket.socket):
+        try:
+            connection, _ = listener.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(False)
+        client = _Client(connection)
+        with self._clients_lock:
+            self._clients[client.fileno] = client
+        self._selector.register(connection, selectors.EVENT_READ, client)
+
+    def _disconnect(self, client: _Client):
+        with self._clients_lock:
+            if client.closed:
+                return
+            client.closed = True
+            self._clients.pop(client.fileno, None)
+        try:
+            self._selector.unregister(client.connection)
+        except (KeyError, ValueError, OSError):
+            pass
+        client.connection.close()
+
+    def _receive(self, client: _Client):
+        try:
+            data = client.connection.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._disconnect(client)
+            return
+
+        client.inbox += data
+        try:
+            for kind, priority, sequence, payload in decode_frames(client.inbox):
+                if kind == KIND_COMMAND:
+                    self._accept_command(client, priority, sequence, payload)
+        except (ValueError, struct.error) as error:
+            logger_gateway.warning(f"Dropping client sending invalid frames: {error}")
+            self._disconnect(client)
+
+    def _accept_command(self, client: _Client, priority: int, sequence: int, payload: bytes):
+        command, expected_length = COMMAND_PAYLOAD.unpack_from(payload)
+        data = list(payload[COMMAND_PAYLOAD.size:])
+        priority = min(priority, models.CommandPriority.BULK)
+        connection = client.connection
+
+        def reply(result, error):
+            if error is None:
+                body = {"ok": True, "result": _to_json(result)}
+            else:
+                body = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+            self._send_to(connection, encode_frame(KIND_RESULT, json.dumps(body).encode("utf-8"), sequence, priority))
+
+        self.submit(command, data, expected_length, models.CommandPriority(priority), reply)
+
+    def _flush(self, client: _Client):
+        with self._clients_lock:
+            if not client.outbox:
+                return
+            try:
+                sent = client.connection.send(client.outbox)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                sent = -1
+            if sent >= 0:
+                del client.outbox[:sent]
+        if sent < 0:
+            self._disconnect(client)
+
+class GatewayClient:
+    """
+    Client side of the TelemetryGateway socket protocol.
+    """
+    def __init__(self, address: Address, timeout: float = 1.0):
+        """
+        :param address: Unix socket path or (host, port) TCP tuple of the gateway.
+        :param timeout: Socket timeout in seconds.
+        """
+        if isinstance(address, str):
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.settimeout(timeout)
+            self.connection.connect(address)
+        else:
+            self.connection = socket.create_connection(address, timeout)
+        self._buffer = bytearray()
+        self._telemetry = deque(maxlen=256)
+        self._results = {}
+        self._sequence = itertools.count(1)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_telemetry(self) -> tuple:
+        """
+        Waits for the next telemetry sample.
+
+        :return: Tuple of gateway receive time and DataStreamResponse.
+        """
+        while not self._telemetry:
+            self._receive()
+        return decode_telemetry(self._telemetry.popleft())
+
+    def send_command(self, command: int, data: list[int], expected_length: int,
+                     priority: models.CommandPriority = models.CommandPriority.CONTROL):
+        """
+        Sends a command through the gateway and waits for its result.
+
+        :param command: Command ID.
+        :param data: Command data.
+        :param expected_length: Expected response length.
+        :param priority: CommandPriority of the command.
+        :return: Decoded JSON result, dataclass responses become dicts.
+        """
+        sequence = next(self._sequence)
+        payload = COMMAND_PAYLOAD.pack(command, expected_length) + bytes(data)
+        self.connection.sendall(encode_frame(KIND_COMMAND, payload, sequence, priority))
+
+        while sequence not in self._results:
+            self._receive()
+
+        body = json.loads(self._results.pop(sequence))
+        if not body["ok"]:
+            raise RuntimeError(body["error"])
+        return body["result"]
+
+    def _receive(self):
+        data = self.connection.recv(4096)
+        if not data:
+            raise ConnectionError("Gateway closed the connection")
+        self._buffer += data
+        for kind, priority, sequence, payload in decode_frames(self._buffer):
+            if kind == KIND_TELEMETRY:
+                self._telemetry.append(payload)
+            elif kind == KIND_RESULT:
+                self._results[sequence] = payload
+
+def _parse_address(value: str) -> Address:
+    host, separator, port = value.rpartition(":")
+    if separator and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Share one Storm32 serial port between local clients.")
+    parser.add_argument("port", help="Serial port, e.g. /dev/ttyACM0")
+    parser.add_argument("listen", nargs="+", help="Unix socket path or host:port to listen on")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--interval", type=float, default=0.02, help="Telemetry poll interval in seconds")
+    parser.add_argument("--shared-memory", metavar="NAME", help="Also publish telemetry to this shared memory segment")
+    parser.add_argument("--replace-shared-memory", action="store_true",
+                        help="Take over a segment of that name left behind by a crashed gateway")
+    arguments = parser.parse_args()
+
+    # Imported here so TelemetryGateway works on any Transport without pyserial installed
+    import serial
+
+    serial_port = serial.Serial(arguments.port, arguments.baudrate, timeout=0.1)
+    publisher = None
+    with TelemetryGateway(serial_port, [_parse_address(a) for a in arguments.listen], arguments.interval) as telemetry_gateway:
+        if arguments.shared_memory:
+            publisher = shared_telemetry.TelemetryPublisher(arguments.shared_memory,
+                                                            replace=arguments.replace_shared_memory)
+            telemetry_gateway.add_sink(publisher.publish)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+    if publisher is not None:
+        publisher.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import transport
+from dataclasses import dataclass, field
+from typing import Optional
+import math
+import random
+import time
+
+# Start sign, length and command ID before the payload, two CRC bytes after it
+FRAME_OVERHEAD = 5
+# 8N1: start bit, eight data bits, stop bit
+BITS_PER_BYTE = 10
+ACK_LENGTH = FRAME_OVERHEAD + 1
+
+# Offered loads of a sweep, as fractions of the projected capacity
+DEFAULT_LOADS = (0.1, 0.3, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.2)
+
+@dataclass(frozen=True)
+class CommandCost:
+    """Frame sizes of one exchange, in bytes."""
+    name: str
+    command: int
+    payload: int
+    response: int
+
+    @property
+    def request(self) -> int:
+        """Length of the host frame."""
+        return self.payload + FRAME_OVERHEAD
+
+    @property
+    def total(self) -> int:
+        """Bytes on the wire for the request and its response."""
+        return self.request + self.response
+
+    def wire_time(self, baudrate: int, bits_per_byte: int = BITS_PER_BYTE) -> float:
+        """Seconds the request and the response occupy the link."""
+        return self.total * bits_per_byte / baudrate
+
+# Payload and response lengths as sent and expected by the functions of the same name in core.
+# GETDATAFIELDS is missing: its response grows with the fields requested, build a CommandCost for it.
+COMMAND_COSTS = {cost.name: cost for cost in (
+    CommandCost("get_version", constants.CMD_GETVERSION, 0, FRAME_OVERHEAD + 6),
+    CommandCost("get_version_str", constants.CMD_GETVERSIONSTR, 0, FRAME_OVERHEAD + 16 * 3),
+    CommandCost("get_parameter", constants.CMD_GETPARAMETER, 2, FRAME_OVERHEAD + 4),
+    CommandCost("set_parameter", constants.CMD_SETPARAMETER, 4, ACK_LENGTH),
+    CommandCost("get_data", constants.CMD_GETDATA, 1, FRAME_OVERHEAD + 2 + 64),
+    CommandCost("set_pitch", constants.CMD_SETPITCH, 2, ACK_LENGTH),
+    CommandCost("set_roll", constants.CMD_SETROLL, 2, ACK_LENGTH),
+    CommandCost("set_yaw", constants.CMD_SETYAW, 2, ACK_LENGTH),
+    CommandCost("set_pan_mode", constants.CMD_SETPANMODE, 1, ACK_LENGTH),
+    CommandCost("set_standby", constants.CMD_SETSTANDBY, 1, ACK_LENGTH),
+    CommandCost("do_camera", constants.CMD_DOCAMERA, 6, ACK_LENGTH),
+    CommandCost("set_script_control", constants.CMD_SETSCRIPTCONTROL, 6, ACK_LENGTH),
+    CommandCost("set_angle", constants.CMD_SETANGLE, 14, ACK_LENGTH),
+    CommandCost("set_pitch_roll_yaw", constants.CMD_SETPITCHROLLYAW, 6, ACK_LENGTH),
+    CommandCost("set_pwm_out", constants.CMD_SETPWMOUT, 2, ACK_LENGTH),
+    CommandCost("restore_parameter", constants.CMD_RESTOREPARAMETER, 2, ACK_LENGTH),
+    CommandCost("restore_all_parameters", constants.CMD_RESTOREALLPARAMETER, 0, ACK_LENGTH),
+    CommandCost("active_pan_mode_setting", constants.CMD_ACTIVEPANMODESETTING, 2, ACK_LENGTH),
+)}
+
+# One representative call per entry of COMMAND_COSTS, as callable(port, timeout)
+EXERCISES = {
+    "get_version": lambda port, timeout: core.get_version(port, timeout),
+    "get_version_str": lambda port, timeout: core.get_version_str(port, timeout),
+    "get_parameter": lambda port, timeout: core.get_parameter(port, 0, timeout),
+    "set_parameter": lambda port, timeout: core.set_parameter(port, 0, 0, timeout),
+    "get_data": lambda port, timeout: core.get_data(port, 0, timeout),
+    "set_pitch": lambda port, timeout: core.set_pitch(port, 0, timeout),
+    "set_roll": lambda port, timeout: core.set_roll(port, 0, timeout),
+    "set_yaw": lambda port, timeout: core.set_yaw(port, 0, timeout),
+    "set_pan_mode": lambda port, timeout: core.set_pan_mode(port, models.PanMode.HOLD_HOLD_PAN, timeout),
+    "set_standby": lambda port, timeout: core.set_standby(port, models.StandBySwitch.OFF, timeout),
+    "do_camera": lambda port, timeout: core.do_camera(port, models.DoCameraMode.OFF, timeout),
+    "set_script_control": lambda port, timeout: core.set_script_control(port, models.ScriptControlMode.OFF, timeout),
+    "set_angle": lambda port, timeout: core.set_angle(port, 0.0, 0.0, 0.0, models.SetAngleFlags(0), timeout),
+    "set_pitch_roll_yaw": lambda port, timeout: core.set_pitch_roll_yaw(port, 0, 0, 0, timeout),
+    "set_pwm_out": lambda port, timeout: core.set_pwm_out(port, 0, timeout),
+    "restore_parameter": lambda port, timeout: core.restore_parameter(port, 0, timeout),
+    "restore_all_parameters": lambda port, timeout: core.restore_all_parameters(port, timeout),
+    "active_pan_mode_setting": lambda port, timeout: core.active_pan_mode_setting(port, models.PanModeSetting.DEFAULT_SETTING, timeout),
+}
+
+def _cost(command) -> CommandCost:
+    if isinstance(command, CommandCost):
+        return command
+    if command not in COMMAND_COSTS:
+        raise ValueError(f"Unknown command {command!r}, use a name from COMMAND_COSTS or a CommandCost.")
+    return COMMAND_COSTS[command]
+
+@dataclass
+class LinkProjection:
+    """
+    Analytic load of a command mix on a serial link.
+
+    The library waits for each response before sending the next request, so an
+    exchange holds the link for the request, the device turnaround and the response.
+    Latency is modelled as an M/G/1 queue: requests arriving at random times, served
+    one at a time, with the service time of the command drawn.
+    """
+    baudrate: int
+    rates: dict
+    service_time: float
+    service_time_squared: float
+    bytes_sent: float
+    bytes_received: float
+
+    @property
+    def rate(self) -> float:
+        """Requested exchanges per second."""
+        return sum(self.rates.values())
+
+    @property
+    def utilization(self) -> float:
+        """Fraction of the link time the mix needs; above 1 it cannot be carried."""
+        return self.rate * self.service_time
+
+    @property
+    def capacity(self) -> float:
+        """Exchanges per second at saturation, in the proportions of the mix."""
+        return 1.0 / self.service_time
+
+    @property
+    def saturation_rates(self) -> dict:
+        """Per-command rates at saturation."""
+        scale = self.capacity / self.rate
+        return {name: rate * scale for name, rate in self.rates.items()}
+
+    @property
+    def knee(self) -> float:
+        """Exchanges per second at which the mean latency is twice the service time."""
+        mean = self.service_time
+        return 2.0 * mean / (self.service_time_squared + 2.0 * mean * mean)
+
+    def latency(self, rate: Optional[float] = None) -> float:
+        """
+        Mean seconds from a request being due to its response, queueing included.
+
+        :param rate: Offered exchanges per second, the mix's own rate if None.
+        :return: Latency, infinite at or above capacity.
+        """
+        rate = self.rate if rate is None else rate
+        load = rate * self.service_time
+        if load >= 1.0:
+            return math.inf
+        return self.service_time + rate * self.service_time_squared / (2.0 * (1.0 - load))
+
+def project(mix: dict, baudrate: int, bits_per_byte: int = BITS_PER_BYTE, turnaround: float = 0.0) -> LinkProjection:
+    """
+    Projects what a command mix costs on a link.
+
+    :param mix: Command name (or CommandCost) to exchanges per second.
+    :param baudrate: Link rate in bits per second.
+    :param bits_per_byte: Bits per byte on the wire, 10 for 8N1.
+    :param turnaround: Seconds the device and host add per exchange.
+    :return: LinkProjection
+    """
+    if baudrate <= 0:
+        raise ValueError("Baud rate must be positive.")
+    costs = {_cost(command): rate for command, rate in mix.items()}
+    if any(rate < 0 for rate in costs.values()) or not any(costs.values()):
+        raise ValueError("Mix rates must be non-negative and not all zero.")
+
+    total = sum(costs.values())
+    times = {cost: cost.wire_time(baudrate, bits_per_byte) + turnaround for cost in costs}
+    return LinkProjection(
+        baudrate=baudrate,
+        rates={cost.name: rate for cost, rate in costs.items()},
+        service_time=sum(rate * times[cost] for cost, rate in costs.items()) / total,
+        service_time_squared=sum(rate * times[cost] ** 2 for cost, rate in costs.items()) / total,
+        bytes_sent=sum(rate * cost.request for cost, rate in costs.items()),
+        bytes_received=sum(rate * cost.response for cost, rate in costs.items()),
+    )
+
+@dataclass
+class LoadPoint:
+    """Measured behaviour at one offered rate. Times are in seconds."""
+    offered: float
+    achieved: float
+    errors: int = 0
+    latencies: list = field(default_factory=list)
+
+    @property
+    def mean_latency(self) -> float:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else math.nan
+
+    def percentile(self, fraction: float) -> float:
+        """Latency below which the given fraction of exchanges completed."""
+        if not self.latencies:
+            return math.nan
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def measure(serial_port: transport.Transport, mix: dict, offered: float, duration: float,
+            seed: int = 0, timeout: float = 0.5) -> LoadPoint:
+    """
+    Offers a command mix at a fixed mean rate and measures what the link delivers.
+
+    Requests fall due at random (Poisson) times for duration seconds and are sent
+    one at a time; a request due while another is in flight waits, and that wait
+    counts into its latency. A saturated link therefore shows up as an achieved rate
+    below the offered one and as latencies growing over the run.
+
+    :param serial_port: Open serial port connection
+    :param mix: Command name to relative weight, names from EXERCISES.
+    :param offered: Mean exchanges per second.
+    :param duration: Seconds over which requests fall due.
+    :param seed: Random seed for arrival times and command choice.
+    :param timeout: Budget of each exchange.
+    :return: LoadPoint
+    """
+    unknown = [name for name in mix if name not in EXERCISES]
+    if unknown:
+        raise ValueError(f"No exercise for {unknown}, use names from EXERCISES.")
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    point = LoadPoint(offered=offered, achieved=0.0)
+    start = time.monotonic()
+    due = start
+    while True:
+        due += rng.expovariate(offered)
+        if due >= start + duration:
+            break
+        wait = due - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            EXERCISES[rng.choices(names, weights)[0]](serial_port, timeout)
+        except (TimeoutError, ValueError, exceptions.AckError):
+            point.errors += 1
+            continue
+        point.latencies.append(time.monotonic() - due)
+
+    point.achieved = len(point.latencies) / max(duration, time.monotonic() - start)
+    return point
+
+def sweep(mix: dict, baudrate: int, loads: tuple = DEFAULT_LOADS, duration: float = 2.0,
+          turnaround: float = 0.0, seed: int = 0) -> list:
+    """
+    Measures a command mix against a simulated gimbal on a pty paced at baudrate.
+
+    The pty pacing uses the same bits-per-byte wire time as project(), so agreement
+    with the projection checks host overhead and queueing, not the wire model
+    itself. Needs pyserial and a POSIX pty.
+
+    :param mix: Command name to exchanges per second; only the proportions matter here.
+    :param baudrate: Emulated link rate in bits per second.
+    :param loads: Offered rates as fractions of the projected capacity.
+    :param duration: Seconds per load.
+    :param turnaround: Seconds the simulated device adds per exchange.
+    :param seed: Random seed of the first load.
+    :return: List of LoadPoint, one per load.
+    """
+    # Imported here so the projection works without pyserial and on platforms without tty/select
+    import serial
+    from storm32_gimbal_control import simulator
+
+    capacity = project(mix, baudrate, turnaround=turnaround).capacity
+    points = []
+    with simulator.PtyGimbal(transfer_latency=turnaround, baudrate=baudrate) as device:
+        serial_port = serial.Serial(device.port, baudrate, timeout=0.5)
+        try:
+            for index, load in enumerate(loads):
+                points.append(measure(serial_port, mix, load * capacity, duration, seed + index))
+        finally:
+            serial_port.close()
+    return points
+
+def saturation(points: list) -> float:
+    """Highest exchange rate achieved in a sweep."""
+    return max(point.achieved for point in points)
+
+def latency_knee(points: list, factor: float = 2.0) -> Optional[LoadPoint]:
+    """
+    First point of a sweep whose mean latency exceeds factor times that of the lightest load.
+
+    :param points: LoadPoints from sweep().
+    :param factor: Latency growth that marks the knee.
+    :return: LoadPoint, None if latency never grew that much.
+    """
+    ordered = sorted(points, key=lambda point: point.offered)
+    baseline = ordered[0].mean_latency
+    for point in ordered[1:]:
+        if point.mean_latency > factor * baseline:
+            return point
+    return None
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
-from enum import Enum, Flag, IntFlag
+from enum import Enum, Flag, IntEnum, IntFlag
+from typing import Optional, Protocol
 import struct
+from storm32_gimbal_control import exceptions
 
 @dataclass
 class VersionResponse:
@@ -83,6 +85,61 @@ class DataStreamResponse:
             extra_function_input=values[31],
         )
 
+    def to_data_stream(self) -> bytes:
+        """Packs the response back into the 64-byte data stream it was parsed from."""
+        values = (
+            self.state, self.status, self.status2, self.i2c_errors,
+            self.lipo_voltage, self.timestamp, self.cycle_time,
+            *self.imu1_gyro, *self.imu1_acc, *self.imu1_rotation,
+            round(self.imu1_pitch * 100), round(self.imu1_roll * 100), round(self.imu1_yaw * 100),
+            round(self.pid_pitch * 100), round(self.pid_roll * 100), round(self.pid_yaw * 100),
+            self.input_pitch, self.input_roll, self.input_yaw,
+            round(self.imu2_pitch * 100), round(self.imu2_roll * 100), round(self.imu2_yaw * 100),
+            round(self.mag_yaw * 100), round(self.mag_pitch * 100),
+            round(self.imu_acc_confidence * 10000), self.extra_function_input,
+        )
+        return struct.pack("<32h", *values)
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry behaviour for a class of commands."""
+    max_attempts: int
+    retry_on_no_response: bool = True
+    retry_on_ack_codes: frozenset = frozenset()
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        """
+        Decides whether a failed attempt may be resent.
+
+        :param error: Exception raised by the failed attempt.
+        :param attempt: Number of attempts made so far (1-based).
+        :return: True if the command may be sent again.
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if isinstance(error, exceptions.AckError):
+            return error.code in self.retry_on_ack_codes
+        if isinstance(error, (ValueError, exceptions.CRCMismatchException, exceptions.DeadlineExceeded)):
+            return self.retry_on_no_response
+        return False
+
+# ACK codes meaning the gimbal rejected the frame itself, so the command never ran
+TRANSIENT_ACK_CODES = frozenset({150, 151, 152})
+
+# Getters have no side effects and may be resent on any transient failure
+RETRY_IDEMPOTENT = RetryPolicy(max_attempts=3, retry_on_ack_codes=TRANSIENT_ACK_CODES)
+# Setters are resent only while no ACK at all has been received
+RETRY_UNLESS_ACKED = RetryPolicy(max_attempts=2)
+# Commands that must never be sent twice
+RETRY_NEVER = RetryPolicy(max_attempts=1, retry_on_no_response=False)
+
+class CommandPriority(IntEnum):
+    """Priority classes for sharing one link, lowest value served first."""
+    EMERGENCY = 0
+    CONTROL = 1
+    TELEMETRY = 2
+    BULK = 3
+
 class PanMode(Enum):
     """Pan mode settings."""
     OFF = 0
@@ -153,3 +210,15 @@ class LiveDataFields(IntFlag):
     MAG_ANGLES = 0x0200
     STORM32_LINK = 0x0400
     IMU_ACC_CONFIDENCE = 0x0800
+
+class TelemetrySink(Protocol):
+    """
+    Receiver of decoded telemetry, as registered with TelemetryGateway.add_sink().
+
+    The gateway calls it on its poller thread for every sample, with the host
+    time.monotonic() value the sample was received at. Called directly, received_at
+    may be left out and defaults to now. The next poll waits for all sinks, so a sink
+    must return quickly; its exceptions are logged and do not reach the other sinks.
+    """
+    def __call__(self, sample: DataStreamResponse, received_at: Optional[float] = None) -> None:
+        ...
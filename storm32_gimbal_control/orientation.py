@@ -0,0 +1,293 @@
+from storm32_gimbal_control import models
+from typing import Optional
+import numpy as np
+
+# Angles follow the SETANGLE and GETDATA convention: degrees, applied as yaw about Z,
+# then pitch about the new Y, then roll about the new X (intrinsic Z-Y-X). A rotation
+# matrix R maps vectors from the rotated frame into the reference frame, and
+# quaternions are stored as (w, x, y, z) on the last axis.
+
+IDENTITY_QUATERNION = np.array([1.0, 0.0, 0.0, 0.0])
+
+# Camera boresight in the camera frame
+BORESIGHT = np.array([1.0, 0.0, 0.0])
+
+# Below this |cos(pitch)| roll and yaw can no longer be told apart
+_GIMBAL_LOCK_EPSILON = 1e-9
+
+def euler_to_matrix(pitch, roll, yaw) -> np.ndarray:
+    """
+    Builds rotation matrices from Euler angles.
+
+    :param pitch: Pitch in degrees, scalar or array
+    :param roll: Roll in degrees, broadcastable with pitch
+    :param yaw: Yaw in degrees, broadcastable with pitch
+    :return: Array of shape (..., 3, 3)
+    """
+    pitch, roll, yaw = np.broadcast_arrays(*(np.radians(np.asarray(angle, dtype=float)) for angle in (pitch, roll, yaw)))
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cr, sr = np.cos(roll), np.sin(roll)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+
+    matrix = np.empty(pitch.shape + (3, 3))
+    matrix[..., 0, 0] = cy * cp
+    matrix[..., 0, 1] = cy * sp * sr - sy * cr
+    matrix[..., 0, 2] = cy * sp * cr + sy * sr
+    matrix[..., 1, 0] = sy * cp
+    matrix[..., 1, 1] = sy * sp * sr + cy * cr
+    matrix[..., 1, 2] = sy * sp * cr - cy * sr
+    matrix[..., 2, 0] = -sp
+    matrix[..., 2, 1] = cp * sr
+    matrix[..., 2, 2] = cp * cr
+    return matrix
+
+def matrix_to_euler(matrix) -> tuple:
+    """
+    Extracts Euler angles from rotation matrices.
+
+    At pitch +-90 degrees only the difference of roll and yaw is defined; roll is then
+    reported as 0.
+
+    :param matrix: Array of shape (..., 3, 3)
+    :return: (pitch, roll, yaw) in degrees, each of shape (...)
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    pitch = np.arcsin(np.clip(-matrix[..., 2, 0], -1.0, 1.0))
+    locked = np.hypot(matrix[..., 0, 0], matrix[..., 1, 0]) < _GIMBAL_LOCK_EPSILON
+
+    roll = np.where(locked, 0.0, np.arctan2(matrix[..., 2, 1], matrix[..., 2, 2]))
+    yaw = np.where(locked, np.arctan2(-matrix[..., 0, 1], matrix[..., 1, 1]),
+                   np.arctan2(matrix[..., 1, 0], matrix[..., 0, 0]))
+    return np.degrees(pitch), np.degrees(roll), np.degrees(yaw)
+
+def euler_to_quaternion(pitch, roll, yaw) -> np.ndarray:
+    """
+    Builds unit quaternions from Euler angles.
+
+    :param pitch: Pitch in degrees, scalar or array
+    :param roll: Roll in degrees, broadcastable with pitch
+    :param yaw: Yaw in degrees, broadcastable with pitch
+    :return: Array of shape (..., 4)
+    """
+    pitch, roll, yaw = np.broadcast_arrays(*(np.radians(np.asarray(angle, dtype=float)) / 2 for angle in (pitch, roll, yaw)))
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cr, sr = np.cos(roll), np.sin(roll)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+
+    return np.stack([
+        cr * cp * cy + sr * sp * sy,
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+    ], axis=-1)
+
+def quaternion_to_euler(quaternion) -> tuple:
+    """
+    Extracts Euler angles from quaternions, normalizing them first.
+
+    :param quaternion: Array of shape (..., 4)
+    :return: (pitch, roll, yaw) in degrees, each of shape (...)
+    """
+    return matrix_to_euler(quaternion_to_matrix(quaternion))
+
+def quaternion_to_matrix(quaternion) -> np.ndarray:
+    """
+    :param quaternion: Array of shape (..., 4), normalized here
+    :return: Array of shape (..., 3, 3)
+    """
+    w, x, y, z = np.moveaxis(normalize_quaternion(quaternion), -1, 0)
+
+    matrix = np.empty(w.shape + (3, 3))
+    matrix[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    matrix[..., 0, 1] = 2 * (x * y - w * z)
+    matrix[..., 0, 2] = 2 * (x * z + w * y)
+    matrix[..., 1, 0] = 2 * (x * y + w * z)
+    matrix[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    matrix[..., 1, 2] = 2 * (y * z - w * x)
+    matrix[..., 2, 0] = 2 * (x * z - w * y)
+    matrix[..., 2, 1] = 2 * (y * z + w * x)
+    matrix[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return matrix
+
+def matrix_to_quaternion(matrix) -> np.ndarray:
+    """
+    Converts rotation matrices to unit quaternions with a non-negative w.
+
+    Each matrix uses whichever of the four standard formulas divides by the largest
+    term, which keeps the result accurate for every rotation.
+
+    :param matrix: Array of shape (..., 3, 3)
+    :return: Array of shape (..., 4)
+    """
+    m = np.asarray(matrix, dtype=float)
+    m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+    m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+    m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+
+    # One candidate per row, built from 4 * (w, x, y, z)[i] * (w, x, y, z)
+    candidates = np.stack([
+        np.stack([1 + m00 + m11 + m22, m21 - m12, m02 - m20, m10 - m01], axis=-1),
+        np.stack([m21 - m12, 1 + m00 - m11 - m22, m01 + m10, m02 + m20], axis=-1),
+        np.stack([m02 - m20, m01 + m10, 1 - m00 + m11 - m22, m12 + m21], axis=-1),
+        np.stack([m10 - m01, m02 + m20, m12 + m21, 1 - m00 - m11 + m22], axis=-1),
+    ], axis=-2)
+    best = np.argmax(np.stack([m00 + m11 + m22, m00, m11, m22], axis=-1), axis=-1)
+    quaternion = np.take_along_axis(candidates, best[..., None, None], axis=-2)[..., 0, :]
+
+    quaternion = normalize_quaternion(quaternion)
+    return np.where(quaternion[..., :1] < 0, -quaternion, quaternion)
+
+def normalize_quaternion(quaternion) -> np.ndarray:
+    """Scales quaternions of shape (..., 4) to unit length."""
+    quaternion = np.asarray(quaternion, dtype=float)
+    return quaternion / np.linalg.norm(quaternion, axis=-1, keepdims=True)
+
+def quaternion_multiply(first, second) -> np.ndarray:
+    """
+    Hamilton product first * second, broadcasting over the leading axes.
+
+    Rotating by the result equals rotating by second, then by first, both expressed
+    in the reference frame.
+    """
+    w1, x1, y1, z1 = np.moveaxis(np.asarray(first, dtype=float), -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(np.asarray(second, dtype=float), -1, 0)
+    return np.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ], axis=-1)
+
+def quaternion_conjugate(quaternion) -> np.ndarray:
+    """Inverse rotation of unit quaternions of shape (..., 4)."""
+    return np.asarray(quaternion, dtype=float) * np.array([1.0, -1.0, -1.0, -1.0])
+
+def rotate_vectors(matrix, vectors) -> np.ndarray:
+    """
+    Applies rotation matrices to vectors.
+
+    :param matrix: Array of shape (..., 3, 3)
+    :param vectors: Array of shape (..., 3), broadcastable with matrix
+    :return: Array of shape (..., 3)
+    """
+    return np.einsum("...ij,...j->...i", matrix, vectors)
+
+def gimbal_to_camera(gimbal_matrix, mount_pitch: float = 0.0, mount_roll: float = 0.0,
+                     mount_yaw: float = 0.0) -> np.ndarray:
+    """
+    Orientation of a camera mounted at a fixed offset from the IMU1 frame.
+
+    :param gimbal_matrix: IMU1 orientation, array of shape (..., 3, 3)
+    :param mount_pitch: Pitch of the camera relative to IMU1 in degrees
+    :param mount_roll: Roll of the camera relative to IMU1 in degrees
+    :param mount_yaw: Yaw of the camera relative to IMU1 in degrees
+    :return: Camera orientation, array of shape (..., 3, 3)
+    """
+    return np.matmul(gimbal_matrix, euler_to_matrix(mount_pitch, mount_roll, mount_yaw))
+
+def camera_to_gimbal(camera_matrix, mount_pitch: float = 0.0, mount_roll: float = 0.0,
+                     mount_yaw: float = 0.0) -> np.ndarray:
+    """
+    Inverse of gimbal_to_camera: the IMU1 orientation giving a camera orientation.
+    """
+    return np.matmul(camera_matrix, euler_to_matrix(mount_pitch, mount_roll, mount_yaw).T)
+
+def boresight(camera_matrix, axis=BORESIGHT) -> np.ndarray:
+    """
+    Unit line-of-sight vectors in the reference frame.
+
+    :param camera_matrix: Camera orientation, array of shape (..., 3, 3)
+    :param axis: Line of sight in the camera frame
+    :return: Array of shape (..., 3)
+    """
+    return rotate_vectors(camera_matrix, np.asarray(axis, dtype=float))
+
+def integrate_rates(rates, times, initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Integrates body-frame angular rates into orientations.
+
+    Each interval is treated as a rotation at the constant rate of its starting
+    sample. The per-interval rotations are chained with a parallel prefix product,
+    so the whole series takes O(log n) NumPy passes instead of a Python loop.
+
+    :param rates: Angular rates about X, Y and Z in degrees per second, shape (n, 3)
+    :param times: Sample times in seconds, shape (n,) with n >= 1
+    :param initial: Orientation at times[0] as a quaternion, identity by default
+    :return: Quaternions of shape (n, 4), one per sample
+    """
+    rates = np.radians(np.asarray(rates, dtype=float))
+    times = np.asarray(times, dtype=float)
+    if rates.ndim != 2 or rates.shape[1] != 3 or times.shape != rates.shape[:1]:
+        raise ValueError("Rates must have shape (n, 3) and times shape (n,)")
+    if not len(times):
+        raise ValueError("At least one sample is needed to integrate rates")
+    if np.any(np.diff(times) < 0):
+        raise ValueError("Times must be non-decreasing")
+
+    count = len(times)
+    steps = np.empty((count, 4))
+    steps[0] = IDENTITY_QUATERNION if initial is None else normalize_quaternion(initial)
+    if count > 1:
+        rotation = rates[:-1] * np.diff(times)[:, None]
+        angle = np.linalg.norm(rotation, axis=-1)
+        # sin(angle / 2) / angle, with its limit 1/2 for tiny angles
+        half_sinc = np.where(angle > 1e-12, np.sin(angle / 2) / np.where(angle > 1e-12, angle, 1.0), 0.5)
+        steps[1:, 0] = np.cos(angle / 2)
+        steps[1:, 1:] = rotation * half_sinc[:, None]
+
+    shift = 1
+    while shift < count:
+        steps[shift:] = quaternion_multiply(steps[:-shift], steps[shift:])
+        shift *= 2
+    return normalize_quaternion(steps)
+
+def sample_euler(sample: models.DataStreamResponse) -> tuple:
+    """IMU1 (pitch, roll, yaw) of a sample in degrees."""
+    return sample.imu1_pitch, sample.imu1_roll, sample.imu1_yaw
+
+def sample_to_matrix(sample: models.DataStreamResponse) -> np.ndarray:
+    """IMU1 orientation of a sample as a 3x3 rotation matrix."""
+    return euler_to_matrix(*sample_euler(sample))
+
+def sample_to_quaternion(sample: models.DataStreamResponse) -> np.ndarray:
+    """IMU1 orientation of a sample as a quaternion."""
+    return euler_to_quaternion(*sample_euler(sample))
+
+def batch_euler(samples) -> tuple:
+    """
+    IMU1 Euler angles of many samples at once.
+
+    :param samples: Structured array with imu1_pitch, imu1_roll and imu1_yaw fields,
+                    as returned by export.load_chunks, or a sequence of
+                    DataStreamResponse objects
+    :return: (pitch, roll, yaw) arrays in degrees
+    """
+    if isinstance(samples, np.ndarray) and samples.dtype.names:
+        return (samples["imu1_pitch"].astype(float), samples["imu1_roll"].astype(float),
+                samples["imu1_yaw"].astype(float))
+    angles = np.array([sample_euler(sample) for sample in samples], dtype=float).reshape(-1, 3)
+    return angles[:, 0], angles[:, 1], angles[:, 2]
+
+def batch_to_matrix(samples) -> np.ndarray:
+    """IMU1 orientations of many samples as an (n, 3, 3) array, see batch_euler."""
+    return euler_to_matrix(*batch_euler(samples))
+
+def batch_to_quaternion(samples) -> np.ndarray:
+    """IMU1 orientations of many samples as an (n, 4) array, see batch_euler."""
+    return euler_to_quaternion(*batch_euler(samples))
+
+def batch_gyro(samples, degrees_per_lsb: float) -> np.ndarray:
+    """
+    IMU1 gyro readings of many samples as rates, ready for integrate_rates.
+
+    :param samples: Structured array with imu1_gyro_x, imu1_gyro_y and imu1_gyro_z
+                    fields, or a sequence of DataStreamResponse objects
+    :param degrees_per_lsb: Gyro scale in degrees per second per raw unit; it depends
+                            on the full-scale range configured by the firmware
+    :return: Array of shape (n, 3) in degrees per second
+    """
+    if isinstance(samples, np.ndarray) and samples.dtype.names:
+        raw = np.stack([samples["imu1_gyro_x"], samples["imu1_gyro_y"], samples["imu1_gyro_z"]], axis=-1)
+    else:
+        raw = np.array([sample.imu1_gyro for sample in samples], dtype=float).reshape(-1, 3)
+    return raw.astype(float) * degrees_per_lsb
@@ -0,0 +1,153 @@
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import transport
+from storm32_gimbal_control import utils
+import logging
+import struct
+
+# SETANGLE frame: start sign, length, command, pitch, roll, yaw (float32), flags, type byte, CRC
+_ANGLES = struct.Struct("<3f")
+_ANGLES_OFFSET = 3
+_FLAGS_OFFSET = 15
+_CRC_OFFSET = 17
+_FRAME_LENGTH = 19
+_ACK_LENGTH = 6
+_ACK_OK = constants.ACK_CODES[0]
+
+logger_pointing = logging.getLogger("LoggerPointing")
+
+def _native_readinto(serial_port: transport.Transport):
+    """readinto of a pyserial port, None for any other transport, whose read() may do more than read."""
+    if type(serial_port).__module__.split(".")[0] != "serial":
+        return None
+    return getattr(serial_port, "readinto", None)
+
+class PointingHandle:
+    """
+    Reusable SETANGLE sender for high-rate pointing.
+
+    The frame and the ACK buffer are allocated once per handle. Each call packs the
+    three angles into the frame in place and continues a CRC precomputed over the
+    fixed header, so only the 14 changing bytes are hashed. The result is identical
+    on the wire to core.set_angle.
+
+    Without wait_for_ack the ACKs are counted in pending and consumed before each
+    later setpoint as far as they have arrived; error ACKs found that way are logged
+    and counted in ack_errors. Call drain() before using the port for anything else.
+    """
+    def __init__(self, serial_port: transport.Transport, flags: models.SetAngleFlags = models.SetAngleFlags(0),
+                 wait_for_ack: bool = True):
+        """
+        :param serial_port: Open serial port connection
+        :param flags: SetAngleFlags enum value used until changed
+        :param wait_for_ack: Read and check the ACK of every setpoint
+        """
+        self.serial_port = serial_port
+        self.wait_for_ack = wait_for_ack
+        self.pending = 0
+        self.ack_errors = 0
+
+        self._frame = bytearray(_FRAME_LENGTH)
+        self._frame[0:3] = bytes([constants.STARTSIGNS.INCOMING, 14, constants.CMD_SETANGLE])
+        self._header_crc = utils.calculate_crc(self._frame[:_ANGLES_OFFSET])
+        self._payload = memoryview(self._frame)[_ANGLES_OFFSET:_CRC_OFFSET]
+        self._ack = bytearray(_ACK_LENGTH)
+        self._ack_view = memoryview(self._ack)
+        self._readinto = _native_readinto(serial_port)
+        self.flags = flags
+
+    @property
+    def flags(self) -> models.SetAngleFlags:
+        return models.SetAngleFlags(self._frame[_FLAGS_OFFSET])
+
+    @flags.setter
+    def flags(self, flags: models.SetAngleFlags):
+        if not isinstance(flags, models.SetAngleFlags):
+            raise ValueError("Invalid flags. Use SetAngleFlags enum values.")
+        self._frame[_FLAGS_OFFSET] = flags.value
+
+    def set_angle(self, pitch_degree: float, roll_degree: float, yaw_degree: float):
+        """
+        Sends one SETANGLE setpoint.
+
+        :param pitch_degree: Pitch angle in degrees
+        :param roll_degree: Roll angle in degrees
+        :param yaw_degree: Yaw angle in degrees
+        :return: ACK string as returned by core.set_angle, None without wait_for_ack
+        """
+        if self.pending:
+            self.drain(wait=self.wait_for_ack)
+        frame = self._frame
+        _ANGLES.pack_into(frame, _ANGLES_OFFSET, pitch_degree, roll_degree, yaw_degree)
+
+        crc = self._header_crc
+        table = utils.CRC_TABLE
+        for byte in self._payload:
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        frame[_CRC_OFFSET] = crc & 0xFF
+        frame[_CRC_OFFSET + 1] = crc >> 8
+
+        if utils.logger_serial.isEnabledFor(logging.INFO):
+            utils.logger_serial.info(' '.join(f'{byte:02X}' for byte in frame))
+        self.serial_port.write(frame)
+        self.pending += 1
+
+        if self.wait_for_ack:
+            return self.read_ack()
+        return None
+
+    def drain(self, wait: bool = True) -> int:
+        """
+        Consumes the ACKs of earlier setpoints.
+
+        :param wait: Wait for every outstanding ACK, each up to the port timeout;
+                     otherwise only ACKs already received are read, which needs a
+                     port with in_waiting.
+        :return: ACKs still outstanding.
+        """
+        while self.pending:
+            if not wait and getattr(self.serial_port, "in_waiting", 0) < _ACK_LENGTH:
+                break
+            try:
+                self.read_ack()
+            except (ValueError, exceptions.AckError) as error:
+                self.ack_errors += 1
+                logger_pointing.warning(f"Earlier setpoint failed: {error}")
+        return self.pending
+
+    def read_ack(self) -> str:
+        """
+        Reads the oldest outstanding ACK into the reused buffer.
+
+        A missing or malformed ACK resynchronizes the port, which discards whatever
+        arrived of it and the ACKs of every other outstanding setpoint.
+
+        :return: "SERIALRCCMD_ACK_OK"
+        """
+        ack = self._ack
+        received = 0
+        while received < _ACK_LENGTH:
+            if self._readinto is not None:
+                count = self._readinto(self._ack_view[received:])
+            else:
+                chunk = self.serial_port.read(_ACK_LENGTH - received)
+                count = len(chunk)
+                ack[received:received + count] = chunk
+            if not count:
+                self._resync()
+                raise ValueError("Incomplete ACK response received")
+            received += count
+
+        if ack[0] != constants.STARTSIGNS.OUTGOING or ack[2] != constants.CMD_ACK:
+            self._resync()
+            raise ValueError("Expected an ACK response to SETANGLE")
+        self.pending = max(0, self.pending - 1)
+        if ack[3]:
+            code = ack[3]
+            raise exceptions.AckError(utils.ack_name(code), code)
+        return _ACK_OK
+
+    def _resync(self):
+        utils.resync(self.serial_port)
+        self.pending = 0
@@ -0,0 +1,356 @@
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import transport
+from storm32_gimbal_control import utils
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+import heapq
+import logging
+import struct
+import threading
+import time
+
+logger_replay = logging.getLogger("LoggerReplay")
+
+SESSION_MAGIC = b"S32S"
+SESSION_VERSION = 1
+# Magic, format version
+FILE_HEADER = struct.Struct("<4sH")
+# Seconds since the recording started, direction, chunk length
+RECORD_HEADER = struct.Struct("<dBH")
+
+HOST_TO_DEVICE = 0
+DEVICE_TO_HOST = 1
+# The host discarded its input buffer; requests still unanswered never will be
+RESYNC = 2
+
+class RecordingTransport(transport.TransportWrapper):
+    """
+    Transport wrapper that logs every byte written and read, with its time.
+
+    Use it in place of the port while running the code to record; the session file
+    can then be played back with ReplayTransport.
+    """
+    def __init__(self, port: transport.Transport, path: str, clock: Callable[[], float] = time.monotonic):
+        """
+        :param port: Transport to record, e.g. an open serial.Serial.
+        :param path: Session file to write, replaced if it exists.
+        :param clock: Time source for the record timestamps.
+        """
+        super().__init__(port)
+        self.path = path
+        self.clock = clock
+        self._file = open(path, "wb")
+        self._file.write(FILE_HEADER.pack(SESSION_MAGIC, SESSION_VERSION))
+        self._started = clock()
+        self._lock = threading.Lock()
+
+    def write(self, data) -> int:
+        self._record(HOST_TO_DEVICE, data)
+        return self.serial_port.write(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data = self.serial_port.read(size)
+        if data:
+            self._record(DEVICE_TO_HOST, data)
+        return data
+
+    def reset_input_buffer(self):
+        self._record(RESYNC, b"")
+        utils.resync(self.serial_port)
+
+    def close(self):
+        """Closes the session file, the wrapped port stays open."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _record(self, direction: int, data):
+        offset = self.clock() - self._started
+        with self._lock:
+            for start in range(0, max(1, len(data)), 0xFFFF):
+                chunk = bytes(data[start:start + 0xFFFF])
+                self._file.write(RECORD_HEADER.pack(offset, direction, len(chunk)))
+                self._file.write(chunk)
+
+@dataclass
+class Exchange:
+    """
+    One host frame and the device bytes that answered it.
+
+    Device frames nobody asked for are kept as exchanges with command None.
+    """
+    command: Optional[int]
+    payload: bytes
+    sent_at: float
+    response: bytes = b""
+    responded_at: Optional[float] = None
+
+    @property
+    def latency(self) -> float:
+        """Seconds from the request to the last response byte, 0 without a response."""
+        return 0.0 if self.responded_at is None else max(0.0, self.responded_at - self.sent_at)
+
+@dataclass
+class Session:
+    """A loaded recording."""
+    exchanges: list
+    duration: float
+    bytes_sent: int
+    bytes_received: int
+
+def read_records(path: str):
+    """Yields (time, direction, data) records of a session file."""
+    with open(path, "rb") as session_file:
+        magic, version = FILE_HEADER.unpack(session_file.read(FILE_HEADER.size))
+        if magic != SESSION_MAGIC or version != SESSION_VERSION:
+            raise ValueError(f"{path} is not a version {SESSION_VERSION} session recording")
+        while True:
+            header = session_file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            offset, direction, length = RECORD_HEADER.unpack(header)
+            data = session_file.read(length)
+            if len(data) < length:
+                logger_replay.warning(f"{path} ends in a truncated record")
+                return
+            yield offset, direction, data
+
+def _split_device_frames(buffer: bytearray):
+    """Yields complete device frames from buffer, with any bytes before them, and removes them."""
+    while True:
+        start = buffer.find(constants.STARTSIGNS.OUTGOING)
+        if start < 0 or len(buffer) < start + 3:
+            return
+        end = start + buffer[start + 1] + 5
+        if len(buffer) < end:
+            return
+        frame = bytes(buffer[:end])
+        del buffer[:end]
+        yield frame
+
+def load_session(path: str) -> Session:
+    """
+    Reads a session file and pairs requests with responses.
+
+    Device frames are assigned to the oldest request still unanswered, which keeps
+    pipelined requests paired correctly. A resync ends every pending request, so a
+    request that timed out stays unanswered instead of taking the response of its
+    retry. Stray bytes stay attached to the frame that follows them, so corrupted
+    traffic replays exactly as it was received.
+
+    :param path: File written by RecordingTransport.
+    :return: Session
+    """
+    exchanges = []
+    waiting = deque()
+    sent = bytearray()
+    received = bytearray()
+    bytes_sent = bytes_received = 0
+    duration = 0.0
+    last = None
+
+    for offset, direction, data in read_records(path):
+        duration = max(duration, offset)
+        if direction == RESYNC:
+            if received and waiting:
+                waiting[0].response += bytes(received)
+                waiting[0].responded_at = offset
+            received.clear()
+            waiting.clear()
+            continue
+        if direction == HOST_TO_DEVICE:
+            bytes_sent += len(data)
+            sent += data
+            for command, payload in transport.split_frames(sent):
+                exchange = Exchange(command, payload, offset)
+                exchanges.append(exchange)
+                waiting.append(exchange)
+            continue
+
+        bytes_received += len(data)
+        received += data
+        for frame in _split_device_frames(received):
+            if waiting:
+                last = waiting.popleft()
+            else:
+                last = Exchange(None, b"", offset)
+                exchanges.append(last)
+            last.response = frame
+            last.responded_at = offset
+
+    if received:
+        target = waiting[0] if waiting else last
+        if target is None:
+            target = Exchange(None, b"", duration)
+            exchanges.append(target)
+        target.response += bytes(received)
+        target.responded_at = duration
+
+    return Session(exchanges=exchanges, duration=duration, bytes_sent=bytes_sent, bytes_received=bytes_received)
+
+@dataclass
+class ReplayStats:
+    """Progress and throughput of a replay."""
+    requests: int = 0
+    matched: int = 0
+    unmatched: int = 0
+    payload_mismatches: int = 0
+    unsolicited: int = 0
+    bytes_delivered: int = 0
+    recorded_time: float = 0.0
+    started: Optional[float] = None
+    unmatched_commands: dict = field(default_factory=dict)
+
+    @property
+    def elapsed(self) -> float:
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Delivered megabytes per second of wall time."""
+        elapsed = self.elapsed
+        return self.bytes_delivered / elapsed / 1e6 if elapsed else 0.0
+
+    @property
+    def speedup(self) -> float:
+        """Recorded seconds replayed per wall second."""
+        elapsed = self.elapsed
+        return self.recorded_time / elapsed if elapsed else 0.0
+
+class ReplayTransport(transport.ScriptedTransport):
+    """
+    Transport that answers the host from a recorded session.
+
+    Every frame the host writes is answered with the response of the next recorded
+    exchange carrying the same command, so decoders and controllers see exactly the
+    bytes the gimbal sent, including corrupted ones, even if they interleave their
+    commands differently than the recorded run. Requests the recording cannot answer
+    are counted and left unanswered (or passed to responder).
+
+    With speed set, a response is released no earlier than its recorded latency
+    after the request, and no earlier than its place on the recorded timeline, both
+    divided by speed: 1.0 replays in real time, 10.0 ten times faster. With speed
+    None responses are available immediately, and an unsolicited frame as soon as
+    the exchange recorded before it has been answered.
+    """
+    def __init__(self, session, speed: Optional[float] = 1.0, timeout: Optional[float] = 1.0,
+                 responder: Optional[Callable[[int, bytes], Optional[bytes]]] = None):
+        """
+        :param session: Session, or path of a session file.
+        :param speed: Replay speed factor, None for as fast as possible.
+        :param timeout: Read timeout in seconds, None blocks forever.
+        :param responder: callable(command, payload) answering requests missing from the recording.
+        """
+        if speed is not None and speed <= 0:
+            raise ValueError("Speed must be positive or None.")
+        super().__init__(timeout=timeout, responder=responder)
+        self.session = load_session(session) if isinstance(session, str) else session
+        self.speed = speed
+        self.stats = ReplayStats()
+
+        self._queues = {}
+        self._unsolicited = []
+        # Without a timeline, unsolicited frames follow the request exchange recorded before them
+        self._followers = {}
+        self._release = []
+        self._sequence = 0
+        self._release_lock = threading.Lock()
+        previous = None
+        for exchange in self.session.exchanges:
+            if exchange.command is not None:
+                previous = exchange
+                self._queues.setdefault(exchange.command, deque()).append(exchange)
+            elif speed is None and previous is not None:
+                self._followers.setdefault(id(previous), []).append(exchange)
+            else:
+                self._unsolicited.append(exchange)
+
+    @property
+    def remaining(self) -> int:
+        """Recorded request exchanges not replayed yet."""
+        return sum(len(queue) for queue in self._queues.values())
+
+    def respond(self, command: int, payload: bytes) -> Optional[bytes]:
+        now = time.monotonic()
+        self._start(now)
+        self.stats.requests += 1
+
+        queue = self._queues.get(command)
+        if not queue:
+            self.stats.unmatched += 1
+            self.stats.unmatched_commands[command] = self.stats.unmatched_commands.get(command, 0) + 1
+            return super().respond(command, payload)
+
+        exchange = queue.popleft()
+        self.stats.matched += 1
+        if exchange.payload != payload:
+            self.stats.payload_mismatches += 1
+        if exchange.response:
+            self._schedule(exchange.responded_at, exchange, now)
+        for follower in self._followers.pop(id(exchange), ()):
+            self._schedule(follower.responded_at, follower, None)
+        return None
+
+    def read(self, size: int = 1) -> bytes:
+        self._start(time.monotonic())
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        chunk = bytearray()
+        while True:
+            now = time.monotonic()
+            self._deliver(now)
+            chunk += self._incoming.get(size - len(chunk), 0)
+            if len(chunk) >= size:
+                break
+            remaining = None if deadline is None else deadline - now
+            if remaining is not None and remaining <= 0:
+                break
+            with self._release_lock:
+                next_release = self._release[0][0] if self._release else None
+            if next_release is None:
+                chunk += self._incoming.get(size - len(chunk), remaining)
+                break
+            wait = next_release - now if remaining is None else min(next_release - now, remaining)
+            if wait > 0:
+                time.sleep(wait)
+        return bytes(chunk)
+
+    @property
+    def in_waiting(self) -> int:
+        self._deliver(time.monotonic())
+        return len(self._incoming)
+
+    def _start(self, now: float):
+        """Starts the replay clock on first use and queues the unsolicited frames on it."""
+        if self.stats.started is None:
+            self.stats.started = now
+            for exchange in self._unsolicited:
+                self._schedule(exchange.responded_at, exchange, None)
+
+    def _schedule(self, recorded_at: float, exchange: Exchange, requested_at: Optional[float]):
+        if self.speed is None:
+            release = 0.0
+        else:
+            release = self.stats.started + recorded_at / self.speed
+            if requested_at is not None:
+                release = max(release, requested_at + exchange.latency / self.speed)
+        with self._release_lock:
+            self._sequence += 1
+            heapq.heappush(self._release, (release, self._sequence, exchange))
+
+    def _deliver(self, now: float):
+        """Moves every response whose release time has come into the read buffer."""
+        with self._release_lock:
+            while self._release and self._release[0][0] <= now:
+                _, _, exchange = heapq.heappop(self._release)
+                if exchange.command is None:
+                    self.stats.unsolicited += 1
+                self.stats.bytes_delivered += len(exchange.response)
+                self.stats.recorded_time = max(self.stats.recorded_time, exchange.responded_at or 0.0)
+                self._incoming.put(exchange.response)
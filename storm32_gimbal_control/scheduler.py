@@ -0,0 +1,197 @@
+from storm32_gimbal_control import models
+from storm32_gimbal_control import transport
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Optional
+import logging
+import threading
+import time
+
+logger_scheduler = logging.getLogger("LoggerScheduler")
+
+@dataclass
+class ClassStats:
+    """Queueing statistics of one priority class."""
+    submitted: int = 0
+    executed: int = 0
+    superseded: int = 0
+    total_delay: float = 0.0
+    max_delay: float = 0.0
+    last_delay: float = 0.0
+
+    @property
+    def mean_delay(self) -> float:
+        return self.total_delay / self.executed if self.executed else 0.0
+
+class TokenBucket:
+    """Rate budget allowing bursts of up to burst jobs and rate jobs per second on average."""
+    def __init__(self, rate: float, burst: int = 1):
+        if not rate > 0 or burst < 1:
+            raise ValueError(f"Token bucket needs a positive rate and a burst of at least 1, got {rate}, {burst}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, now: float) -> bool:
+        """Consumes a token if one is available."""
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def time_until_token(self, now: float) -> float:
+        self._refill(now)
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+class _Job:
+    __slots__ = ("function", "args", "kwargs", "key", "future", "submitted_at")
+
+    def __init__(self, function, args, kwargs, key):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+class CommandScheduler:
+    """
+    Serializes access to one serial port by CommandPriority.
+
+    A single worker thread owns the port. Whenever it is free it runs the oldest job
+    of the most urgent class that still has rate budget, so queued low-priority work
+    is overtaken by anything more urgent. An exchange already on the wire is never
+    interrupted, which is why bulk operations should be submitted as many small
+    commands rather than one long call.
+    """
+    def __init__(self, serial_port: transport.Transport, rate_limits: Optional[dict] = None):
+        """
+        :param serial_port: Open serial port connection
+        :param rate_limits: Optional CommandPriority to (jobs per second, burst) budget
+        """
+        self.serial_port = serial_port
+        self.stats = {priority: ClassStats() for priority in models.CommandPriority}
+
+        self._buckets = {priority: TokenBucket(rate, burst) for priority, (rate, burst) in (rate_limits or {}).items()}
+        self._queues = {priority: deque() for priority in models.CommandPriority}
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def submit(self, priority: models.CommandPriority, function: Callable, *args, key=None, **kwargs) -> Future:
+        """
+        Queues function(serial_port, *args, **kwargs), e.g. a core.py command.
+
+        :param priority: CommandPriority class of the job.
+        :param function: Callable taking the serial port as first argument.
+        :param key: Jobs with the same key replace each other while queued, so only the
+                    newest setpoint is sent when control outpaces the link.
+        :return: Future resolving to the function's result.
+        :raises RuntimeError: If the scheduler is not running, as nothing would ever run the job.
+        """
+        job = _Job(function, args, kwargs, key)
+        priority = models.CommandPriority(priority)
+
+        with self._condition:
+            if not self._running:
+                raise RuntimeError("CommandScheduler is not running")
+            queue = self._queues[priority]
+            self.stats[priority].submitted += 1
+            if key is not None:
+                for index, queued in enumerate(queue):
+                    if queued.key == key:
+                        queued.future.cancel()
+                        queue[index] = job
+                        self.stats[priority].superseded += 1
+                        break
+                else:
+                    queue.append(job)
+            else:
+                queue.append(job)
+            self._condition.notify()
+
+        return job.future
+
+    def call(self, priority: models.CommandPriority, function: Callable, *args, **kwargs):
+        """Submits a job and waits for its result."""
+        return self.submit(priority, function, *args, **kwargs).result()
+
+    def pending(self, priority: Optional[models.CommandPriority] = None) -> int:
+        """Number of queued jobs, of one class or overall."""
+        with self._condition:
+            if priority is not None:
+                return len(self._queues[priority])
+            return sum(len(queue) for queue in self._queues.values())
+
+    def start(self):
+        """Starts the worker thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="command-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the worker and fails every job still queued with RuntimeError."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        with self._condition:
+            for queue in self._queues.values():
+                while queue:
+                    queue.popleft().future.set_exception(RuntimeError("CommandScheduler stopped"))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _next_job(self):
+        """Waits for the next runnable job, None once stopped."""
+        with self._condition:
+            while self._running:
+                now = time.monotonic()
+                wait = None
+                for priority, queue in self._queues.items():
+                    if not queue:
+                        continue
+                    bucket = self._buckets.get(priority)
+                    if bucket is None or bucket.take(now):
+                        return priority, queue.popleft()
+                    retry_in = bucket.time_until_token(now)
+                    wait = retry_in if wait is None else min(wait, retry_in)
+                self._condition.wait(wait)
+            return None
+
+    def _run(self):
+        while True:
+            next_job = self._next_job()
+            if next_job is None:
+                return
+            priority, job = next_job
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            delay = time.monotonic() - job.submitted_at
+            stats = self.stats[priority]
+            stats.executed += 1
+            stats.total_delay += delay
+            stats.max_delay = max(stats.max_delay, delay)
+            stats.last_delay = delay
+
+            try:
+                result = job.function(self.serial_port, *job.args, **job.kwargs)
+            except Exception as error:
+                logger_scheduler.debug(f"{priority.name} job failed: {error}")
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
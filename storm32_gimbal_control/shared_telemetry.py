@@ -0,0 +1,214 @@
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from multiprocessing import shared_memory, resource_tracker
+from typing import Optional
+import struct
+import time
+
+# Segment header: magic | layout version | history capacity | seqlock counter | samples published
+HEADER = struct.Struct("<4sHHQQ")
+HEADER_MAGIC = b"S32T"
+LAYOUT_VERSION = 1
+SEQUENCE_OFFSET = 8
+
+# Slot: host receive time (time.monotonic) followed by the raw 64-byte data stream
+SLOT = struct.Struct("<d64s")
+
+DEFAULT_NAME = "storm32_telemetry"
+# A write takes microseconds, but the publishing thread may be preempted in the middle of
+# one; a counter that stays odd for this long means the publisher died mid-write
+DEFAULT_STALL_TIMEOUT = 0.5
+
+def _slot_offset(index: int) -> int:
+    """Offset of ring slot index; slot -1 holds the latest sample."""
+    return HEADER.size + (index + 1) * SLOT.size
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Readers must not unlink the publisher's segment when they exit
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+class TelemetryPublisher:
+    """
+    Publishes the latest telemetry sample and a short history into shared memory.
+
+    Writes are guarded by a seqlock: the counter is odd while a write is in progress,
+    so readers never block the publisher and retry only when they race a write.
+    There is a single writer per segment. Consistency relies on the host keeping
+    the order of plain stores, as x86 does.
+    """
+    def __init__(self, name: str = DEFAULT_NAME, history: int = 256, replace: bool = False):
+        """
+        :param name: Name of the shared memory segment to create.
+        :param history: Number of past samples kept in the ring.
+        :param replace: Remove an existing segment of that name, e.g. one left by a
+                        crashed publisher. Its readers keep the old mapping and stop
+                        seeing updates, so only set this when no publisher owns it.
+        """
+        if not (1 <= history <= 0xFFFF):
+            raise ValueError("History must be between 1 and 65535 samples.")
+
+        size = _slot_offset(history)
+        try:
+            self.segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            if not replace:
+                raise FileExistsError(f"Shared memory segment {name} already exists; pass replace=True "
+                                      f"if no publisher owns it any more") from None
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.name = name
+        self.history = history
+        self._buffer = self.segment.buf
+        self._sequence = 0
+        self._published = 0
+        HEADER.pack_into(self._buffer, 0, HEADER_MAGIC, LAYOUT_VERSION, history, 0, 0)
+
+    def publish(self, sample: models.DataStreamResponse, received_at: Optional[float] = None):
+        """
+        Publishes one sample.
+
+        :param sample: DataStreamResponse to publish.
+        :param received_at: Host receive time, defaults to now.
+        """
+        self.publish_raw(sample.to_data_stream(), time.monotonic() if received_at is None else received_at)
+
+    def publish_raw(self, data_stream: bytes, received_at: float):
+        """
+        Publishes one raw 64-byte data stream.
+
+        :param data_stream: Data stream as received in a GETDATA response.
+        :param received_at: Host receive time.
+        """
+        buffer = self._buffer
+        self._sequence += 1
+        struct.pack_into("<Q", buffer, SEQUENCE_OFFSET, self._sequence)
+
+        SLOT.pack_into(buffer, _slot_offset(-1), received_at, data_stream)
+        SLOT.pack_into(buffer, _slot_offset(self._published % self.history), received_at, data_stream)
+        self._published += 1
+
+        self._sequence += 1
+        struct.pack_into("<QQ", buffer, SEQUENCE_OFFSET, self._sequence, self._published)
+
+    def close(self):
+        """Detaches from and removes the segment."""
+        self._buffer = None
+        self.segment.close()
+        # A reader sharing our resource tracker may have dropped the registration unlink expects
+        resource_tracker.register(self.segment._name, "shared_memory")
+        self.segment.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class TelemetryReader:
+    """
+    Lock-free reader of a segment written by TelemetryPublisher.
+
+    Any number of processes may attach. Reads copy straight out of the mapping and
+    never enter the kernel. A read that keeps finding a write in progress, because
+    the publisher died in the middle of one, raises DeadlineExceeded after
+    stall_timeout instead of spinning forever.
+    """
+    def __init__(self, name: str = DEFAULT_NAME, stall_timeout: float = DEFAULT_STALL_TIMEOUT):
+        """
+        :param name: Name of the shared memory segment to attach to.
+        :param stall_timeout: Seconds a read retries a write in progress before giving up.
+        """
+        self.name = name
+        self.stall_timeout = stall_timeout
+        self.segment = _attach(name)
+        self._buffer = self.segment.buf
+
+        magic, version, self.history, _, _ = HEADER.unpack_from(self._buffer)
+        if magic != HEADER_MAGIC or version != LAYOUT_VERSION:
+            raise ValueError(f"Shared memory segment {name} does not hold Storm32 telemetry")
+
+    @property
+    def published(self) -> int:
+        """Total number of samples published so far."""
+        return struct.unpack_from("<Q", self._buffer, SEQUENCE_OFFSET + 8)[0]
+
+    def read_raw(self) -> Optional[tuple]:
+        """
+        Returns the latest sample undecoded.
+
+        :return: Tuple of host receive time and raw data stream, None before the first publish.
+        """
+        buffer = self._buffer
+        stall = None
+        while True:
+            before, published = struct.unpack_from("<QQ", buffer, SEQUENCE_OFFSET)
+            if not before & 1:
+                received_at, data_stream = SLOT.unpack_from(buffer, _slot_offset(-1))
+                if struct.unpack_from("<Q", buffer, SEQUENCE_OFFSET)[0] == before:
+                    return (received_at, data_stream) if published else None
+            stall = self._check_stall(stall, before)
+
+    def read(self) -> Optional[tuple]:
+        """
+        Returns the latest sample.
+
+        :return: Tuple of host receive time and DataStreamResponse, None before the first publish.
+        """
+        latest = self.read_raw()
+        if latest is None:
+            return None
+        return latest[0], models.DataStreamResponse.from_data_stream(latest[1])
+
+    def read_history(self, count: Optional[int] = None) -> list:
+        """
+        Returns past samples, oldest first.
+
+        :param count: Maximum number of samples, defaults to the whole ring.
+        :return: List of (host receive time, DataStreamResponse) tuples.
+        """
+        buffer = self._buffer
+        stall = None
+        while True:
+            before, published = struct.unpack_from("<QQ", buffer, SEQUENCE_OFFSET)
+            if not before & 1:
+                available = min(published, self.history, self.history if count is None else count)
+                slots = [SLOT.unpack_from(buffer, _slot_offset(index % self.history))
+                         for index in range(published - available, published)]
+                if struct.unpack_from("<Q", buffer, SEQUENCE_OFFSET)[0] == before:
+                    break
+            stall = self._check_stall(stall, before)
+        return [(received_at, models.DataStreamResponse.from_data_stream(data_stream)) for received_at, data_stream in slots]
+
+    def _check_stall(self, stall: Optional[tuple], sequence: int) -> tuple:
+        """
+        Tracks retries of one read and raises once the counter has not moved for stall_timeout.
+
+        :param stall: (counter, deadline) returned by the previous call, None on the first retry.
+        :param sequence: Counter value seen by this attempt.
+        :return: State for the next call.
+        """
+        now = time.monotonic()
+        if stall is None or stall[0] != sequence:
+            return sequence, now + self.stall_timeout
+        if now >= stall[1]:
+            raise exceptions.DeadlineExceeded(f"Publisher of {self.name} stalled in the middle of a write")
+        return stall
+
+    def close(self):
+        """Detaches from the segment."""
+        self._buffer = None
+        self.segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,200 @@
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import models
+from storm32_gimbal_control import transport
+from storm32_gimbal_control import utils
+from dataclasses import replace
+from typing import Optional
+import os
+import select
+import struct
+import threading
+import time
+import tty
+
+def build_response(command: int, payload: bytes) -> bytes:
+    """
+    Builds a frame as sent by the gimbal.
+
+    :param command: Command ID of the response.
+    :param payload: Payload bytes.
+    :return: Complete frame including CRC.
+    """
+    frame = bytes([constants.STARTSIGNS.OUTGOING, len(payload), command]) + bytes(payload)
+    crc = utils.calculate_crc(frame)
+    return frame + bytes([crc & 0xFF, (crc >> 8) & 0xFF])
+
+def build_ack(code: int = 0) -> bytes:
+    """
+    Builds an ACK frame.
+
+    :param code: ACK code, see constants.ACK_CODES.
+    :return: Complete ACK frame.
+    """
+    return build_response(constants.CMD_ACK, bytes([code]))
+
+def default_data() -> models.DataStreamResponse:
+    """Returns a plausible resting DataStreamResponse."""
+    return models.DataStreamResponse.from_data_stream(bytes(64))
+
+class SimulatedGimbal(transport.ScriptedTransport):
+    """
+    In-process stand-in for a Storm32 controller.
+
+    It answers the serial protocol like the real board through an in-memory
+    transport, so it can be passed anywhere an open serial port is expected.
+    Responses scripted with expect() take precedence over handle().
+    """
+    def __init__(self, timeout: Optional[float] = 1.0, data: models.DataStreamResponse = None,
+                 version: models.VersionResponse = None, version_str: models.VersionStringResponse = None,
+                 parameters: dict = None, tick_seconds: float = 1e-4):
+        """
+        :param timeout: Read timeout in seconds, None blocks forever.
+        :param data: Live data returned by GETDATA.
+        :param version: Response to GETVERSION.
+        :param version_str: Response to GETVERSIONSTR.
+        :param parameters: Parameter table, parameter ID to value.
+        :param tick_seconds: Duration of one device timestamp tick.
+        """
+        super().__init__(timeout=timeout, responder=lambda command, payload: self.handle(command, payload))
+        self.data = data or default_data()
+        self.version = version or models.VersionResponse(firmware_version=96, setup_layout_version=1, board_capabilities=0)
+        self.version_str = version_str or models.VersionStringResponse(version="v0.96", name="Simulated", board="STorM32 sim")
+        self.parameters = dict(parameters or {})
+        self.tick_seconds = tick_seconds
+
+        self._started = time.monotonic()
+
+    def device_timestamp(self) -> int:
+        """Current device timestamp as the signed 16-bit value the firmware reports."""
+        ticks = int((time.monotonic() - self._started) / self.tick_seconds) & 0xFFFF
+        return ticks - 0x10000 if ticks & 0x8000 else ticks
+
+    def handle(self, command: int, payload: bytes) -> bytes:
+        """
+        Produces the response frame for one command.
+
+        :param command: Command ID received.
+        :param payload: Payload received.
+        :return: Response bytes.
+        """
+        if command == constants.CMD_GETVERSION:
+            return build_response(command, struct.pack("<3H", self.version.firmware_version,
+                                                       self.version.setup_layout_version,
+                                                       self.version.board_capabilities))
+
+        if command == constants.CMD_GETVERSIONSTR:
+            strings = (self.version_str.version, self.version_str.name, self.version_str.board)
+            return build_response(command, b"".join(s.encode("utf-8")[:16].ljust(16, b"\x00") for s in strings))
+
+        if command == constants.CMD_GETPARAMETER:
+            param_id, = struct.unpack("<H", payload[:2])
+            return build_response(command, struct.pack("<HH", param_id, self.parameters.get(param_id, 0) & 0xFFFF))
+
+        if command == constants.CMD_SETPARAMETER:
+            param_id, value = struct.unpack("<HH", payload[:4])
+            self.parameters[param_id] = value
+            return build_ack()
+
+        if command == constants.CMD_GETDATA:
+            self.data = replace(self.data, timestamp=self.device_timestamp())
+            return build_response(command, bytes([payload[0], 0x00]) + self.data.to_data_stream())
+
+        if command == constants.CMD_SETANGLE:
+            pitch, roll, yaw = struct.unpack("<3f", payload[:12])
+            self.data = replace(self.data, imu1_pitch=round(pitch, 2), imu1_roll=round(roll, 2), imu1_yaw=round(yaw, 2))
+            return build_ack()
+
+        if command in (constants.CMD_GETDATAFIELDS, constants.CMD_ACK):
+            return build_ack(3)
+
+        return build_ack()
+
+class RecordingGimbal(SimulatedGimbal):
+    """
+    SimulatedGimbal that keeps what crossed the link, for tests that check framing.
+
+    writes holds the bytes of each write() call, so coalesced frames show up as one
+    entry; responses holds each response frame the device produced.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault("timeout", 0.1)
+        super().__init__(**kwargs)
+        self.writes = []
+        self.responses = []
+
+    def write(self, data) -> int:
+        self.writes.append(bytes(data))
+        return super().write(data)
+
+    def handle(self, command: int, payload: bytes) -> bytes:
+        response = super().handle(command, payload)
+        self.responses.append(response)
+        return response
+
+class PtyGimbal:
+    """
+    Serves a SimulatedGimbal on a pseudo-terminal.
+
+    Code under test opens the port path with serial.Serial exactly as it would open
+    /dev/ttyACM0, so the whole kernel tty path is exercised. A pty moves bytes at
+    memory speed; with baudrate set, every response is held back by the time the
+    request and the response would take on a UART at that rate.
+    """
+    def __init__(self, device: SimulatedGimbal = None, transfer_latency: float = 0.0,
+                 baudrate: Optional[int] = None, bits_per_byte: int = 10):
+        """
+        :param device: Simulated device to serve, a default one if None.
+        :param transfer_latency: Seconds added per received transfer, e.g. 0.001 for a USB frame.
+        :param baudrate: Emulated UART rate in bits per second, None for no pacing.
+        :param bits_per_byte: Bits per byte on the wire, 10 for 8N1.
+        """
+        self.device = device or SimulatedGimbal()
+        self.device.timeout = 0
+        self.transfer_latency = transfer_latency
+        self.baudrate = baudrate
+        self.bits_per_byte = bits_per_byte
+        self.transfers = 0
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name="pty-gimbal", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _serve(self):
+        while self._running:
+            readable, _, _ = select.select([self._master], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            self.transfers += 1
+            if self.transfer_latency:
+                time.sleep(self.transfer_latency)
+            self.device.write(data)
+            response = self.device.read(self.device.in_waiting)
+            if self.baudrate:
+                time.sleep((len(data) + len(response)) * self.bits_per_byte / self.baudrate)
+            if response:
+                os.write(self._master, response)
@@ -0,0 +1,222 @@
+from storm32_gimbal_control import models
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+import math
+import struct
+import time
+
+DEFAULT_FIELDS = ("imu_acc_confidence", "cycle_time", "i2c_errors", "lipo_voltage")
+DEFAULT_WINDOWS = (1.0, 10.0, 60.0)
+
+@dataclass
+class WindowSummary:
+    """Statistics over one window."""
+    count: int
+    mean: float
+    stddev: float
+    minimum: float
+    maximum: float
+
+class RollingStats:
+    """
+    Mean, standard deviation, minimum and maximum over a sliding time window.
+
+    Every update is O(1) amortized: mean and variance are kept with Welford's method,
+    applied in reverse as samples leave the window, and minimum and maximum with
+    monotonic deques. Memory is bounded by max_samples; at higher rates the oldest
+    samples leave the window early.
+    """
+    def __init__(self, window: float, max_samples: int = 4096):
+        """
+        :param window: Window length in seconds.
+        :param max_samples: Most samples kept in the window.
+        """
+        self.window = window
+        self.max_samples = max_samples
+        self._samples = deque()
+        self._minimums = deque()
+        self._maximums = deque()
+        self._sequence = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float, now: float):
+        """
+        Adds one value and drops the ones that left the window.
+
+        :param value: New value.
+        :param now: Time of the value in seconds, non-decreasing.
+        """
+        self.expire(now)
+        if len(self._samples) == self.max_samples:
+            self._remove_oldest()
+
+        self._sequence += 1
+        self._samples.append((self._sequence, now, value))
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+
+        while self._minimums and self._minimums[-1][1] >= value:
+            self._minimums.pop()
+        self._minimums.append((self._sequence, value))
+        while self._maximums and self._maximums[-1][1] <= value:
+            self._maximums.pop()
+        self._maximums.append((self._sequence, value))
+
+    def expire(self, now: float):
+        """Drops values older than the window."""
+        horizon = now - self.window
+        while self._samples and self._samples[0][1] <= horizon:
+            self._remove_oldest()
+
+    def summary(self) -> Optional[WindowSummary]:
+        """Current statistics, None for an empty window."""
+        if not self._count:
+            return None
+        variance = self._m2 / (self._count - 1) if self._count > 1 else 0.0
+        return WindowSummary(count=self._count, mean=self._mean, stddev=math.sqrt(variance),
+                             minimum=self._minimums[0][1], maximum=self._maximums[0][1])
+
+    def _remove_oldest(self):
+        sequence, _, value = self._samples.popleft()
+        if self._minimums and self._minimums[0][0] == sequence:
+            self._minimums.popleft()
+        if self._maximums and self._maximums[0][0] == sequence:
+            self._maximums.popleft()
+
+        self._count -= 1
+        if not self._count:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        previous_mean = self._mean
+        self._mean = (previous_mean * (self._count + 1) - value) / self._count
+        self._m2 = max(0.0, self._m2 - (value - previous_mean) * (value - self._mean))
+
+class TelemetryAggregator:
+    """
+    Keeps RollingStats for several telemetry fields over several windows.
+    """
+    def __init__(self, fields: tuple = DEFAULT_FIELDS, windows: tuple = DEFAULT_WINDOWS, max_rate: float = 200.0):
+        """
+        :param fields: DataStreamResponse attribute names to track.
+        :param windows: Window lengths in seconds.
+        :param max_rate: Highest expected sample rate, sizes the fixed window buffers.
+        """
+        self.fields = tuple(fields)
+        self.windows = tuple(windows)
+        self._stats = {
+            field: {window: RollingStats(window, max(1, math.ceil(window * max_rate))) for window in self.windows}
+            for field in self.fields
+        }
+
+    def update(self, sample: models.DataStreamResponse, received_at: Optional[float] = None):
+        """
+        Adds one sample.
+
+        :param sample: Decoded DataStreamResponse.
+        :param received_at: Sample time, defaults to now.
+        """
+        now = time.monotonic() if received_at is None else received_at
+        for field, windows in self._stats.items():
+            value = getattr(sample, field)
+            for stats in windows.values():
+                stats.add(value, now)
+
+    def summary(self, now: Optional[float] = None) -> dict:
+        """
+        :param now: Expire values older than the windows at this time first.
+        :return: Nested dict field -> window -> WindowSummary (None if empty).
+        """
+        result = {}
+        for field, windows in self._stats.items():
+            result[field] = {}
+            for window, stats in windows.items():
+                if now is not None:
+                    stats.expire(now)
+                result[field][window] = stats.summary()
+        return result
+
+# Data stream values that are states, bit fields, counters or clocks; a decimated
+# sample carries their latest value instead of an average
+_LATEST_VALUE_INDICES = (0, 1, 2, 3, 5, 31)
+# IMU1, IMU2 and magnetometer angles in centidegrees; averaged on the circle so that
+# +179 and -179 degrees average to 180, not 0
+_ANGLE_INDICES = (16, 17, 18, 25, 26, 27, 28, 29)
+_CENTIDEGREES_TO_RADIANS = math.pi / 18000.0
+
+class Downsampler:
+    """
+    Decimates the telemetry stream for low-bandwidth links.
+
+    Samples are grouped into intervals; at the end of each interval one
+    DataStreamResponse is emitted. In "mean" mode it averages the measurements, with
+    a circular mean for the angles, and keeps the latest state, status, error
+    counter and timestamp values; in "last" mode it is simply the last sample of
+    the interval.
+    """
+    def __init__(self, interval: float, callback: Callable[[models.DataStreamResponse, float], None], mode: str = "mean"):
+        """
+        :param interval: Output period in seconds.
+        :param callback: Called as callback(sample, time) for every output sample.
+        :param mode: "mean" or "last".
+        """
+        if mode not in ("mean", "last"):
+            raise ValueError("Mode must be 'mean' or 'last'.")
+        self.interval = interval
+        self.callback = callback
+        self.mode = mode
+        self._sums = [0] * 32
+        self._sines = [0.0] * len(_ANGLE_INDICES)
+        self._cosines = [0.0] * len(_ANGLE_INDICES)
+        self._count = 0
+        self._last = None
+        self._interval_end = None
+
+    def update(self, sample: models.DataStreamResponse, received_at: Optional[float] = None):
+        """
+        Adds one sample.
+
+        :param sample: Decoded DataStreamResponse.
+        :param received_at: Sample time, defaults to now.
+        """
+        now = time.monotonic() if received_at is None else received_at
+        if self._interval_end is None:
+            self._interval_end = now + self.interval
+        elif now >= self._interval_end:
+            self._emit(self._interval_end)
+            self._interval_end += self.interval * (math.floor((now - self._interval_end) / self.interval) + 1)
+
+        self._last = sample
+        self._count += 1
+        if self.mode == "mean":
+            values = struct.unpack("<32h", sample.to_data_stream())
+            for index, value in enumerate(values):
+                self._sums[index] += value
+            for slot, index in enumerate(_ANGLE_INDICES):
+                angle = values[index] * _CENTIDEGREES_TO_RADIANS
+                self._sines[slot] += math.sin(angle)
+                self._cosines[slot] += math.cos(angle)
+
+    def _emit(self, interval_end: float):
+        if not self._count:
+            return
+        if self.mode == "last":
+            output = self._last
+        else:
+            values = [round(total / self._count) for total in self._sums]
+            for slot, index in enumerate(_ANGLE_INDICES):
+                values[index] = round(math.atan2(self._sines[slot], self._cosines[slot]) / _CENTIDEGREES_TO_RADIANS)
+            latest = struct.unpack("<32h", self._last.to_data_stream())
+            for index in _LATEST_VALUE_INDICES:
+                values[index] = latest[index]
+            output = models.DataStreamResponse.from_data_stream(struct.pack("<32h", *values))
+        self._sums = [0] * 32
+        self._sines = [0.0] * len(_ANGLE_INDICES)
+        self._cosines = [0.0] * len(_ANGLE_INDICES)
+        self._count = 0
+        self.callback(output, interval_end)
@@ -0,0 +1,288 @@
+from storm32_gimbal_control import core
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import stats
+from storm32_gimbal_control import transport
+from dataclasses import dataclass, field
+from typing import Optional
+import logging
+import math
+import threading
+import time
+
+logger_tracking = logging.getLogger("LoggerTracking")
+
+AXES = ("pitch", "roll", "yaw")
+
+@dataclass
+class TrackingTarget:
+    """Target orientation in degrees and its rate of change in degrees per second."""
+    pitch: float = 0.0
+    roll: float = 0.0
+    yaw: float = 0.0
+    pitch_rate: float = 0.0
+    roll_rate: float = 0.0
+    yaw_rate: float = 0.0
+    time: Optional[float] = None
+
+    def predict(self, axis: str, at: float) -> float:
+        """Angle of one axis extrapolated to host time at."""
+        angle = getattr(self, axis)
+        if self.time is None:
+            return angle
+        return angle + getattr(self, axis + "_rate") * (at - self.time)
+
+@dataclass
+class AxisGains:
+    """
+    Outer-loop gains of one axis, on top of the gimbal's own angle controller.
+
+    :param kp: Correction in degrees per degree of pointing error.
+    :param ki: Correction in degrees per degree-second of accumulated error.
+    :param feedforward: Fraction of the target rate added ahead of the target.
+    :param max_correction: Limit of the feedback correction in degrees.
+    :param pid_limit: |pid_*| at which the motor is considered saturated; the
+                      integral is frozen while it is. None disables the check.
+    """
+    kp: float = 0.5
+    ki: float = 0.0
+    feedforward: float = 1.0
+    max_correction: float = 10.0
+    pid_limit: Optional[float] = None
+
+@dataclass
+class LoopStats:
+    """Counters and timing of the tracking loop. Times are in seconds."""
+    iterations: int = 0
+    deadline_misses: int = 0
+    skipped_ticks: int = 0
+    feedback_errors: int = 0
+    stale_feedback: int = 0
+    command_errors: int = 0
+    saturated: int = 0
+    max_lateness: float = 0.0
+    max_busy: float = 0.0
+    lateness: stats.RollingStats = field(default_factory=lambda: stats.RollingStats(10.0))
+    busy: stats.RollingStats = field(default_factory=lambda: stats.RollingStats(10.0))
+    interval: stats.RollingStats = field(default_factory=lambda: stats.RollingStats(10.0))
+
+    def timing(self) -> dict:
+        """
+        :return: Dict with WindowSummary of the tick start lateness ("lateness"), the
+                 time spent per tick ("busy") and the time between tick starts
+                 ("interval") over the last 10 seconds.
+        """
+        return {"lateness": self.lateness.summary(), "busy": self.busy.summary(), "interval": self.interval.summary()}
+
+def _wrap(angle: float) -> float:
+    """Wraps an angle difference into [-180, 180)."""
+    return (angle + 180.0) % 360.0 - 180.0
+
+class TrackingController:
+    """
+    Fixed-period closed loop pointing the gimbal at a moving target.
+
+    Every tick the controller reads IMU1 angles with GETDATA, compares them with the
+    target extrapolated to the time the sample arrived, and sends a SETANGLE setpoint
+    made of the target extrapolated to when the setpoint takes effect plus a PI
+    correction. Each exchange has its own deadline inside the period, so a silent or
+    slow link costs one stale tick instead of stalling the loop.
+
+    Ticks are scheduled on an absolute time grid. A tick that overruns the next start
+    counts as a deadline miss; the ticks it overlapped are skipped rather than sent
+    back to back.
+
+    Feedback can come from telemetry received elsewhere instead of polling: construct
+    with poll_feedback=False and pass feed() as a TelemetryGateway sink.
+    """
+    def __init__(self, serial_port: transport.Transport, period: float = 0.02, gains: Optional[dict] = None,
+                 flags: models.SetAngleFlags = models.SetAngleFlags(0), poll_feedback: bool = True,
+                 feedback_timeout: Optional[float] = None, command_timeout: Optional[float] = None,
+                 lead: Optional[float] = None, max_feedback_age: Optional[float] = None):
+        """
+        :param serial_port: Open serial port connection
+        :param period: Loop period in seconds
+        :param gains: Optional axis name ("pitch", "roll", "yaw") to AxisGains
+        :param flags: SetAngleFlags sent with every setpoint
+        :param poll_feedback: Poll GETDATA every tick; if False, samples come from feed()
+        :param feedback_timeout: Budget of the GETDATA exchange, 40 % of the period by default
+        :param command_timeout: Budget of the SETANGLE exchange, 40 % of the period by default
+        :param lead: How far ahead of the tick the setpoint is extrapolated, one period by default
+        :param max_feedback_age: Samples older than this are not used, three periods by default
+        """
+        if period <= 0:
+            raise ValueError("Period must be positive.")
+        if not isinstance(flags, models.SetAngleFlags):
+            raise ValueError("Invalid flags. Use SetAngleFlags enum values.")
+
+        self.serial_port = serial_port
+        self.period = period
+        self.gains = {axis: AxisGains() for axis in AXES}
+        self.gains.update(gains or {})
+        self.flags = flags
+        self.poll_feedback = poll_feedback
+        self.feedback_timeout = 0.4 * period if feedback_timeout is None else feedback_timeout
+        self.command_timeout = 0.4 * period if command_timeout is None else command_timeout
+        self.lead = period if lead is None else lead
+        self.max_feedback_age = 3 * period if max_feedback_age is None else max_feedback_age
+        self.stats = LoopStats()
+        self.setpoint = None
+
+        self._target = TrackingTarget()
+        self._target_lock = threading.Lock()
+        self._feedback = None
+        self._integral = {axis: 0.0 for axis in AXES}
+        self._last_step = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def set_target(self, pitch: float, roll: float, yaw: float, pitch_rate: float = 0.0,
+                   roll_rate: float = 0.0, yaw_rate: float = 0.0, at: Optional[float] = None):
+        """
+        Replaces the target. Safe to call from any thread.
+
+        :param at: Host time the angles are valid at, defaults to now.
+        """
+        target = TrackingTarget(pitch, roll, yaw, pitch_rate, roll_rate, yaw_rate,
+                                time.monotonic() if at is None else at)
+        with self._target_lock:
+            self._target = target
+
+    @property
+    def target(self) -> TrackingTarget:
+        with self._target_lock:
+            return self._target
+
+    def feed(self, sample: models.DataStreamResponse, received_at: Optional[float] = None):
+        """
+        Provides one feedback sample.
+
+        :param sample: Decoded DataStreamResponse.
+        :param received_at: Sample time, defaults to now.
+        """
+        self._feedback = (sample, time.monotonic() if received_at is None else received_at)
+
+    def step(self, now: Optional[float] = None) -> tuple:
+        """
+        Runs one tick: feedback, control law and setpoint. Called by the loop thread;
+        call it directly to drive the controller from an external scheduler.
+
+        :param now: Host time of the tick, defaults to now.
+        :return: (pitch, roll, yaw) setpoint sent
+        """
+        started = time.monotonic()
+        now = started if now is None else now
+        if self.poll_feedback:
+            try:
+                sample = core.get_data(self.serial_port, 0, self.feedback_timeout)
+                if not isinstance(sample, models.DataStreamResponse):
+                    raise ValueError(f"Expected live data, received {sample!r}")
+                self.feed(sample, now + time.monotonic() - started)
+            except (TimeoutError, ValueError, exceptions.AckError) as error:
+                self.stats.feedback_errors += 1
+                logger_tracking.debug(f"Feedback failed: {error}")
+
+        setpoint = self.compute(now)
+        try:
+            core.set_angle(self.serial_port, *setpoint, self.flags, self.command_timeout)
+        except (TimeoutError, ValueError, exceptions.AckError) as error:
+            self.stats.command_errors += 1
+            logger_tracking.debug(f"Setpoint failed: {error}")
+        self.setpoint = setpoint
+        return setpoint
+
+    def compute(self, now: float) -> tuple:
+        """
+        Control law without I/O: the setpoint for a tick at host time now.
+
+        :return: (pitch, roll, yaw) in degrees
+        """
+        target = self.target
+        dt = 0.0 if self._last_step is None else max(0.0, now - self._last_step)
+        self._last_step = now
+
+        sample, received_at = self._feedback or (None, None)
+        fresh = sample is not None and now - received_at <= self.max_feedback_age
+        if sample is not None and not fresh:
+            self.stats.stale_feedback += 1
+
+        setpoint = []
+        for axis in AXES:
+            gains = self.gains[axis]
+            base = getattr(target, axis)
+            ahead = target.predict(axis, now + self.lead) - base
+            command = base + gains.feedforward * ahead
+
+            correction = gains.ki * self._integral[axis]
+            if fresh:
+                error = _wrap(target.predict(axis, received_at) - getattr(sample, "imu1_" + axis))
+                saturated = gains.pid_limit is not None and abs(getattr(sample, "pid_" + axis)) >= gains.pid_limit
+                if saturated:
+                    self.stats.saturated += 1
+                elif gains.ki:
+                    limit = gains.max_correction / gains.ki
+                    self._integral[axis] = max(-limit, min(limit, self._integral[axis] + error * dt))
+                correction = gains.kp * error + gains.ki * self._integral[axis]
+
+            correction = max(-gains.max_correction, min(gains.max_correction, correction))
+            setpoint.append(command + correction)
+
+        setpoint[2] = _wrap(setpoint[2])
+        return tuple(setpoint)
+
+    def reset(self):
+        """Clears the integral terms and the feedback sample."""
+        self._integral = {axis: 0.0 for axis in AXES}
+        self._feedback = None
+        self._last_step = None
+
+    def start(self):
+        """Starts the loop thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="tracking-controller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the loop thread after the current tick."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        loop_stats = self.stats
+        scheduled = time.monotonic()
+        previous_start = None
+        while not self._stop.is_set():
+            start = time.monotonic()
+            lateness = start - scheduled
+            loop_stats.lateness.add(lateness, start)
+            loop_stats.max_lateness = max(loop_stats.max_lateness, lateness)
+            if previous_start is not None:
+                loop_stats.interval.add(start - previous_start, start)
+            previous_start = start
+
+            try:
+                self.step(start)
+            except Exception:
+                logger_tracking.exception("Tracking step failed")
+
+            end = time.monotonic()
+            loop_stats.busy.add(end - start, end)
+            loop_stats.max_busy = max(loop_stats.max_busy, end - start)
+            loop_stats.iterations += 1
+
+            scheduled += self.period
+            if end > scheduled:
+                skipped = math.floor((end - scheduled) / self.period) + 1
+                loop_stats.deadline_misses += 1
+                loop_stats.skipped_ticks += skipped
+                scheduled += skipped * self.period
+            self._stop.wait(max(0.0, scheduled - time.monotonic()))
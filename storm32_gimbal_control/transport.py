@@ -0,0 +1,237 @@
+from storm32_gimbal_control import constants
+from collections import deque
+from typing import Callable, Optional, Protocol, Union, runtime_checkable
+import threading
+import time
+
+@runtime_checkable
+class Transport(Protocol):
+    """
+    Byte link to the gimbal: the part of the serial.Serial interface the library uses.
+
+    An open serial.Serial satisfies it as is. read() follows pyserial semantics: it
+    returns once size bytes are available or timeout seconds have passed, possibly
+    with fewer bytes; a timeout of None blocks and 0 never waits. reset_input_buffer()
+    is optional and only used to resynchronize after a failed exchange.
+    """
+    timeout: Optional[float]
+
+    def write(self, data) -> int:
+        ...
+
+    def read(self, size: int = 1) -> bytes:
+        ...
+
+class TransportWrapper:
+    """
+    Base of transports that wrap another one and change part of its behaviour.
+
+    timeout, read(), write() and every attribute a subclass does not define come
+    from the wrapped port, so a wrapper stands in for it wherever a port is taken.
+    """
+    def __init__(self, serial_port: Transport):
+        """
+        :param serial_port: Transport to wrap, e.g. an open serial.Serial.
+        """
+        self.serial_port = serial_port
+
+    @property
+    def timeout(self) -> Optional[float]:
+        return self.serial_port.timeout
+
+    @timeout.setter
+    def timeout(self, value: Optional[float]):
+        self.serial_port.timeout = value
+
+    def write(self, data) -> int:
+        return self.serial_port.write(data)
+
+    def read(self, size: int = 1) -> bytes:
+        return self.serial_port.read(size)
+
+    def __getattr__(self, name):
+        # Only reached for attributes missing here; serial_port itself missing means __init__ has not run
+        if name == "serial_port":
+            raise AttributeError(name)
+        return getattr(self.serial_port, name)
+
+class BytePipe:
+    """One-way, thread-safe byte buffer with timed reads."""
+    def __init__(self):
+        self._buffer = bytearray()
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._buffer)
+
+    def put(self, data):
+        with self._condition:
+            self._buffer += data
+            self._condition.notify_all()
+
+    def get(self, size: int, timeout: Optional[float]) -> bytes:
+        """Returns up to size bytes, waiting at most timeout seconds for all of them."""
+        with self._condition:
+            if len(self._buffer) < size and timeout != 0:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while len(self._buffer) < size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            chunk = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return chunk
+
+    def clear(self):
+        with self._condition:
+            self._buffer.clear()
+
+class LoopbackTransport:
+    """
+    One end of an in-memory duplex link, see loopback_pair().
+
+    Implements the Transport interface plus the rest of the serial.Serial surface the
+    library touches (in_waiting, buffer resets, flush, close), so either end can
+    stand in for an open serial port.
+    """
+    def __init__(self, incoming: BytePipe, outgoing: BytePipe, timeout: Optional[float] = 1.0):
+        """
+        :param incoming: Pipe this end reads from.
+        :param outgoing: Pipe this end writes to.
+        :param timeout: Read timeout in seconds, None blocks forever.
+        """
+        self.timeout = timeout
+        self.is_open = True
+        self._incoming = incoming
+        self._outgoing = outgoing
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._incoming)
+
+    def write(self, data) -> int:
+        self._outgoing.put(data)
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        return self._incoming.get(size, self.timeout)
+
+    def reset_input_buffer(self):
+        self._incoming.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+def loopback_pair(timeout: Optional[float] = 1.0) -> tuple:
+    """
+    Creates the two ends of an in-memory duplex link.
+
+    :param timeout: Read timeout of both ends.
+    :return: (host, device); bytes written to one end are read from the other.
+    """
+    host_to_device, device_to_host = BytePipe(), BytePipe()
+    return (LoopbackTransport(device_to_host, host_to_device, timeout),
+            LoopbackTransport(host_to_device, device_to_host, timeout))
+
+def split_frames(buffer: bytearray):
+    """
+    Yields complete (command, payload) host frames from buffer and removes them.
+
+    Bytes before a start sign are dropped; an incomplete frame is left in place.
+    """
+    while True:
+        start = buffer.find(constants.STARTSIGNS.INCOMING)
+        if start < 0:
+            buffer.clear()
+            return
+        del buffer[:start]
+        if len(buffer) < 3:
+            return
+        length = buffer[1]
+        if len(buffer) < length + 5:
+            return
+        command = buffer[2]
+        payload = bytes(buffer[3:3 + length])
+        del buffer[:length + 5]
+        yield command, payload
+
+# A scripted response: raw bytes, None for no answer, or a callable(command, payload) returning either
+Response = Union[bytes, None, Callable[[int, bytes], Optional[bytes]]]
+
+class ScriptedTransport(LoopbackTransport):
+    """
+    Host end of a loopback whose device answers each command frame from a script.
+
+    Frames written to it are split out and answered in order by the scripted
+    responses; once the script runs out, the responder is used. A None response, or
+    no responder, sends nothing, so the host read runs into its timeout just as with
+    a silent gimbal.
+    """
+    def __init__(self, responses: tuple = (), timeout: Optional[float] = 1.0,
+                 responder: Optional[Callable[[int, bytes], Optional[bytes]]] = None):
+        """
+        :param responses: Responses for the first frames, see expect().
+        :param timeout: Read timeout in seconds, None blocks forever.
+        :param responder: callable(command, payload) answering frames beyond the script.
+        """
+        super().__init__(BytePipe(), BytePipe(), timeout)
+        self.responder = responder
+        self.received = []
+        self._script = deque()
+        self._pending = bytearray()
+        self._lock = threading.Lock()
+        for response in responses:
+            self.expect(response)
+
+    def expect(self, response: Response, command: Optional[int] = None):
+        """
+        Appends one response to the script.
+
+        :param response: Bytes to send back, None to stay silent, or a callable(command, payload).
+        :param command: If given, the frame answered must carry this command ID.
+        """
+        self._script.append((command, response))
+
+    @property
+    def unused(self) -> int:
+        """Scripted responses not consumed yet."""
+        return len(self._script)
+
+    def write(self, data) -> int:
+        """Accepts bytes sent by the host and queues the responses."""
+        with self._lock:
+            self._pending += data
+            for command, payload in split_frames(self._pending):
+                self.received.append((command, payload))
+                response = self.respond(command, payload)
+                if response:
+                    self._incoming.put(response)
+        return len(data)
+
+    def respond(self, command: int, payload: bytes) -> Optional[bytes]:
+        """Produces the answer to one frame from the script or the responder."""
+        if self._script:
+            expected, response = self._script.popleft()
+            if expected is not None and expected != command:
+                raise AssertionError(f"Scripted response expects command {expected:#04x}, got {command:#04x}")
+        elif self.responder is not None:
+            response = self.responder
+        else:
+            return None
+        return response(command, payload) if callable(response) else response
+
+    def inject(self, data: bytes):
+        """Queues raw bytes as if the device had sent them unprompted."""
+        self._incoming.put(data)
+
+    def reset_output_buffer(self):
+        with self._lock:
+            self._pending.clear()
@@ -0,0 +1,225 @@
+from storm32_gimbal_control import models
+from dataclasses import dataclass, fields
+from typing import Callable, Optional
+import logging
+import math
+import queue
+import threading
+import time
+
+logger_triggers = logging.getLogger("LoggerTriggers")
+
+_SAMPLE_FIELDS = {field.name for field in fields(models.DataStreamResponse)}
+# Level rules compare against limits, so they need a scalar field
+_NUMERIC_FIELDS = {field.name for field in fields(models.DataStreamResponse) if field.type in (int, float)}
+
+# Level rules stay active while their condition holds; edge rules fire once per sample that matches
+LEVEL_KINDS = ("below", "above", "outside")
+EDGE_KINDS = ("changed", "increased")
+
+@dataclass(frozen=True)
+class Rule:
+    """A condition on one DataStreamResponse field."""
+    name: str
+    field: str
+    kind: str
+    callback: Callable
+    low: Optional[float] = None
+    high: Optional[float] = None
+    hysteresis: float = 0.0
+    debounce: float = 0.0
+    on_clear: Optional[Callable] = None
+
+@dataclass
+class TriggerEvent:
+    """Passed to rule callbacks."""
+    rule: Rule
+    sample: models.DataStreamResponse
+    previous: Optional[models.DataStreamResponse]
+    time: float
+    active: bool
+
+def below(field: str, limit: float, callback: Callable, hysteresis: float = 0.0, debounce: float = 0.0,
+          on_clear: Optional[Callable] = None, name: Optional[str] = None) -> Rule:
+    """
+    Fires when field drops below limit and clears once it is back above limit + hysteresis.
+
+    :param debounce: Seconds the condition must hold before the rule fires.
+    """
+    return Rule(name or f"{field} below {limit}", field, "below", callback, low=limit,
+                hysteresis=hysteresis, debounce=debounce, on_clear=on_clear)
+
+def above(field: str, limit: float, callback: Callable, hysteresis: float = 0.0, debounce: float = 0.0,
+          on_clear: Optional[Callable] = None, name: Optional[str] = None) -> Rule:
+    """
+    Fires when field rises above limit and clears once it is back below limit - hysteresis.
+
+    :param debounce: Seconds the condition must hold before the rule fires.
+    """
+    return Rule(name or f"{field} above {limit}", field, "above", callback, high=limit,
+                hysteresis=hysteresis, debounce=debounce, on_clear=on_clear)
+
+def outside(field: str, low: float, high: float, callback: Callable, hysteresis: float = 0.0,
+            debounce: float = 0.0, on_clear: Optional[Callable] = None, name: Optional[str] = None) -> Rule:
+    """
+    Fires when field leaves the [low, high] envelope and clears once it is back inside
+    the envelope shrunk by hysteresis.
+
+    :param debounce: Seconds the condition must hold before the rule fires.
+    """
+    return Rule(name or f"{field} outside [{low}, {high}]", field, "outside", callback, low=low, high=high,
+                hysteresis=hysteresis, debounce=debounce, on_clear=on_clear)
+
+def changed(field: str, callback: Callable, name: Optional[str] = None) -> Rule:
+    """Fires on every sample where field differs from the previous sample."""
+    return Rule(name or f"{field} changed", field, "changed", callback)
+
+def increased(field: str, callback: Callable, name: Optional[str] = None) -> Rule:
+    """Fires on every sample where field is larger than in the previous sample."""
+    return Rule(name or f"{field} increased", field, "increased", callback)
+
+def _condition_source(rule: Rule, bit: int) -> str:
+    value = f"sample.{rule.field}"
+    if rule.kind == "changed":
+        return f"previous is not None and {value} != previous.{rule.field}"
+    if rule.kind == "increased":
+        return f"previous is not None and {value} > previous.{rule.field}"
+
+    low = None if rule.low is None else float(rule.low)
+    high = None if rule.high is None else float(rule.high)
+    margin = float(rule.hysteresis)
+    if rule.kind == "below":
+        return f"({value} < {low!r}) if not active & {bit} else ({value} < {low + margin!r})"
+    if rule.kind == "above":
+        return f"({value} > {high!r}) if not active & {bit} else ({value} > {high - margin!r})"
+    return (f"not ({low!r} <= {value} <= {high!r}) if not active & {bit} "
+            f"else not ({low + margin!r} <= {value} <= {high - margin!r})")
+
+def compile_rules(rules: list) -> Callable:
+    """
+    Compiles rules into one predicate.
+
+    :param rules: Rules, bit i of the result belongs to rules[i].
+    :return: predicate(sample, previous, active) returning the bit mask of matching
+             conditions; active is the mask of level rules currently active, used to
+             apply hysteresis.
+    """
+    lines = ["def predicate(sample, previous, active):", "    bits = 0"]
+    for index, rule in enumerate(rules):
+        if rule.field not in _SAMPLE_FIELDS:
+            raise ValueError(f"Unknown DataStreamResponse field: {rule.field}")
+        if rule.kind not in LEVEL_KINDS + EDGE_KINDS:
+            raise ValueError(f"Unknown rule kind: {rule.kind}")
+        if rule.kind in LEVEL_KINDS:
+            if rule.field not in _NUMERIC_FIELDS:
+                raise ValueError(f"{rule.kind} rule needs a numeric field, {rule.field} is not")
+            # Limits are written into the source, where inf and nan would not parse back
+            for limit in (rule.low, rule.high, rule.hysteresis):
+                if limit is not None and not math.isfinite(limit):
+                    raise ValueError(f"Limits of rule {rule.name} must be finite, got {limit}")
+        lines.append(f"    if {_condition_source(rule, 1 << index)}:")
+        lines.append(f"        bits |= {1 << index}")
+    lines.append("    return bits")
+
+    namespace = {}
+    exec(compile("\n".join(lines), "<storm32 trigger rules>", "exec"), namespace)
+    return namespace["predicate"]
+
+class TriggerEngine:
+    """
+    Evaluates declared rules on every telemetry sample.
+
+    All conditions are evaluated by a single compiled predicate; per-rule work only
+    happens when a condition changes. Callbacks run on a dispatcher thread, so a slow
+    handler never stalls the thread feeding samples. If handlers fall behind by more
+    than max_pending events, further events are dropped and counted.
+    """
+    def __init__(self, rules: list, max_pending: int = 1024):
+        """
+        :param rules: Rules built with below(), above(), outside(), changed() and increased().
+        :param max_pending: Most events waiting for dispatch.
+        """
+        self.rules = list(rules)
+        self.stats = {"samples": 0, "events": 0, "dropped": 0, "callback_errors": 0}
+
+        self._predicate = compile_rules(self.rules)
+        self._edge_mask = sum(1 << index for index, rule in enumerate(self.rules) if rule.kind in EDGE_KINDS)
+        self._active = 0
+        self._pending_since = {}
+        self._previous = None
+
+        self._events = queue.Queue(max_pending)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="trigger-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def feed(self, sample: models.DataStreamResponse, received_at: Optional[float] = None):
+        """
+        Evaluates one sample against every rule.
+
+        :param sample: Decoded DataStreamResponse.
+        :param received_at: Sample time, defaults to now.
+        """
+        now = time.monotonic() if received_at is None else received_at
+        previous = self._previous
+        self._previous = sample
+        self.stats["samples"] += 1
+
+        matched = self._predicate(sample, previous, self._active)
+        if matched == self._active and not self._pending_since:
+            return
+
+        for index, rule in enumerate(self.rules):
+            bit = 1 << index
+            if bit & self._edge_mask:
+                if matched & bit:
+                    self._queue_event(rule.callback, TriggerEvent(rule, sample, previous, now, True))
+            elif matched & bit and not self._active & bit:
+                since = self._pending_since.setdefault(index, now)
+                if now - since >= rule.debounce:
+                    del self._pending_since[index]
+                    self._active |= bit
+                    self._queue_event(rule.callback, TriggerEvent(rule, sample, previous, now, True))
+            elif not matched & bit:
+                self._pending_since.pop(index, None)
+                if self._active & bit:
+                    self._active &= ~bit
+                    if rule.on_clear is not None:
+                        self._queue_event(rule.on_clear, TriggerEvent(rule, sample, previous, now, False))
+
+    def is_active(self, name: str) -> bool:
+        """Whether the level rule with this name is currently active."""
+        for index, rule in enumerate(self.rules):
+            if rule.name == name:
+                return bool(self._active & (1 << index))
+        raise KeyError(name)
+
+    def join(self):
+        """Waits until every queued callback has run."""
+        self._events.join()
+
+    def close(self):
+        """Runs the remaining callbacks and stops the dispatcher."""
+        self._events.put(None)
+        self._dispatcher.join()
+
+    def _queue_event(self, callback: Callable, event: TriggerEvent):
+        self.stats["events"] += 1
+        try:
+            self._events.put_nowait((callback, event))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _dispatch(self):
+        while True:
+            item = self._events.get()
+            try:
+                if item is None:
+                    return
+                callback, event = item
+                try:
+                    callback(event)
+                except Exception:
+                    self.stats["callback_errors"] += 1
+                    logger_triggers.exception(f"Callback of rule {event.rule.name!r} failed")
+            finally:
+                self._events.task_done()
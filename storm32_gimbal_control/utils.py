@@ -1,4 +1,4 @@
-import serial
+from storm32_gimbal_control import transport
 from storm32_gimbal_control import utils
 from storm32_gimbal_control import constants
 from storm32_gimbal_control import models
@@ -6,6 +6,7 @@ from storm32_gimbal_control import exceptions
 from typing import Optional, Union
 import logging
 import struct
+import time
 
 logger_serial = logging.getLogger("LoggerSerial")
 logger_response = logging.getLogger("LoggerResponse")
@@ -39,6 +40,33 @@ def configure_logging(enable: bool = True, level=logging.INFO):
     logger_serial.setLevel(log_level)
     logger_response.setLevel(log_level)
 
+def _build_crc_table():
+    table = []
+    for index in range(256):
+        crc = index
+        for _ in range(8):
+            if (crc & 0x0001):
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+CRC_TABLE = _build_crc_table()
+
+def update_crc(crc, data):
+    """
+    Continues a CRC calculation over more data, one table lookup per byte.
+    
+    :param crc: CRC of the data before, 0xFFFF to start.
+    :param data: Data to add.
+    :return: Updated CRC value.
+    """
+    table = CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
 def calculate_crc(data):
     """
     CRC calculation function.
@@ -46,15 +74,7 @@ def calculate_crc(data):
     :param data: Data to calculate CRC for.
     :return: Calculated CRC value.
     """
-    crc = 0xFFFF 
-    for byte in data:
-        crc ^= byte
-        for _ in range(8):
-            if (crc & 0x0001):
-                crc = (crc >> 1) ^ 0xA001
-            else:
-                crc >>= 1
-    return crc & 0xFFFF
+    return update_crc(0xFFFF, data)
 
 def calculate_crc_ccitt(data):
     """
@@ -93,14 +113,13 @@ def validate_crc(data):
     else:
         return False
 
-def send_command(serial_port: serial.Serial, command: int, data: list[int]) -> Optional[bytearray]:
+def build_frame(command: int, data: list[int]) -> bytearray:
     """
-    Sends a command to the serial port.
+    Builds a command frame ready to be written to the serial port.
     
-    :param serial_port: Serial port object.
     :param command: Command to send.
     :param data: Data to send.
-    :return: Response data if any.
+    :return: Frame including header and CRC.
     """
     header = [constants.STARTSIGNS.INCOMING, len(data)]
     packet = header + [command] + data
@@ -108,22 +127,200 @@ def send_command(serial_port: serial.Serial, command: int, data: list[int]) -> O
     crc = utils.calculate_crc(packet)
     packet += [crc & 0xFF, (crc >> 8) & 0xFF]
 
-    hex_data = ' '.join(f'{byte:02X}' for byte in bytearray(packet))
+    return bytearray(packet)
+
+def send_command(serial_port: transport.Transport, command: int, data: list[int]) -> Optional[bytearray]:
+    """
+    Sends a command to the serial port.
+    
+    :param serial_port: Serial port object.
+    :param command: Command to send.
+    :param data: Data to send.
+    :return: Response data if any.
+    """
+    packet = build_frame(command, data)
+
+    hex_data = ' '.join(f'{byte:02X}' for byte in packet)
     logger_serial.info(hex_data)
     
-    serial_port.write(bytearray(packet))
+    serial_port.write(packet)
+    
+def read_exact(serial_port: transport.Transport, size: int, deadline: Optional[float] = None) -> bytes:
+    """
+    Reads up to size bytes, giving up once the deadline has passed.
+    
+    Without a deadline this is a single read bounded by the port's own timeout.
+    
+    :param serial_port: Serial port object.
+    :param size: Number of bytes to read.
+    :param deadline: Absolute time.monotonic() value to stop reading at.
+    :return: Bytes read, possibly fewer than requested.
+    """
+    if deadline is None:
+        return serial_port.read(size)
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return b""
+
+    # Setting the timeout reconfigures a real port, so it is only set again when a
+    # read returned short before its timeout ran out
+    original_timeout = serial_port.timeout
+    buffer = bytearray()
+    try:
+        serial_port.timeout = remaining
+        while True:
+            buffer += serial_port.read(size - len(buffer))
+            remaining = deadline - time.monotonic()
+            if len(buffer) >= size or remaining <= 0:
+                break
+            serial_port.timeout = remaining
+    finally:
+        serial_port.timeout = original_timeout
+
+    return bytes(buffer)
+
+def resync(serial_port: transport.Transport):
+    """
+    Discards any unread bytes so the next response starts on a frame boundary.
+    
+    :param serial_port: Serial port object.
+    """
+    if hasattr(serial_port, "reset_input_buffer"):
+        serial_port.reset_input_buffer()
+        return
+
+    original_timeout = serial_port.timeout
+    try:
+        serial_port.timeout = 0
+        while serial_port.read(256):
+            pass
+    finally:
+        serial_port.timeout = original_timeout
+
+def transact(serial_port: transport.Transport, command: int, data: list[int], expected_length: int,
+             policy: models.RetryPolicy = models.RETRY_NEVER, timeout: Optional[float] = None):
+    """
+    Sends a command and reads its response, retrying according to the policy.
+    
+    When a timeout is given the whole exchange, retries included, finishes within it.
+    The remaining time is split evenly between the attempts still allowed, so a
+    single stalled attempt cannot use up the budget of the retries behind it.
+    Without a timeout the command is sent once and the read is bounded by the port
+    timeout, as retries could otherwise block for several port timeouts.
+    
+    Frames that do not answer the command are discarded, and the input buffer is
+    resynchronized after every failed attempt, the last one included, so a late
+    response cannot be taken for the answer to the next command.
+    
+    :param serial_port: Serial port object.
+    :param command: Command to send.
+    :param data: Data to send.
+    :param expected_length: Expected length of the response.
+    :param policy: RetryPolicy for this command.
+    :param timeout: Overall time budget in seconds, or None to rely on the port timeout.
+    :return: Processed response data.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    attempt = 0
+
+    while True:
+        attempt += 1
+        attempt_deadline = deadline
+        if deadline is not None:
+            attempts_left = policy.max_attempts - attempt + 1
+            attempt_deadline = time.monotonic() + (deadline - time.monotonic()) / attempts_left
+
+        send_command(serial_port, command, data)
+        try:
+            return read_from_serial(serial_port, expected_length, deadline=attempt_deadline, command=command)
+        except Exception as error:
+            resync(serial_port)
+            if deadline is None or not policy.should_retry(error, attempt) or time.monotonic() >= deadline:
+                raise
+            logger_serial.warning(f"Command {command:#04x} attempt {attempt} failed ({error}), retrying")
+
+# Shortest payload each response needs to be decoded
+MIN_PAYLOAD_LENGTHS = {
+    constants.CMD_GETVERSION: 6,
+    constants.CMD_GETVERSIONSTR: 48,
+    constants.CMD_GETPARAMETER: 4,
+    constants.CMD_GETDATA: 1,
+}
+
+# Response command IDs answering each getter; every other command is answered by an ACK
+RESPONSE_COMMANDS = {
+    constants.CMD_GETVERSION: (constants.CMD_GETVERSION,),
+    # Some boards answer GETVERSIONSTR with a GETDATA frame, see read_from_serial()
+    constants.CMD_GETVERSIONSTR: (constants.CMD_GETVERSIONSTR, constants.CMD_GETDATA),
+    constants.CMD_GETPARAMETER: (constants.CMD_GETPARAMETER,),
+    constants.CMD_GETDATA: (constants.CMD_GETDATA,),
+    constants.CMD_GETDATAFIELDS: (constants.CMD_GETDATAFIELDS,),
+}
+
+# Stale frames read_from_serial skips before giving up on an answer
+MAX_DISCARDED_FRAMES = 16
+
+def answers(command: int, response_cmd: int, value) -> bool:
+    """
+    Tells whether a decoded frame can be the response to a command.
+    
+    :param command: Command ID sent.
+    :param response_cmd: Command ID of the frame received.
+    :param value: Value the frame decoded to.
+    :return: True if the frame answers the command.
+    """
+    if response_cmd == constants.CMD_ACK:
+        return command not in RESPONSE_COMMANDS
+    if response_cmd not in RESPONSE_COMMANDS.get(command, ()):
+        return False
+    if response_cmd == constants.CMD_GETDATA:
+        # The version string quirk only answers GETVERSIONSTR, never a GETDATA poll
+        return isinstance(value, models.VersionStringResponse) == (command == constants.CMD_GETVERSIONSTR)
+    return True
+
+def ack_name(code: int) -> str:
+    """
+    Name of an ACK code, also for codes missing from constants.ACK_CODES.
     
-def read_from_serial(serial_port: serial.Serial, expected_length: int):
+    :param code: Raw ACK code.
+    :return: Name from constants.ACK_CODES or "UNKNOWN_ACK_CODE_<code>".
+    """
+    return constants.ACK_CODES.get(code, f"UNKNOWN_ACK_CODE_{code}")
+
+def read_from_serial(serial_port: transport.Transport, expected_length: int, deadline: Optional[float] = None,
+                     verify_crc: bool = False, command: Optional[int] = None):
     """
     Reads data from the serial port and processes it.
     
+    Malformed frames raise ValueError (or DeadlineExceeded when bytes are missing at
+    the deadline) rather than being decoded from whatever arrived.
+    
+    With command given, frames that cannot be the answer to it, such as the late ACK
+    of an earlier setter in front of a GETDATA response, are discarded and the next
+    frame is read. An error ACK is always raised as AckError.
+    
     :param serial_port: Serial port object.
     :param expected_length: Expected length of the response.
+    :param deadline: Absolute time.monotonic() value the response must arrive by.
+    :param verify_crc: Reject frames whose CRC does not match with CRCMismatchException.
+    :param command: Command ID the response must answer, None to accept any frame.
     :return: Processed response data.
     """
-    header = serial_port.read(3)
+    for _ in range(MAX_DISCARDED_FRAMES + 1):
+        response_cmd, value = _read_frame(serial_port, expected_length, deadline, verify_crc)
+        if command is None or answers(command, response_cmd, value):
+            return value
+        logger_response.warning(f"Discarding response {response_cmd:#04x}, not an answer to command {command:#04x}")
+    raise ValueError(f"No answer to command {command:#04x} among {MAX_DISCARDED_FRAMES + 1} frames")
+
+def _read_frame(serial_port: transport.Transport, expected_length: int, deadline: Optional[float], verify_crc: bool) -> tuple:
+    """Reads and decodes one frame, see read_from_serial(). Returns (response command, decoded value)."""
+    header = read_exact(serial_port, 3, deadline)
     
     if len(header) < 3:
+        if deadline is not None:
+            raise exceptions.DeadlineExceeded("No response header before deadline")
         raise ValueError("Incomplete response header received")
 
     start_sign, packet_length, response_cmd = header
@@ -132,35 +329,48 @@ def read_from_serial(serial_port: serial.Serial, expected_length: int):
         raise ValueError("Invalid start sign received")
 
     if response_cmd == constants.CMD_ACK:
-        response = serial_port.read(3)
+        if packet_length != 1:
+            raise ValueError(f"Invalid ACK payload length {packet_length}")
+
+        response = read_exact(serial_port, 3, deadline)
         response = header + response
         
-        if len(response) < 3:
+        if len(response) < 6:
+            if deadline is not None:
+                raise exceptions.DeadlineExceeded("Incomplete ACK response before deadline")
             raise ValueError("Incomplete ACK response received")
+
+        if verify_crc and not validate_crc(response):
+            raise exceptions.CRCMismatchException("CRC validation failed!")
         
         data = response[3]
+        name = ack_name(data)
         
-        hex_data = ' '.join(f'{byte:02X}' for byte in response)
-        logger_serial.info(hex_data)
-        logger_response.info(f"\nACK RESPONSE:\n\tdata: {constants.ACK_CODES[data]}\n")
-        if constants.ACK_CODES[data] != "SERIALRCCMD_ACK_OK":
-            raise exceptions.AckError(constants.ACK_CODES[data])
+        if logger_serial.isEnabledFor(logging.INFO):
+            logger_serial.info(' '.join(f'{byte:02X}' for byte in response))
+        logger_response.info(f"\nACK RESPONSE:\n\tdata: {name}\n")
+        if data != 0:
+            raise exceptions.AckError(name, data)
         
-        return constants.ACK_CODES[data]
+        return response_cmd, name
 
     if response_cmd == constants.CMD_GETDATAFIELDS:
-        response = serial_port.read(packet_length)
+        response = read_exact(serial_port, packet_length + 2, deadline)
         response = header + response
 
-        if len(response) < packet_length:
-            raise ValueError(f"Incomplete response. Expected {packet_length}, but got {len(response)}")
+        if len(response) < packet_length + 5:
+            raise ValueError(f"Incomplete response. Expected {packet_length + 5}, but got {len(response)}")
+        if packet_length < 2:
+            raise ValueError(f"Invalid GETDATAFIELDS payload length {packet_length}")
+        if verify_crc and not validate_crc(response):
+            raise exceptions.CRCMismatchException("CRC validation failed!")
 
-        bitmask = (response[1] << 8) | response[0]
+        bitmask = (response[4] << 8) | response[3]
         
-        data_stream = response[2:-2]
+        data_stream = response[5:-2]
         
-        hex_data = ' '.join(f'{byte:02X}' for byte in response)
-        logger_serial.info(hex_data)
+        if logger_serial.isEnabledFor(logging.INFO):
+            logger_serial.info(' '.join(f'{byte:02X}' for byte in response))
         logger_response.info(f"\nGETDATAFIELDS RESPONSE:\n\tbitmask: {bitmask:#06x}\n\tdata stream: {data_stream.hex()}\n")
 
         # Unpack data properly if they are 16-bit signed integers
@@ -169,26 +379,35 @@ def read_from_serial(serial_port: serial.Serial, expected_length: int):
         else:
             unpacked_data = data_stream  # Keep as raw bytes if unpacking fails
 
-        return bitmask, unpacked_data
+        return response_cmd, (bitmask, unpacked_data)
 
     
-    remaining_length = expected_length - 3
-    remaining_response = serial_port.read(remaining_length)
+    # The header carries the payload length, so read exactly one frame (payload + CRC)
+    # rather than waiting out the port timeout for bytes that will never come
+    frame_length = packet_length + 5
+    if frame_length != expected_length:
+        logger_response.debug(f"Expected a {expected_length} byte response, header announces {frame_length}")
+
+    remaining_response = read_exact(serial_port, packet_length + 2, deadline)
     response = header + remaining_response
 
-    if len(response) < expected_length:
-        logger_response.warning(f"Expected {expected_length} bytes, but got {len(response)}. Data may be incomplete.")
+    if len(response) < frame_length:
+        if deadline is not None:
+            raise exceptions.DeadlineExceeded(f"Expected {frame_length} bytes before deadline, but got {len(response)}")
+        raise ValueError(f"Incomplete response. Expected {frame_length}, but got {len(response)}")
         
-    hex_data = ' '.join(f'{byte:02X}' for byte in response)
-    logger_serial.info(hex_data)
+    if logger_serial.isEnabledFor(logging.INFO):
+        logger_serial.info(' '.join(f'{byte:02X}' for byte in response))
 
-    start_sign, packet_length, response_cmd = response[:3]
+    if response_cmd not in MIN_PAYLOAD_LENGTHS:
+        raise ValueError(f"Unexpected response command {response_cmd:#04x}")
+    if packet_length < MIN_PAYLOAD_LENGTHS[response_cmd]:
+        raise ValueError(f"Payload of {packet_length} bytes too short for response {response_cmd:#04x}")
 
-    # CRC fails for some reason but the response is correct
-    #if not validate_crc(response):
-    #    logger_response.warning("CRC validation failed!")
-    #    raise exceptions.CrcError("CRC validation failed!")
-    #    return None
+    # Off by default: the CRC check was disabled because responses from the board
+    # failed it even when their content was correct
+    if verify_crc and not validate_crc(response):
+        raise exceptions.CRCMismatchException("CRC validation failed!")
 
     if response_cmd == constants.CMD_GETVERSION:
         data1 = (response[4] << 8) | response[3]
@@ -197,7 +416,7 @@ def read_from_serial(serial_port: serial.Serial, expected_length: int):
 
         logger_response.info(f"\nGETVERSION RESPONSE:\n\tfirmware version:{data1}\n\tsetup layout version: {data2}\n\tboard capabilities value: {data3}")
         
-        return models.VersionResponse(firmware_version=data1, setup_layout_version=data2, board_capabilities=data3)
+        return response_cmd, models.VersionResponse(firmware_version=data1, setup_layout_version=data2, board_capabilities=data3)
     
     elif response_cmd == constants.CMD_GETVERSIONSTR:
         data_stream = response[3:-2]
@@ -208,7 +427,7 @@ def read_from_serial(serial_port: serial.Serial, expected_length: int):
 
         logger_response.info(f"\nGETVERSIONSTR RESPONSE:\n\tVersion: {version_string}\n\tName: {name_string}\n\tBoard: {board_string}\n")
 
-        return models.VersionStringResponse(version=version_string, name=name_string, board=board_string)
+        return response_cmd, models.VersionStringResponse(version=version_string, name=name_string, board=board_string)
     
     elif response_cmd == constants.CMD_GETPARAMETER:
         data1 = (response[4] << 8) | response[3]
@@ -216,24 +435,26 @@ def read_from_serial(serial_port: serial.Serial, expected_length: int):
         
         logger_response.info(f"\nGETPARAMETER RESPONSE:\n\tparameter number: {data1}\n\tparameter value: {data2}\n")
     
-        return data2
+        return response_cmd, data2
     elif response_cmd == constants.CMD_GETDATA:
         type_byte = response[3]
         
         # GETDATA can't be 0x76 but GETVERSIONSTR returns GETDATA with 0x76 for some reason
         if type_byte == 0x76:
             data_stream = response[3:-2]
+            if len(data_stream) < 48:
+                raise ValueError(f"Payload of {len(data_stream)} bytes too short for a version string response")
             logger_response.info(f"\nGETDATA RESPONSE:\n\ttype byte: {type_byte}\n\tdatastream: {data_stream}\n")
             
             version_string = data_stream[:16].decode('utf-8', errors="ignore").rstrip('\x00')
             name_string = data_stream[16:32].decode('utf-8', errors="ignore").rstrip('\x00')
             board_string = data_stream[32:48].decode('utf-8', errors="ignore").rstrip('\x00')
             
-            return models.VersionStringResponse(version=version_string, name=name_string, board=board_string)
+            return response_cmd, models.VersionStringResponse(version=version_string, name=name_string, board=board_string)
 
         # Stream starts from 5 because msg structure is 0xFB 0x4A 0x05 type-byte 0x00 ...
         data_stream = response[5:-2]
         logger_response.info(f"\nGETDATA RESPONSE:\n\ttype byte: {type_byte}\n\tdatastream: {data_stream}\n")
 
-        return models.DataStreamResponse.from_data_stream(data_stream)
+        return response_cmd, models.DataStreamResponse.from_data_stream(data_stream)
         
\ No newline at end of file
@@ -0,0 +1,80 @@
+import unittest
+import os
+import random
+import sys
+from dataclasses import replace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import clock
+from storm32_gimbal_control import simulator
+
+def wrap(ticks: int) -> int:
+    value = ticks & 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+class TestClock(unittest.TestCase):
+    def test_unwraps_signed_timestamps(self):
+        unwrapper = clock.TimestampUnwrapper()
+        ticks = [0, 20000, 40000, 65000, 70000, 100000]
+
+        self.assertEqual([unwrapper.unwrap(wrap(t)) for t in ticks], ticks)
+
+    def test_jitter_across_wrap_stays_monotonic(self):
+        unwrapper = clock.TimestampUnwrapper()
+        # Device ticks around the wrap point, with a sample arriving two ticks late
+        ticks = [65530, 65535, 65537, 65535, 65539, 65600]
+
+        self.assertEqual([unwrapper.unwrap(wrap(t)) for t in ticks], [0, 5, 7, 7, 9, 70])
+
+    def test_accepts_long_gap_once_it_repeats(self):
+        unwrapper = clock.TimestampUnwrapper()
+        # Over 3.3 s at 100 us ticks without a sample, then the device keeps counting
+        ticks = [0, 100, 40000, 40100, 40200, 40300, 40250, 40400]
+
+        self.assertEqual([unwrapper.unwrap(wrap(t)) for t in ticks], [0, 100, 100, 100, 40200, 40300, 40300, 40400])
+        self.assertEqual(unwrapper.resyncs, 1)
+
+    def test_gap_does_not_corrupt_drift(self):
+        aligner = clock.ClockAligner(tick_seconds=1e-4)
+        sample = simulator.default_data()
+        for index in list(range(50)) + list(range(250, 300)):
+            true_time = index * 0.02
+            aligned = aligner.observe(replace(sample, timestamp=wrap(round(true_time / 1e-4))),
+                                      100.0 + true_time - 0.001, 100.0 + true_time + 0.001)
+
+        self.assertEqual(aligned.device_ticks, round(true_time / 1e-4))
+        self.assertAlmostEqual(aligner.drift, 0.0, places=6)
+        self.assertAlmostEqual(aligned.host_time, 100.0 + true_time, places=6)
+
+    def test_estimates_offset_and_drift(self):
+        generator = random.Random(1)
+        aligner = clock.ClockAligner(tick_seconds=1e-4)
+        sample = simulator.default_data()
+        offset, drift = 1234.5, 50e-6
+
+        for index in range(2000):
+            true_time = index * 0.02
+            host_sampled = offset + true_time * (1 + drift)
+            before = 0.0005 + generator.expovariate(1 / 0.002)
+            after = 0.0005 + generator.expovariate(1 / 0.002)
+            aligned = aligner.observe(replace(sample, timestamp=wrap(round(true_time / 1e-4))),
+                                      host_sampled - before, host_sampled + after)
+
+        self.assertEqual(aligned.device_ticks, round(true_time / 1e-4))
+        self.assertAlmostEqual(aligned.host_time, host_sampled, delta=0.001)
+        self.assertAlmostEqual(aligner.drift, drift, delta=20e-6)
+        self.assertAlmostEqual(aligned.latency, after, delta=0.001)
+
+    def test_polls_device(self):
+        device = simulator.SimulatedGimbal(timeout=0.1)
+        aligner = clock.ClockAligner(tick_seconds=device.tick_seconds)
+
+        for _ in range(5):
+            aligned = aligner.poll(device)
+
+        self.assertLess(abs(aligned.latency), 0.005)
+        self.assertLessEqual(aligned.requested_at, aligned.received_at)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import coalesce
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import models
+from storm32_gimbal_control import simulator
+
+class MinimalPort:
+    """Transport with nothing beyond read(), write() and timeout."""
+    def __init__(self, incoming: bytes):
+        self.timeout = 0.1
+        self.incoming = bytearray(incoming)
+        self.written = bytearray()
+
+    def write(self, data) -> int:
+        self.written += data
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self.incoming[:size])
+        del self.incoming[:size]
+        return data
+
+class TestCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.device = simulator.RecordingGimbal()
+
+    def test_pipeline_sends_burst_in_one_write(self):
+        results = coalesce.pipeline(self.device, [
+            (constants.CMD_SETPANMODE, [models.PanMode.OFF.value], 6),
+            (constants.CMD_GETVERSION, [], 11),
+            (constants.CMD_SETSTANDBY, [models.StandBySwitch.ON.value], 6),
+        ])
+
+        self.assertEqual(len(self.device.writes), 1)
+        self.assertEqual(results[0], "SERIALRCCMD_ACK_OK")
+        self.assertEqual(results[1], self.device.version)
+        self.assertEqual(results[2], "SERIALRCCMD_ACK_OK")
+
+    def test_pipeline_can_return_errors_in_place(self):
+        results = coalesce.pipeline(self.device, [
+            (constants.CMD_GETDATAFIELDS, [0x01, 0x00], 6),
+            (constants.CMD_SETPANMODE, [models.PanMode.OFF.value], 6),
+        ], return_exceptions=True)
+
+        self.assertIsInstance(results[0], Exception)
+        self.assertEqual(results[1], "SERIALRCCMD_ACK_OK")
+
+    def test_flushes_on_size(self):
+        with coalesce.CoalescingWriter(self.device, max_bytes=12, max_delay=10) as writer:
+            writer.write(bytes(6))
+            self.assertEqual(self.device.writes, [])
+            writer.write(bytes(6))
+            self.assertEqual(self.device.writes, [bytes(12)])
+
+    def test_flushes_within_latency_bound(self):
+        with coalesce.CoalescingWriter(self.device, max_delay=0.01) as writer:
+            writer.write(bytes(3))
+            writer.write(bytes(3))
+            time.sleep(0.05)
+            self.assertEqual(self.device.writes, [bytes(6)])
+
+    def test_flushes_before_reading(self):
+        with coalesce.CoalescingWriter(self.device, max_delay=10) as writer:
+            self.assertEqual(core.set_pan_mode(writer, models.PanMode.OFF, timeout=0.5), "SERIALRCCMD_ACK_OK")
+            self.assertEqual(writer.stats["writes"], 1)
+
+    def test_reset_input_buffer_on_minimal_transport(self):
+        port = MinimalPort(b"stale bytes")
+        with coalesce.CoalescingWriter(port, max_delay=10) as writer:
+            writer.write(bytes(6))
+            writer.reset_input_buffer()
+            self.assertEqual(writer.stats, {"queued_writes": 1, "writes": 1, "bytes": 6})
+        self.assertEqual(port.incoming, b"")
+        self.assertEqual(port.written, bytes(6))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import device_profile
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import simulator
+
+class TestDeviceProfile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.directory.name, "profiles.json")
+        self.device = simulator.SimulatedGimbal(timeout=0.1, parameters={1: 100, 2: 200})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def commands_sent(self):
+        commands = [command for command, _ in self.device.received]
+        self.device.received.clear()
+        return commands
+
+    def test_reconnect_skips_parameter_reads(self):
+        first = device_profile.connect(self.device, self.cache_path, parameter_ids=(1, 2))
+        self.assertFalse(first.from_cache)
+        self.assertEqual(first.parameters, {1: 100, 2: 200})
+        self.assertEqual(len(self.commands_sent()), 4)
+
+        second = device_profile.connect(self.device, self.cache_path, parameter_ids=(1,))
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.parameter_hash, first.parameter_hash)
+        self.assertEqual(self.commands_sent(), [constants.CMD_GETVERSION, constants.CMD_GETVERSIONSTR])
+
+    def test_same_firmware_on_other_board_gets_own_profile(self):
+        device_profile.connect(self.device, self.cache_path, parameter_ids=(1,))
+        other = simulator.SimulatedGimbal(timeout=0.1, parameters={1: 7},
+                                          version_str=models.VersionStringResponse("v0.96", "Simulated", "other board"))
+
+        profile = device_profile.connect(other, self.cache_path, parameter_ids=(1,))
+
+        self.assertFalse(profile.from_cache)
+        self.assertEqual(profile.parameters, {1: 7})
+        self.assertEqual(len(device_profile.ProfileCache(self.cache_path).load()), 2)
+
+    def test_parameter_writes_invalidate_cache(self):
+        profile = device_profile.connect(self.device, self.cache_path, parameter_ids=(1, 2))
+        port = device_profile.GatedPort(self.device, profile, self.cache_path)
+
+        port.call(core.set_parameter, 1, 123)
+        reconnected = device_profile.connect(self.device, self.cache_path, parameter_ids=(1, 2))
+        self.assertFalse(reconnected.from_cache)
+        self.assertEqual(reconnected.parameters, {1: 123, 2: 200})
+
+        port = device_profile.GatedPort(self.device, reconnected, self.cache_path)
+        port.call(core.restore_all_parameters)
+        self.assertEqual(device_profile.ProfileCache(self.cache_path).find(reconnected.version,
+                                                                          reconnected.version_str).parameters, {})
+
+    def test_changed_firmware_triggers_full_handshake(self):
+        device_profile.connect(self.device, self.cache_path)
+        self.device.version = models.VersionResponse(firmware_version=97, setup_layout_version=1, board_capabilities=0)
+        self.commands_sent()
+
+        profile = device_profile.connect(self.device, self.cache_path)
+
+        self.assertFalse(profile.from_cache)
+        self.assertEqual(self.commands_sent(), [constants.CMD_GETVERSION, constants.CMD_GETVERSIONSTR])
+        self.assertEqual(len(device_profile.ProfileCache(self.cache_path).load()), 2)
+
+    def test_unsupported_commands_are_gated_locally(self):
+        profile = device_profile.connect(self.device, self.cache_path)
+        port = device_profile.GatedPort(self.device, profile, self.cache_path)
+        bitmask = models.LiveDataFields.STATUS
+
+        with self.assertRaises(exceptions.AckError):
+            port.call(core.get_data_fields, bitmask)
+        self.commands_sent()
+
+        reconnected = device_profile.connect(self.device, self.cache_path)
+        self.commands_sent()
+        port = device_profile.GatedPort(self.device, reconnected)
+        with self.assertRaises(exceptions.AckError) as context:
+            port.call(core.get_data_fields, bitmask)
+
+        self.assertEqual(context.exception.code, 3)
+        self.assertEqual(self.commands_sent(), [])
+        self.assertEqual(port.call(core.set_pan_mode, models.PanMode.OFF), "SERIALRCCMD_ACK_OK")
+
+    def test_refusal_is_gated_per_payload(self):
+        profile = device_profile.connect(self.device, self.cache_path)
+        port = device_profile.GatedPort(self.device, profile, self.cache_path)
+        with self.assertRaises(exceptions.AckError):
+            port.call(core.get_data_fields, models.LiveDataFields.STATUS)
+        self.commands_sent()
+
+        # Another mask may well be supported, so it still goes to the gimbal
+        with self.assertRaises(exceptions.AckError):
+            port.call(core.get_data_fields, models.LiveDataFields.IMU1_ANGLES)
+        self.assertEqual(self.commands_sent(), [constants.CMD_GETDATAFIELDS])
+
+        # A refused setpoint command is refused for any setpoint
+        self.device.expect(simulator.build_ack(3))
+        with self.assertRaises(exceptions.AckError):
+            port.call(core.set_angle, 1.0, 0.0, 0.0, models.SetAngleFlags(0))
+        self.commands_sent()
+        with self.assertRaises(exceptions.AckError):
+            port.call(core.set_angle, 2.0, 0.0, 0.0, models.SetAngleFlags(0))
+        self.assertEqual(self.commands_sent(), [])
+
+    def test_forgetting_unsupported_commands(self):
+        profile = device_profile.connect(self.device, self.cache_path)
+        port = device_profile.GatedPort(self.device, profile, self.cache_path)
+        self.device.expect(simulator.build_ack(3))
+        with self.assertRaises(exceptions.AckError):
+            port.call(core.set_angle, 1.0, 0.0, 0.0, models.SetAngleFlags(0))
+
+        port.forget_unsupported(constants.CMD_SETANGLE)
+        self.assertEqual(port.call(core.set_angle, 1.0, 0.0, 0.0, models.SetAngleFlags(0)), "SERIALRCCMD_ACK_OK")
+        self.assertEqual(device_profile.connect(self.device, self.cache_path).unsupported_commands, set())
+
+        with self.assertRaises(exceptions.AckError):
+            port.call(core.get_data_fields, models.LiveDataFields.STATUS)
+        self.assertFalse(device_profile.connect(self.device, self.cache_path, refresh=True).unsupported_commands)
+        self.assertEqual(device_profile.connect(self.device, self.cache_path).unsupported_commands, set())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import json
+import os
+import struct
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import export
+from storm32_gimbal_control import models
+
+def make_sample(value: int) -> models.DataStreamResponse:
+    return models.DataStreamResponse.from_data_stream(struct.pack("<32h", *range(value, value + 32)))
+
+class TestColumnarExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_chunks_and_manifest(self):
+        with export.ColumnarExporter(self.directory.name, chunk_size=4) as exporter:
+            for value in range(10):
+                exporter.append(make_sample(value), float(value))
+
+        manifest = export.read_manifest(self.directory.name)
+        self.assertEqual(manifest["rows"], 10)
+        self.assertEqual([chunk["rows"] for chunk in manifest["chunks"]], [4, 4, 2])
+
+        chunk = np.load(os.path.join(self.directory.name, manifest["chunks"][1]["file"]), mmap_mode="r")
+        self.assertIsInstance(chunk, np.memmap)
+        self.assertEqual(chunk["state"].tolist(), [4, 5, 6, 7])
+
+    def test_columns_match_decoded_samples(self):
+        samples = [make_sample(value * 3) for value in range(7)]
+        with export.ColumnarExporter(self.directory.name, chunk_size=3) as exporter:
+            for index, sample in enumerate(samples):
+                exporter.append(sample, index / 10)
+
+        for name in ("imu1_pitch", "imu2_yaw", "pid_roll", "lipo_voltage", "imu_acc_confidence"):
+            expected = [getattr(sample, name) for sample in samples]
+            np.testing.assert_allclose(export.load_column(self.directory.name, name), expected, rtol=1e-6)
+        self.assertEqual(export.load_column(self.directory.name, "imu1_gyro_y").tolist(),
+                         [sample.imu1_gyro[1] for sample in samples])
+        np.testing.assert_allclose(export.load_column(self.directory.name, "received_at"), np.arange(7) / 10)
+
+    def test_existing_export_is_not_overwritten(self):
+        with export.ColumnarExporter(self.directory.name, chunk_size=4) as exporter:
+            for value in range(5):
+                exporter.append(make_sample(value), float(value))
+
+        with self.assertRaises(FileExistsError):
+            export.ColumnarExporter(self.directory.name, chunk_size=4)
+
+        with export.ColumnarExporter(self.directory.name, chunk_size=4, append=True) as exporter:
+            for value in range(5, 8):
+                exporter.append(make_sample(value), float(value))
+
+        manifest = export.read_manifest(self.directory.name)
+        self.assertEqual([chunk["file"] for chunk in manifest["chunks"]],
+                         ["chunk_000000.npy", "chunk_000001.npy", "chunk_000002.npy"])
+        self.assertEqual(manifest["rows"], 8)
+        self.assertEqual(export.load_column(self.directory.name, "state").tolist(), list(range(8)))
+
+    def test_append_needs_matching_layout(self):
+        with export.ColumnarExporter(self.directory.name, chunk_size=4) as exporter:
+            exporter.append(make_sample(0), 0.0)
+
+        with self.assertRaises(ValueError):
+            export.ColumnarExporter(self.directory.name, chunk_size=8, append=True)
+
+        path = os.path.join(self.directory.name, export.MANIFEST_NAME)
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+        manifest["dtype"][1][1] = "<f8"
+        with open(path, "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+        with self.assertRaises(ValueError):
+            export.ColumnarExporter(self.directory.name, chunk_size=4, append=True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import simulator
+from storm32_gimbal_control import transport
+from storm32_gimbal_control import utils
+
+import fuzz_harness
+
+def buffered(data: bytes) -> transport.ScriptedTransport:
+    port = transport.ScriptedTransport(timeout=0)
+    port.inject(data)
+    return port
+
+class TestResponseParser(unittest.TestCase):
+    def test_unknown_ack_code(self):
+        port = buffered(simulator.build_ack(200))
+
+        with self.assertRaises(exceptions.AckError) as context:
+            utils.read_from_serial(port, 6)
+
+        self.assertEqual(context.exception.code, 200)
+        self.assertEqual(str(context.exception), "UNKNOWN_ACK_CODE_200")
+
+    def test_short_payloads_rejected(self):
+        for command in (constants.CMD_GETVERSION, constants.CMD_GETPARAMETER, constants.CMD_GETVERSIONSTR):
+            port = buffered(simulator.build_response(command, b"\x01\x02"))
+            with self.assertRaises(ValueError):
+                utils.read_from_serial(port, 7)
+
+        port = buffered(simulator.build_response(0x7F, b""))
+        with self.assertRaises(ValueError):
+            utils.read_from_serial(port, 5)
+
+    def test_crc_verification(self):
+        frame = bytearray(simulator.build_response(constants.CMD_GETPARAMETER, b"\x01\x00\x2A\x00"))
+        self.assertEqual(utils.read_from_serial(buffered(frame), 9, verify_crc=True), 42)
+
+        frame[5] ^= 0x01
+        self.assertEqual(utils.read_from_serial(buffered(frame), 9), 43)
+        with self.assertRaises(exceptions.CRCMismatchException):
+            utils.read_from_serial(buffered(frame), 9, verify_crc=True)
+
+    def test_fuzz(self):
+        for verify_crc in (True, False):
+            report = fuzz_harness.run(3000, seed=11, verify_crc=verify_crc)
+            self.assertTrue(report.ok, (report.crashes[:3], report.hangs[:3], report.misdecoded[:3]))
+            self.assertEqual(report.cases, 3000)
+            self.assertGreater(report.decoded, 500)
+            self.assertGreater(sum(report.rejected.values()), 500)
+
+    def test_fuzz_with_stale_frames(self):
+        for verify_crc in (True, False):
+            report = fuzz_harness.run(3000, seed=12, verify_crc=verify_crc, match_commands=True)
+            self.assertTrue(report.ok, (report.crashes[:3], report.hangs[:3], report.misdecoded[:3]))
+            self.assertGreater(report.decoded, 500)
+
+if __name__ == "__main__":
+    unittest.main()
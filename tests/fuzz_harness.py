@@ -0,0 +1,245 @@
+"""
+Fuzz harness for utils.read_from_serial, shared by tests/fuzz.py and benchmarks/parser_fuzz.py.
+"""
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import simulator
+from storm32_gimbal_control import transport
+from storm32_gimbal_control import utils
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+import random
+import struct
+import time
+
+
+# Errors read_from_serial may raise for a malformed frame; anything else is a crash
+PROTOCOL_ERRORS = (ValueError, TimeoutError, exceptions.AckError, exceptions.CRCMismatchException)
+
+MUTATIONS = ("truncate", "flip_bit", "replace_byte", "drop_byte", "insert_byte", "length",
+             "start_sign", "garbage_prefix", "interleave", "noise")
+
+# Host command each kind of response frame answers
+ANSWERED_COMMANDS = {
+    "ack": constants.CMD_SETANGLE,
+    "version": constants.CMD_GETVERSION,
+    "version_str": constants.CMD_GETVERSIONSTR,
+    "data_quirk": constants.CMD_GETVERSIONSTR,
+    "parameter": constants.CMD_GETPARAMETER,
+    "data": constants.CMD_GETDATA,
+    "data_fields": constants.CMD_GETDATAFIELDS,
+}
+
+@dataclass
+class FuzzCase:
+    """A response frame and what read_from_serial must return for it."""
+    kind: str
+    frame: bytes
+    expected: object
+
+    @property
+    def command(self) -> int:
+        """Host command the frame answers."""
+        return ANSWERED_COMMANDS[self.kind]
+
+@dataclass
+class FuzzReport:
+    """Outcome of a fuzz run."""
+    cases: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    decoded: int = 0
+    rejected: Counter = field(default_factory=Counter)
+    crashes: list = field(default_factory=list)
+    hangs: list = field(default_factory=list)
+    misdecoded: list = field(default_factory=list)
+    undetected: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """Parsed megabytes per second."""
+        return self.bytes / self.seconds / 1e6 if self.seconds else 0.0
+
+    @property
+    def ok(self) -> bool:
+        """No crash, hang or mis-decode."""
+        return not (self.crashes or self.hangs or self.misdecoded)
+
+def _ascii(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789. ") for _ in range(length)).rstrip(" ")
+
+def valid_case(rng: random.Random) -> FuzzCase:
+    """Builds a random well-formed response frame with its expected decoding."""
+    kind = rng.choice(("ack", "version", "version_str", "parameter", "data", "data_quirk", "data_fields"))
+
+    if kind == "ack":
+        code = rng.choice(list(constants.ACK_CODES) + [rng.randrange(256)])
+        expected = utils.ack_name(code) if code == 0 else exceptions.AckError(utils.ack_name(code), code)
+        return FuzzCase(kind, simulator.build_ack(code), expected)
+
+    if kind == "version":
+        values = [rng.randrange(65536) for _ in range(3)]
+        return FuzzCase(kind, simulator.build_response(constants.CMD_GETVERSION, struct.pack("<3H", *values)),
+                        models.VersionResponse(*values))
+
+    if kind in ("version_str", "data_quirk"):
+        strings = [_ascii(rng, rng.randrange(17)) for _ in range(3)]
+        if kind == "data_quirk":
+            # The board answers GETVERSIONSTR with a GETDATA frame whose "type byte" is the "v" of the version
+            strings[0] = ("v" + strings[0])[:16]
+        payload = b"".join(s.encode("ascii").ljust(16, b"\x00") for s in strings)
+        command = constants.CMD_GETVERSIONSTR if kind == "version_str" else constants.CMD_GETDATA
+        return FuzzCase(kind, simulator.build_response(command, payload), models.VersionStringResponse(*strings))
+
+    if kind == "parameter":
+        param_id, value = rng.randrange(65536), rng.randrange(65536)
+        return FuzzCase(kind, simulator.build_response(constants.CMD_GETPARAMETER, struct.pack("<HH", param_id, value)), value)
+
+    if kind == "data":
+        stream = struct.pack("<32h", *(rng.randrange(-32768, 32768) for _ in range(32)))
+        type_byte = rng.choice((0, 1, 2))
+        return FuzzCase(kind, simulator.build_response(constants.CMD_GETDATA, bytes([type_byte, 0]) + stream),
+                        models.DataStreamResponse.from_data_stream(stream))
+
+    bitmask = rng.randrange(65536)
+    values = tuple(rng.randrange(-32768, 32768) for _ in range(rng.randrange(30)))
+    payload = struct.pack("<H", bitmask) + struct.pack(f"<{len(values)}h", *values)
+    return FuzzCase(kind, simulator.build_response(constants.CMD_GETDATAFIELDS, payload), (bitmask, values))
+
+def mutate(rng: random.Random, case: FuzzCase, other: FuzzCase) -> tuple:
+    """
+    Damages a frame.
+
+    :param other: Second frame, used for interleaving.
+    :return: (mutation name, damaged bytes)
+    """
+    frame = bytearray(case.frame)
+    mutation = rng.choice(MUTATIONS)
+    position = rng.randrange(len(frame))
+
+    if mutation == "truncate":
+        del frame[position:]
+    elif mutation == "flip_bit":
+        frame[position] ^= 1 << rng.randrange(8)
+    elif mutation == "replace_byte":
+        frame[position] = (frame[position] + rng.randrange(1, 256)) & 0xFF
+    elif mutation == "drop_byte":
+        del frame[position]
+    elif mutation == "insert_byte":
+        frame.insert(position, rng.randrange(256))
+    elif mutation == "length":
+        frame[1] = (frame[1] + rng.randrange(1, 256)) & 0xFF
+    elif mutation == "start_sign":
+        frame[0] = rng.choice((constants.STARTSIGNS.INCOMING, 0x00, 0xFF))
+    elif mutation == "garbage_prefix":
+        frame[:0] = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 8)))
+    elif mutation == "interleave":
+        # Not at 0, where the stream would simply start with the other, intact frame
+        position = rng.randrange(1, len(frame))
+        frame[position:position] = other.frame
+    else:
+        frame = bytearray(rng.randrange(256) for _ in range(rng.randrange(1, 80)))
+    return mutation, bytes(frame)
+
+def stale_frames(rng: random.Random, case: FuzzCase) -> bytes:
+    """
+    Intact frames that do not answer the command of case, such as the late ACK of
+    an earlier setter, which read_from_serial must skip when given the command.
+    """
+    frames = bytearray()
+    for _ in range(rng.randrange(1, 4)):
+        while True:
+            stale = valid_case(rng)
+            # Error ACKs are raised whatever was asked, so they never count as stale
+            if not isinstance(stale.expected, exceptions.AckError) and \
+                    not utils.answers(case.command, stale.frame[2], stale.expected):
+                break
+        frames += stale.frame
+    return bytes(frames)
+
+def _matches(result, expected) -> bool:
+    if isinstance(expected, exceptions.AckError):
+        return isinstance(result, exceptions.AckError) and result.code == expected.code
+    return result == expected
+
+def run(count: int = 10000, seed: int = 0, mutation_rate: float = 0.7, verify_crc: bool = True,
+        hang_limit: float = 0.1, report: Optional[FuzzReport] = None, match_commands: bool = False) -> FuzzReport:
+    """
+    Feeds valid and damaged frames through utils.read_from_serial.
+
+    Every parse must finish within hang_limit and may only raise PROTOCOL_ERRORS;
+    anything else is a crash. A valid frame must decode to exactly what it was built
+    from, otherwise it is a mis-decode. A damaged frame that still parses into
+    something else is counted in undetected when verify_crc is set (the damage kept
+    the CRC valid, about 1 in 65536) and ignored without it, since a corrupted
+    payload byte cannot be noticed then.
+
+    With match_commands, read_from_serial is given the command each frame answers,
+    and half of the cases are preceded by stale frames it has to discard.
+
+    :param count: Number of cases.
+    :param seed: Random seed, the same seed replays the same cases.
+    :param mutation_rate: Fraction of cases that are damaged.
+    :param verify_crc: Passed to read_from_serial.
+    :param hang_limit: Seconds a single parse may take before it counts as a hang.
+    :param report: Report to add to, a new one if None.
+    :param match_commands: Pass the answered command to read_from_serial.
+    :return: FuzzReport
+    """
+    rng = random.Random(seed)
+    report = report or FuzzReport()
+    # Every byte of a case is buffered before parsing, so reads never need to wait
+    port = transport.ScriptedTransport(timeout=0)
+    # Every discarded stale frame would be logged as a warning
+    logger_disabled, utils.logger_response.disabled = utils.logger_response.disabled, True
+    try:
+        for _ in range(count):
+            _run_case(rng, port, report, mutation_rate, verify_crc, hang_limit, match_commands)
+    finally:
+        utils.logger_response.disabled = logger_disabled
+    return report
+
+def _run_case(rng: random.Random, port: transport.ScriptedTransport, report: FuzzReport, mutation_rate: float,
+              verify_crc: bool, hang_limit: float, match_commands: bool):
+    case = valid_case(rng)
+    label, data = "valid", case.frame
+    if rng.random() < mutation_rate:
+        label, data = mutate(rng, case, valid_case(rng))
+    command = None
+    if match_commands:
+        command = case.command
+        if rng.random() < 0.5:
+            data = stale_frames(rng, case) + data
+
+    port.reset_input_buffer()
+    port.inject(data)
+    started = time.perf_counter()
+    try:
+        result = utils.read_from_serial(port, len(case.frame), verify_crc=verify_crc, command=command)
+    except exceptions.AckError as error:
+        result = error
+    except PROTOCOL_ERRORS as error:
+        result = None
+        report.rejected[type(error).__name__] += 1
+    except Exception as error:
+        result = None
+        report.crashes.append((case.kind, label, repr(error), data.hex()))
+    elapsed = time.perf_counter() - started
+
+    report.cases += 1
+    report.bytes += len(data)
+    report.seconds += elapsed
+    if elapsed > hang_limit:
+        report.hangs.append((case.kind, label, elapsed, data.hex()))
+    if result is None:
+        return
+
+    report.decoded += 1
+    if _matches(result, case.expected):
+        return
+    if label == "valid":
+        report.misdecoded.append((case.kind, label, repr(result), data.hex()))
+    elif verify_crc:
+        report.undetected += 1
@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+import socket
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import gateway
+from storm32_gimbal_control import models
+from storm32_gimbal_control import simulator
+
+class TestGateway(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, "storm32.sock")
+        self.device = simulator.SimulatedGimbal(timeout=0.1)
+        self.gateway = gateway.TelemetryGateway(self.device, [self.socket_path, ("127.0.0.1", 0)], poll_interval=0.005)
+        self.gateway.start()
+
+    def tearDown(self):
+        self.gateway.stop()
+        self.directory.cleanup()
+
+    def test_fans_out_to_every_client(self):
+        tcp_address = self.gateway.addresses[1]
+        samples = []
+        self.gateway.add_sink(lambda sample, received_at: samples.append(sample))
+
+        with gateway.GatewayClient(self.socket_path) as unix_client, gateway.GatewayClient(tcp_address) as tcp_client:
+            for client in (unix_client, tcp_client):
+                received_at, sample = client.read_telemetry()
+                self.assertIsInstance(sample, models.DataStreamResponse)
+                self.assertGreater(received_at, 0)
+
+        self.assertGreater(len(samples), 0)
+
+    def test_forwards_commands(self):
+        with gateway.GatewayClient(self.socket_path) as client:
+            version = client.send_command(constants.CMD_GETVERSION, [], 11)
+            ack = client.send_command(constants.CMD_SETSTANDBY, [models.StandBySwitch.ON.value], 6,
+                                      models.CommandPriority.EMERGENCY)
+
+        self.assertEqual(version["firmware_version"], self.device.version.firmware_version)
+        self.assertEqual(ack, "SERIALRCCMD_ACK_OK")
+        self.assertIn((constants.CMD_SETSTANDBY, bytes([1])), self.device.received)
+
+    def test_command_errors_are_reported(self):
+        with gateway.GatewayClient(self.socket_path) as client:
+            with self.assertRaises(RuntimeError) as context:
+                client.send_command(constants.CMD_GETDATAFIELDS, [0x01, 0x00], 6)
+
+        self.assertIn("AckError", str(context.exception))
+
+    def test_listener_path_checks(self):
+        with self.assertRaises(FileExistsError):
+            gateway.TelemetryGateway(self.device, [self.socket_path])
+
+        other_path = os.path.join(self.directory.name, "not-a-socket")
+        with open(other_path, "w") as other:
+            other.write("keep")
+        with self.assertRaises(FileExistsError):
+            gateway.TelemetryGateway(self.device, [other_path])
+        self.assertTrue(os.path.exists(other_path))
+
+        stale_path = os.path.join(self.directory.name, "stale.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(stale_path)
+        stale.close()
+        replacement = gateway.TelemetryGateway(self.device, [stale_path])
+        replacement.start()
+        replacement.stop()
+        self.assertFalse(os.path.exists(stale_path))
+
+    def test_client_closing_with_backlog(self):
+        stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stalled.connect(self.socket_path)
+        deadline = time.monotonic() + 1.0
+        # Queue more than the socket buffers hold, so output is still pending when it closes
+        while not any(client.outbox for client in list(self.gateway._clients.values())):
+            self.assertLess(time.monotonic(), deadline)
+            self.gateway._broadcast(bytes(60000))
+            time.sleep(0.01)
+        stalled.close()
+        time.sleep(0.1)
+
+        self.assertTrue(all(thread.is_alive() for thread in self.gateway._threads))
+        with gateway.GatewayClient(self.socket_path) as client:
+            received_at, sample = client.read_telemetry()
+        self.assertIsInstance(sample, models.DataStreamResponse)
+
+if __name__ == "__main__":
+    unittest.main()
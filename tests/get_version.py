@@ -1,48 +1,47 @@
 import unittest
-from unittest.mock import patch, MagicMock
 import os
 import sys
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 # Import your actual module
+from storm32_gimbal_control import constants
 from storm32_gimbal_control import core
+from storm32_gimbal_control import transport
 
-class TestGetData(unittest.TestCase):
-    @patch("storm32_gimbal_control.utils.serial.Serial")
-    def test_get_data(self, mock_serial_class):
-        """Test get_data function with mocked serial response"""
-
-        # Create a mock serial instance
-        mock_serial_instance = MagicMock()
-        mock_serial_class.return_value = mock_serial_instance
+# GETDATA response captured from a gimbal
+DATA_RESPONSE = bytes([
+    0xFB, 0x42, 0x05,  # Header
+    0x00, 0x00, 0x06, 0x00,  # Type byte, 0x00, state
+    0x70, 0x98, 0x00, 0x80,  # status, status2
+    0x00, 0x00, 0x00, 0x00,  # i2c_errors, lipo_voltage
+    0xB3, 0x1E, 0xDC, 0x05,  # timestamp, cycle_time
+    0x61, 0x00, 0x0A, 0x00,  # imu1_gyro
+    0xF8, 0xFF, 0x41, 0x0C,  # imu1_gyro, imu1_acc
+    0x3F, 0xFD, 0x48, 0x1A,  # imu1_acc
+    0xEF, 0x10, 0x42, 0xFC,  # imu1_rotation
+    0xFB, 0x22, 0xE7, 0xF5,  # imu1_rotation, imu1_pitch
+    0xDF, 0xFD, 0xC2, 0xFF,  # imu1_roll, imu1_yaw
+    0x19, 0x0A, 0x21, 0x02,  # pid_pitch, pid_roll
+    0x3E, 0x00, 0x00, 0x00,  # pid_yaw, input_pitch
+    0x00, 0x00, 0x00, 0x00,  # input_roll, input_yaw
+    0x48, 0x04, 0xBF, 0xFC,  # imu2_pitch, imu2_roll
+    0x6E, 0xFF, 0x00, 0x00,  # imu2_yaw, mag_yaw
+    0x3E, 0x03, 0xD3, 0x35,  # mag_pitch, imu_acc_confidence
+    0x00, 0x00, 0x7C, 0x50,  # extra_function_input, checksum
+])
 
-        # Mock side_effect to return chunks of data as if read from serial
-        mock_serial_instance.read.side_effect = [
-            bytes([0xFB, 0x42, 0x05]),  # First part (header)
-            bytes([0x00, 0x00, 0x06, 0x00]),  # State, status
-            bytes([0x70, 0x98, 0x00, 0x80]),  # status2
-            bytes([0x00, 0x00, 0x00, 0x00]),  # i2c_errors, lipo_voltage
-            bytes([0xB3, 0x1E, 0xDC, 0x05]),  # timestamp, cycle_time
-            bytes([0x61, 0x00, 0x0A, 0x00]),  # imu1_gyro
-            bytes([0xF8, 0xFF, 0x41, 0x0C]),  # imu1_acc
-            bytes([0x3F, 0xFD, 0x48, 0x1A]),  # imu1_acc
-            bytes([0xEF, 0x10, 0x42, 0xFC]),  # imu1_rotation
-            bytes([0xFB, 0x22, 0xE7, 0xF5]),  # imu1_pitch, roll, yaw
-            bytes([0xDF, 0xFD, 0xC2, 0xFF]),  # pid values
-            bytes([0x19, 0x0A, 0x21, 0x02]),  # pid_pitch, roll
-            bytes([0x3E, 0x00, 0x00, 0x00]),  # pid_yaw, input_pitch
-            bytes([0x00, 0x00, 0x00, 0x00]),  # input_roll, yaw
-            bytes([0x48, 0x04, 0xBF, 0xFC]),  # imu2_pitch, roll
-            bytes([0x6E, 0xFF, 0x00, 0x00]),  # imu2_yaw, mag_yaw
-            bytes([0x3E, 0x03, 0xD3, 0x35]),  # mag_pitch, imu_acc_confidence
-            bytes([0x00, 0x00, 0x7C, 0x50]),  # extra_function_input, checksum
-        ]
+class TestGetData(unittest.TestCase):
+    def test_get_data(self):
+        """Test get_data function with a scripted device response"""
+        port = transport.ScriptedTransport(timeout=0.1)
+        port.expect(DATA_RESPONSE, command=constants.CMD_GETDATA)
 
         # Call function
-        data = core.get_data(mock_serial_instance)
+        data = core.get_data(port, 0)
 
         # Assertions
+        self.assertEqual(port.received, [(constants.CMD_GETDATA, bytes([0x00]))])
         self.assertEqual(data.state, 6)
         self.assertEqual(data.status, -26512)
         self.assertEqual(data.status2, -32768)
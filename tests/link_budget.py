@@ -0,0 +1,66 @@
+import unittest
+import math
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import link_budget
+from storm32_gimbal_control import simulator
+
+class TestLinkBudget(unittest.TestCase):
+    def test_costs_match_core(self):
+        self.assertEqual(set(link_budget.EXERCISES), set(link_budget.COMMAND_COSTS))
+        for name, cost in link_budget.COMMAND_COSTS.items():
+            device = simulator.RecordingGimbal()
+            link_budget.EXERCISES[name](device, 0.5)
+            self.assertEqual(device.received[0][0], cost.command, name)
+            self.assertEqual([len(frame) for frame in device.writes], [cost.request], name)
+            self.assertEqual([len(frame) for frame in device.responses], [cost.response], name)
+
+    def test_projection(self):
+        projection = link_budget.project({"get_data": 100}, 115200)
+        service = 77 * 10 / 115200
+        self.assertAlmostEqual(projection.service_time, service)
+        self.assertAlmostEqual(projection.capacity, 115200 / 770)
+        self.assertAlmostEqual(projection.utilization, 100 * service)
+        self.assertAlmostEqual(projection.knee, 2 / (3 * service))
+        self.assertAlmostEqual(projection.latency(projection.knee), 2 * service)
+        self.assertEqual(projection.latency(projection.capacity), math.inf)
+        self.assertAlmostEqual(projection.bytes_sent, 600)
+        self.assertAlmostEqual(projection.bytes_received, 7100)
+
+    def test_mixed_projection(self):
+        fields = link_budget.CommandCost("get_data_fields", constants.CMD_GETDATAFIELDS, 2, 13)
+        projection = link_budget.project({"get_data": 50, "set_angle": 150, fields: 0}, 115200, turnaround=0.001)
+        get_data = 77 * 10 / 115200 + 0.001
+        set_angle = 25 * 10 / 115200 + 0.001
+        self.assertAlmostEqual(projection.service_time, (get_data + 3 * set_angle) / 4)
+        rates = projection.saturation_rates
+        self.assertAlmostEqual(rates["set_angle"], 3 * rates["get_data"])
+        self.assertAlmostEqual(sum(rates.values()), projection.capacity)
+        # Unequal service times queue worse than constant ones
+        self.assertLess(projection.knee * projection.service_time, 2 / 3)
+
+    def test_invalid_mix(self):
+        with self.assertRaises(ValueError):
+            link_budget.project({"get_data_fields": 10}, 115200)
+        with self.assertRaises(ValueError):
+            link_budget.project({"get_data": 0}, 115200)
+        with self.assertRaises(ValueError):
+            link_budget.project({"get_data": 10}, 0)
+
+    def test_sweep_saturates(self):
+        mix = {"get_data": 1}
+        capacity = link_budget.project(mix, 115200).capacity
+        light, heavy = link_budget.sweep(mix, 115200, loads=(0.2, 1.5), duration=0.5)
+
+        self.assertEqual(light.errors + heavy.errors, 0)
+        self.assertGreater(light.achieved, 0.5 * light.offered)
+        self.assertLess(link_budget.saturation([light, heavy]), 1.05 * capacity)
+        self.assertLess(heavy.achieved, 0.8 * heavy.offered)
+        self.assertIs(link_budget.latency_knee([light, heavy]), heavy)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from storm32_gimbal_control import export
+from storm32_gimbal_control import orientation
+from storm32_gimbal_control import simulator
+
+class TestOrientation(unittest.TestCase):
+    def setUp(self):
+        random = np.random.default_rng(7)
+        self.pitch = random.uniform(-89, 89, 1000)
+        self.roll = random.uniform(-179, 179, 1000)
+        self.yaw = random.uniform(-179, 179, 1000)
+
+    def test_single_axis_rotations(self):
+        np.testing.assert_allclose(orientation.euler_to_matrix(0, 0, 90) @ [1, 0, 0], [0, 1, 0], atol=1e-12)
+        np.testing.assert_allclose(orientation.euler_to_matrix(90, 0, 0) @ [1, 0, 0], [0, 0, -1], atol=1e-12)
+        np.testing.assert_allclose(orientation.euler_to_matrix(0, 90, 0) @ [0, 1, 0], [0, 0, 1], atol=1e-12)
+
+    def test_round_trips(self):
+        matrix = orientation.euler_to_matrix(self.pitch, self.roll, self.yaw)
+        quaternion = orientation.euler_to_quaternion(self.pitch, self.roll, self.yaw)
+
+        for angles in (orientation.matrix_to_euler(matrix), orientation.quaternion_to_euler(quaternion)):
+            np.testing.assert_allclose(angles, (self.pitch, self.roll, self.yaw), atol=1e-9)
+        np.testing.assert_allclose(orientation.quaternion_to_matrix(quaternion), matrix, atol=1e-12)
+
+        recovered = orientation.matrix_to_quaternion(matrix)
+        aligned = np.where(quaternion[:, :1] < 0, -quaternion, quaternion)
+        np.testing.assert_allclose(recovered, aligned, atol=1e-9)
+
+    def test_gimbal_lock(self):
+        pitch, roll, yaw = orientation.matrix_to_euler(orientation.euler_to_matrix(90, 30, 50))
+        self.assertAlmostEqual(float(pitch), 90)
+        self.assertEqual(float(roll), 0)
+        np.testing.assert_allclose(orientation.euler_to_matrix(pitch, roll, yaw),
+                                   orientation.euler_to_matrix(90, 30, 50), atol=1e-7)
+
+    def test_camera_transforms(self):
+        gimbal = orientation.euler_to_matrix(self.pitch, self.roll, self.yaw)
+        camera = orientation.gimbal_to_camera(gimbal, mount_pitch=90)
+        np.testing.assert_allclose(orientation.camera_to_gimbal(camera, mount_pitch=90), gimbal, atol=1e-12)
+
+        down = orientation.boresight(orientation.gimbal_to_camera(orientation.euler_to_matrix(0, 0, 45), mount_pitch=90))
+        np.testing.assert_allclose(down, [0, 0, -1], atol=1e-12)
+
+    def test_integrate_rates(self):
+        times = np.linspace(0, 2, 2001)
+        rates = np.tile([0.0, 0.0, 45.0], (len(times), 1))
+        yaw = orientation.quaternion_to_euler(orientation.integrate_rates(rates, times))[2]
+        np.testing.assert_allclose(yaw, 45 * times, atol=1e-9)
+
+        # Body rates about a tilted frame match step-by-step chaining
+        random = np.random.default_rng(3)
+        rates = random.normal(0, 100, (50, 3))
+        times = np.cumsum(random.uniform(0.001, 0.01, 50))
+        initial = orientation.euler_to_quaternion(10, 20, 30)
+        expected = [initial]
+        for rate, step in zip(rates[:-1], np.diff(times)):
+            rotation = np.radians(rate) * step
+            angle = np.linalg.norm(rotation)
+            delta = np.concatenate([[np.cos(angle / 2)], rotation / angle * np.sin(angle / 2)])
+            expected.append(orientation.quaternion_multiply(expected[-1], delta))
+        np.testing.assert_allclose(orientation.integrate_rates(rates, times, initial), expected, atol=1e-12)
+
+    def test_integrate_rates_edge_lengths(self):
+        with self.assertRaises(ValueError):
+            orientation.integrate_rates(np.empty((0, 3)), [])
+        initial = orientation.euler_to_quaternion(10, 20, 30)
+        np.testing.assert_allclose(orientation.integrate_rates([[1.0, 2.0, 3.0]], [0.5], initial), [initial])
+
+    def test_batches_from_samples_and_chunks(self):
+        samples = []
+        for index in range(5):
+            data = simulator.default_data()
+            data.imu1_pitch, data.imu1_roll, data.imu1_yaw = index * 10.0, -index * 5.0, index * 20.0
+            data.imu1_gyro = (index, 2 * index, -index)
+            samples.append(data)
+
+        records = np.zeros(len(samples), dtype=export.CHUNK_DTYPE)
+        for record, sample in zip(records, samples):
+            record["imu1_pitch"], record["imu1_roll"], record["imu1_yaw"] = orientation.sample_euler(sample)
+            record["imu1_gyro_x"], record["imu1_gyro_y"], record["imu1_gyro_z"] = sample.imu1_gyro
+
+        np.testing.assert_allclose(orientation.batch_to_quaternion(records), orientation.batch_to_quaternion(samples), atol=1e-6)
+        np.testing.assert_allclose(orientation.batch_to_matrix(samples)[3], orientation.sample_to_matrix(samples[3]))
+        np.testing.assert_allclose(orientation.batch_gyro(records, 0.5), orientation.batch_gyro(samples, 0.5))
+
+if __name__ == "__main__":
+    unittest.main()
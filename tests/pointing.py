@@ -0,0 +1,112 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import core
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import pointing
+from storm32_gimbal_control import replay
+from storm32_gimbal_control import simulator
+
+class ReadintoGimbal(simulator.SimulatedGimbal):
+    """Simulated gimbal that also offers readinto(), like a pyserial port."""
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+class TestPointingHandle(unittest.TestCase):
+    def test_frames_match_core_set_angle(self):
+        flags = models.SetAngleFlags.from_axes(pitch=True, roll=False, yaw=True)
+        reference = simulator.RecordingGimbal()
+        device = simulator.RecordingGimbal()
+        handle = pointing.PointingHandle(device, flags)
+
+        for pitch, roll, yaw in [(0, 0, 0), (-60.5, 45.25, 90), (12.345, -0.001, -179.9)]:
+            core.set_angle(reference, pitch, roll, yaw, flags)
+            self.assertEqual(handle.set_angle(pitch, roll, yaw), "SERIALRCCMD_ACK_OK")
+
+        self.assertEqual(device.writes, reference.writes)
+        self.assertEqual(device.data.imu1_yaw, -179.9)
+
+    def test_changing_flags(self):
+        reference = simulator.RecordingGimbal()
+        device = simulator.RecordingGimbal()
+        handle = pointing.PointingHandle(device)
+
+        handle.flags = models.SetAngleFlags.ROLL_LIMITED
+        handle.set_angle(1, 2, 3)
+        core.set_angle(reference, 1, 2, 3, models.SetAngleFlags.ROLL_LIMITED)
+
+        self.assertEqual(device.writes, reference.writes)
+        with self.assertRaises(ValueError):
+            handle.flags = 1
+
+    def test_error_ack(self):
+        device = simulator.SimulatedGimbal(timeout=0.1)
+        device.handle = lambda command, payload: simulator.build_ack(151)
+
+        with self.assertRaises(exceptions.AckError) as context:
+            pointing.PointingHandle(device).set_angle(0, 0, 0)
+
+        self.assertEqual(context.exception.code, 151)
+
+    def test_fire_and_forget(self):
+        device = simulator.SimulatedGimbal(timeout=0.1)
+        handle = pointing.PointingHandle(device, wait_for_ack=False)
+
+        self.assertIsNone(handle.set_angle(5, 0, 0))
+        self.assertEqual(handle.read_ack(), "SERIALRCCMD_ACK_OK")
+        self.assertEqual(handle.pending, 0)
+
+    def test_fire_and_forget_drains_acks(self):
+        device = simulator.SimulatedGimbal(timeout=0.1)
+        handle = pointing.PointingHandle(device, wait_for_ack=False)
+
+        for yaw in (1, 2, 3):
+            handle.set_angle(0, 0, yaw)
+        self.assertEqual(handle.pending, 1)
+        self.assertEqual(device.in_waiting, 6)
+
+        self.assertEqual(handle.drain(), 0)
+        self.assertEqual(device.in_waiting, 0)
+        self.assertIsInstance(core.get_data(device, 0, 0.1), models.DataStreamResponse)
+
+    def test_drain_counts_error_acks(self):
+        device = simulator.SimulatedGimbal(timeout=0.1)
+        device.expect(simulator.build_ack(151))
+        handle = pointing.PointingHandle(device, wait_for_ack=False)
+
+        handle.set_angle(0, 0, 0)
+        handle.set_angle(0, 0, 1)
+
+        self.assertEqual(handle.ack_errors, 1)
+        self.assertEqual(handle.drain(), 0)
+
+    def test_incomplete_ack_resyncs(self):
+        device = simulator.SimulatedGimbal(timeout=0.05)
+        device.expect(simulator.build_ack()[:3])
+        handle = pointing.PointingHandle(device)
+
+        with self.assertRaises(ValueError):
+            handle.set_angle(0, 0, 0)
+        self.assertEqual(handle.pending, 0)
+        self.assertEqual(handle.set_angle(0, 0, 1), "SERIALRCCMD_ACK_OK")
+
+    def test_wrapped_port_reads_through_wrapper(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "session.bin")
+            port = replay.RecordingTransport(ReadintoGimbal(timeout=0.1), path)
+            pointing.PointingHandle(port).set_angle(0, 0, 0)
+            port.close()
+
+            exchanges = replay.load_session(path).exchanges
+
+        self.assertEqual(exchanges[0].response, simulator.build_ack())
+
+if __name__ == "__main__":
+    unittest.main()
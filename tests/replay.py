@@ -0,0 +1,133 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dataclasses import replace
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import models
+from storm32_gimbal_control import replay
+from storm32_gimbal_control import simulator
+
+def run_session(port, pause: float = 0.0) -> list:
+    """The code under test: identify, poll, point, and read a parameter."""
+    results = [core.get_version(port, timeout=0.2)]
+    for _ in range(5):
+        results.append(core.get_data(port, 0, timeout=0.2).imu1_pitch)
+        time.sleep(pause)
+    results.append(core.set_angle(port, 10.0, 0.0, 0.0, models.SetAngleFlags(0), timeout=0.2))
+    results.append(core.get_parameter(port, 7, timeout=0.2))
+    return results
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "session.s32")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self, pause: float = 0.0) -> list:
+        device = simulator.SimulatedGimbal(timeout=0.2, parameters={7: 1234})
+        original_handle = device.handle
+        parameter_reads = []
+
+        def handle(command, payload):
+            if command == constants.CMD_GETDATA:
+                device.data = replace(device.data, imu1_pitch=round(device.data.imu1_pitch + 1.5, 2))
+            response = original_handle(command, payload)
+            if command == constants.CMD_GETPARAMETER and not parameter_reads:
+                # Line noise in front of the first answer
+                parameter_reads.append(command)
+                response = b"\x00\x07" + response
+            return response
+
+        device.handle = handle
+        device.inject(simulator.build_ack())
+        device.expect(None)  # The first GETVERSION is lost and retried
+
+        with replay.RecordingTransport(device, self.path) as port:
+            port.read(6)
+            results = run_session(port, pause)
+        return results
+
+    def test_session_pairs_requests_and_responses(self):
+        self.record()
+        session = replay.load_session(self.path)
+
+        commands = [exchange.command for exchange in session.exchanges]
+        self.assertEqual(commands, [None] + [constants.CMD_GETVERSION] * 2 + [constants.CMD_GETDATA] * 5
+                         + [constants.CMD_SETANGLE] + [constants.CMD_GETPARAMETER] * 2)
+        # The lost GETVERSION stays unanswered instead of taking its retry's response
+        self.assertEqual(session.exchanges[1].response, b"")
+        self.assertEqual(len(session.exchanges[2].response), 11)
+        self.assertTrue(all(len(exchange.response) == 71 for exchange in session.exchanges[3:8]))
+        # Only the bytes the host read before resyncing are kept
+        self.assertEqual(session.exchanges[9].response, b"\x00\x07\xfb")
+
+    def test_replay_reproduces_results(self):
+        recorded = self.record()
+        self.assertEqual(recorded[1:6], [1.5, 3.0, 4.5, 6.0, 7.5])
+        self.assertEqual(recorded[-1], 1234)
+
+        port = replay.ReplayTransport(self.path, speed=None, timeout=0.2)
+        self.assertEqual(port.read(6), simulator.build_ack())
+        self.assertEqual(run_session(port), recorded)
+        self.assertEqual(port.remaining, 0)
+        self.assertEqual(port.stats.unmatched, 0)
+        self.assertEqual(port.stats.payload_mismatches, 0)
+        self.assertEqual(port.stats.unsolicited, 1)
+
+    def test_unsolicited_frames_keep_their_place(self):
+        device = simulator.SimulatedGimbal(timeout=0.2)
+
+        def poll(port, inject: bool = False) -> list:
+            results = [core.get_data(port, 0, timeout=0.2).imu1_pitch for _ in range(3)]
+            if inject:
+                device.inject(simulator.build_ack(1))
+            results.append(port.read(6))
+            return results + [core.get_data(port, 0, timeout=0.2).imu1_pitch for _ in range(3)]
+
+        with replay.RecordingTransport(device, self.path) as port:
+            recorded = poll(port, inject=True)
+
+        port = replay.ReplayTransport(self.path, speed=None, timeout=0.2)
+        self.assertEqual(poll(port), recorded)
+        self.assertEqual(port.stats.unsolicited, 1)
+
+    def test_unmatched_requests_fall_back(self):
+        self.record()
+        port = replay.ReplayTransport(self.path, speed=None, timeout=0.05,
+                                      responder=lambda command, payload: simulator.build_ack())
+
+        self.assertEqual(core.set_standby(port, models.StandBySwitch.ON), "SERIALRCCMD_ACK_OK")
+        self.assertEqual(port.stats.unmatched_commands, {constants.CMD_SETSTANDBY: 1})
+        core.set_angle(port, 5.0, 0.0, 0.0, models.SetAngleFlags(0))
+        self.assertEqual(port.stats.payload_mismatches, 1)
+
+    def test_speed(self):
+        recorded = self.record(pause=0.03)
+        duration = replay.load_session(self.path).duration
+
+        for speed in (1.0, 4.0):
+            port = replay.ReplayTransport(self.path, speed=speed, timeout=0.5)
+            port.read(6)
+            start = time.monotonic()
+            self.assertEqual(run_session(port), recorded)
+            elapsed = time.monotonic() - start
+            self.assertGreater(elapsed, duration / speed * 0.7)
+            self.assertLess(elapsed, duration / speed * 1.3 + 0.05)
+            self.assertGreater(port.stats.throughput, 0)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as other:
+            other.write(b"not a session")
+        with self.assertRaises(ValueError):
+            replay.load_session(self.path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import core
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import transport
+
+VERSION_RESPONSE = bytes([0xFB, 0x06, 0x01, 0x60, 0x00, 0x01, 0x00, 0x02, 0x00, 0x00, 0x00])
+DATA_RESPONSE = bytes([0xFB, 0x42, 0x05, 0x00, 0x00]) + bytes(64) + bytes([0x00, 0x00])
+ACK_OK = bytes([0xFB, 0x01, 0x96, 0x00, 0x00, 0x00])
+ACK_FAIL = bytes([0xFB, 0x01, 0x96, 0x01, 0x00, 0x00])
+PARAMETER_RESPONSE = bytes([0xFB, 0x04, 0x03, 0x07, 0x00, 0x2A, 0x00, 0x00, 0x00])
+
+def make_port(*responses):
+    """Creates a port that answers each write with the next response, b"" for none."""
+    return transport.ScriptedTransport(responses, timeout=1)
+
+class TestRetry(unittest.TestCase):
+    def test_getter_retries_after_lost_response(self):
+        port = make_port(b"", VERSION_RESPONSE)
+
+        version = core.get_version(port, timeout=0.5)
+
+        self.assertEqual(version, models.VersionResponse(96, 1, 2))
+        self.assertEqual(len(port.received), 2)
+
+    def test_getter_resyncs_after_garbage(self):
+        port = make_port(b"\x00\x01\x02" + VERSION_RESPONSE, VERSION_RESPONSE)
+
+        version = core.get_version(port, timeout=0.5)
+
+        self.assertEqual(version.firmware_version, 96)
+        self.assertEqual(len(port.received), 2)
+
+    def test_setter_is_not_resent_after_error_ack(self):
+        port = make_port(ACK_FAIL, ACK_OK)
+
+        with self.assertRaises(exceptions.AckError) as context:
+            core.set_pan_mode(port, models.PanMode.OFF, timeout=0.5)
+
+        self.assertEqual(context.exception.code, 1)
+        self.assertEqual(len(port.received), 1)
+
+    def test_setter_is_resent_when_not_acked(self):
+        port = make_port(b"", ACK_OK)
+
+        self.assertEqual(core.set_pan_mode(port, models.PanMode.OFF, timeout=0.5), "SERIALRCCMD_ACK_OK")
+        self.assertEqual(len(port.received), 2)
+
+    def test_restore_all_parameters_never_retries(self):
+        port = make_port(b"", ACK_OK)
+
+        with self.assertRaises(exceptions.DeadlineExceeded):
+            core.restore_all_parameters(port, timeout=0.05)
+
+        self.assertEqual(len(port.received), 1)
+
+    def test_frame_length_comes_from_header(self):
+        port = make_port(DATA_RESPONSE)
+
+        start = time.monotonic()
+        data = core.get_data(port, 0, timeout=0.5)
+
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertEqual(data.state, 0)
+        self.assertEqual(len(port.received), 1)
+
+    def test_deadline_bounds_total_time(self):
+        port = make_port()
+
+        start = time.monotonic()
+        with self.assertRaises(exceptions.DeadlineExceeded):
+            core.get_data(port, 0, timeout=0.1)
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.15)
+        self.assertEqual(len(port.received), 3)
+        self.assertEqual(port.timeout, 1)
+
+    def test_stale_ack_is_skipped_by_getter(self):
+        port = make_port(DATA_RESPONSE)
+        # ACK of a setter that timed out earlier, arriving late
+        port.inject(ACK_OK)
+
+        data = core.get_data(port, 0, timeout=0.5)
+
+        self.assertIsInstance(data, models.DataStreamResponse)
+        self.assertEqual(len(port.received), 1)
+
+    def test_response_to_other_getter_is_skipped(self):
+        port = make_port(VERSION_RESPONSE + PARAMETER_RESPONSE)
+
+        self.assertEqual(core.get_parameter(port, 7, timeout=0.5), 42)
+
+    def test_getter_never_returns_other_response(self):
+        port = make_port(VERSION_RESPONSE, VERSION_RESPONSE, VERSION_RESPONSE)
+
+        with self.assertRaises(exceptions.DeadlineExceeded):
+            core.get_parameter(port, 7, timeout=0.1)
+
+    def test_last_failed_attempt_resyncs(self):
+        port = make_port(b"\x00\x01\x02" + ACK_OK)
+
+        with self.assertRaises(ValueError):
+            core.restore_all_parameters(port, timeout=0.5)
+
+        self.assertEqual(port.in_waiting, 0)
+
+    def test_single_attempt_without_timeout(self):
+        port = make_port()
+        port.timeout = 0.02
+
+        with self.assertRaises(ValueError):
+            core.get_version(port)
+
+        self.assertEqual(len(port.received), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import core
+from storm32_gimbal_control import models
+from storm32_gimbal_control import scheduler
+from storm32_gimbal_control import simulator
+
+Priority = models.CommandPriority
+
+def hold(command_scheduler):
+    """Keeps the worker of a running scheduler busy until the returned event is set, so jobs queue up."""
+    running, release = threading.Event(), threading.Event()
+    command_scheduler.submit(Priority.EMERGENCY, lambda port: (running.set(), release.wait(1)))
+    running.wait(1)
+    return release
+
+class TestCommandScheduler(unittest.TestCase):
+    def setUp(self):
+        self.device = simulator.SimulatedGimbal(timeout=0.1)
+
+    def test_urgent_work_overtakes_queued_work(self):
+        order = []
+        with scheduler.CommandScheduler(self.device) as command_scheduler:
+            release = hold(command_scheduler)
+            for index in range(3):
+                command_scheduler.submit(Priority.BULK, lambda port, i=index: order.append(f"bulk{i}"))
+            command_scheduler.submit(Priority.TELEMETRY, lambda port: order.append("telemetry"))
+            command_scheduler.submit(Priority.EMERGENCY, lambda port: order.append("emergency"))
+            release.set()
+            command_scheduler.submit(Priority.BULK, lambda port: None).result(1)
+
+        self.assertEqual(order, ["emergency", "telemetry", "bulk0", "bulk1", "bulk2"])
+
+    def test_runs_core_commands(self):
+        with scheduler.CommandScheduler(self.device) as command_scheduler:
+            ack = command_scheduler.call(Priority.EMERGENCY, core.set_standby, models.StandBySwitch.ON)
+            data = command_scheduler.call(Priority.TELEMETRY, core.get_data, 0)
+
+        self.assertEqual(ack, "SERIALRCCMD_ACK_OK")
+        self.assertIsInstance(data, models.DataStreamResponse)
+        self.assertEqual(command_scheduler.stats[Priority.TELEMETRY].executed, 1)
+
+    def test_keyed_jobs_replace_queued_setpoints(self):
+        flags = models.SetAngleFlags(0)
+        with scheduler.CommandScheduler(self.device) as command_scheduler:
+            release = hold(command_scheduler)
+            stale = command_scheduler.submit(Priority.CONTROL, core.set_angle, 1, 0, 0, flags, key="angle")
+            latest = command_scheduler.submit(Priority.CONTROL, core.set_angle, 2, 0, 0, flags, key="angle")
+            release.set()
+            latest.result(1)
+
+        self.assertTrue(stale.cancelled())
+        self.assertEqual(self.device.data.imu1_pitch, 2)
+        self.assertEqual(command_scheduler.stats[Priority.CONTROL].superseded, 1)
+
+    def test_rate_budget_defers_only_its_class(self):
+        order = []
+        with scheduler.CommandScheduler(self.device, {Priority.BULK: (20, 1)}) as command_scheduler:
+            release = hold(command_scheduler)
+            for index in range(2):
+                command_scheduler.submit(Priority.BULK, lambda port, i=index: order.append(f"bulk{i}"))
+            release.set()
+            time.sleep(0.01)
+            command_scheduler.submit(Priority.TELEMETRY, lambda port: order.append("telemetry")).result(1)
+            command_scheduler.submit(Priority.BULK, lambda port: None).result(1)
+
+        self.assertEqual(order, ["bulk0", "telemetry", "bulk1"])
+        self.assertGreater(command_scheduler.stats[Priority.BULK].max_delay, 0.03)
+
+    def test_refuses_work_it_cannot_run(self):
+        command_scheduler = scheduler.CommandScheduler(self.device)
+        with self.assertRaises(RuntimeError):
+            command_scheduler.submit(Priority.BULK, lambda port: None)
+
+        with command_scheduler:
+            release = hold(command_scheduler)
+            queued = command_scheduler.submit(Priority.BULK, lambda port: None)
+            stopping = threading.Thread(target=command_scheduler.stop)
+            stopping.start()
+            while command_scheduler._running:
+                time.sleep(0.001)
+            release.set()
+            stopping.join()
+
+        with self.assertRaises(RuntimeError):
+            queued.result(1)
+        with self.assertRaises(RuntimeError):
+            command_scheduler.call(Priority.BULK, lambda port: None)
+        with self.assertRaises(ValueError):
+            scheduler.CommandScheduler(self.device, {Priority.BULK: (0, 1)})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import multiprocessing
+import os
+import struct
+import sys
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import models
+from storm32_gimbal_control import shared_telemetry
+
+def uniform_stream(value: int) -> bytes:
+    """Data stream whose 32 fields all hold the same value."""
+    return struct.pack("<32h", *([value] * 32))
+
+def read_in_child(name, results):
+    with shared_telemetry.TelemetryReader(name) as reader:
+        received_at, sample = reader.read()
+        results.put((received_at, sample.state, reader.published))
+
+class TestSharedTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.name = f"storm32_test_{os.getpid()}"
+        self.publisher = shared_telemetry.TelemetryPublisher(self.name, history=4)
+        self.reader = shared_telemetry.TelemetryReader(self.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.publisher.close()
+
+    def test_latest_and_history(self):
+        self.assertIsNone(self.reader.read())
+
+        for value in range(6):
+            self.publisher.publish_raw(uniform_stream(value), float(value))
+
+        received_at, sample = self.reader.read()
+        self.assertIsInstance(sample, models.DataStreamResponse)
+        self.assertEqual((received_at, sample.state, sample.imu2_yaw), (5.0, 5, 0.05))
+        self.assertEqual(self.reader.published, 6)
+        self.assertEqual([t for t, _ in self.reader.read_history()], [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual([s.state for _, s in self.reader.read_history(2)], [4, 5])
+
+    def test_reads_are_never_torn(self):
+        stop = threading.Event()
+
+        def write():
+            value = 0
+            while not stop.is_set():
+                value = (value + 1) % 30000
+                self.publisher.publish_raw(uniform_stream(value), float(value))
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(20000):
+                latest = self.reader.read_raw()
+                if latest is None:
+                    continue
+                received_at, data_stream = latest
+                self.assertEqual(set(struct.unpack("<32h", data_stream)), {int(received_at)})
+        finally:
+            stop.set()
+            writer.join()
+
+    def test_other_process_reads(self):
+        self.publisher.publish(models.DataStreamResponse.from_data_stream(uniform_stream(7)), 1.5)
+
+        results = multiprocessing.Queue()
+        child = multiprocessing.Process(target=read_in_child, args=(self.name, results))
+        child.start()
+        child.join(10)
+
+        self.assertEqual(results.get(timeout=1), (1.5, 7, 1))
+        self.assertIsNotNone(self.reader.read())
+
+    def test_stalled_publisher_does_not_hang_readers(self):
+        self.publisher.publish_raw(uniform_stream(1), 1.0)
+        # Counter left odd, as by a publisher killed in the middle of a write
+        struct.pack_into("<Q", self.publisher.segment.buf, shared_telemetry.SEQUENCE_OFFSET, 3)
+        self.reader.stall_timeout = 0.01
+
+        with self.assertRaises(exceptions.DeadlineExceeded):
+            self.reader.read()
+        with self.assertRaises(exceptions.DeadlineExceeded):
+            self.reader.read_history()
+
+    def test_existing_segment_is_not_taken_over(self):
+        with self.assertRaises(FileExistsError):
+            shared_telemetry.TelemetryPublisher(self.name, history=4)
+        self.publisher.publish_raw(uniform_stream(2), 2.0)
+        self.assertEqual(self.reader.read_raw()[0], 2.0)
+
+        replacement = shared_telemetry.TelemetryPublisher(self.name, history=4, replace=True)
+        try:
+            with shared_telemetry.TelemetryReader(self.name) as reader:
+                self.assertIsNone(reader.read())
+        finally:
+            replacement.close()
+            # tearDown closes the original publisher, whose name is gone now
+            self.publisher.segment.close()
+            self.publisher.close = lambda: None
+
+if __name__ == "__main__":
+    unittest.main()
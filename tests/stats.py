@@ -0,0 +1,93 @@
+import unittest
+import os
+import random
+import statistics
+import sys
+from dataclasses import replace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import simulator
+from storm32_gimbal_control import stats
+
+class TestRollingStats(unittest.TestCase):
+    def test_matches_recomputation(self):
+        generator = random.Random(7)
+        rolling = stats.RollingStats(window=1.0, max_samples=1000)
+        history = []
+
+        now = 0.0
+        for _ in range(5000):
+            now += generator.uniform(0.001, 0.03)
+            value = float(generator.randint(-50, 50))
+            rolling.add(value, now)
+            history.append((now, value))
+
+            window = [v for t, v in history if t > now - 1.0]
+            summary = rolling.summary()
+            self.assertEqual(summary.count, len(window))
+            self.assertEqual((summary.minimum, summary.maximum), (min(window), max(window)))
+            self.assertAlmostEqual(summary.mean, statistics.fmean(window), places=6)
+            if len(window) > 1:
+                self.assertAlmostEqual(summary.stddev, statistics.stdev(window), places=6)
+
+    def test_memory_is_bounded(self):
+        rolling = stats.RollingStats(window=60.0, max_samples=10)
+        for index in range(100):
+            rolling.add(index, 0.0)
+
+        summary = rolling.summary()
+        self.assertEqual((summary.count, summary.minimum, summary.maximum), (10, 90, 99))
+
+class TestTelemetryAggregator(unittest.TestCase):
+    def test_windows_per_field(self):
+        aggregator = stats.TelemetryAggregator(windows=(1.0, 10.0))
+        sample = simulator.default_data()
+        for index in range(100):
+            aggregator.update(replace(sample, cycle_time=index, lipo_voltage=1200), index * 0.1)
+
+        summary = aggregator.summary()
+        self.assertEqual(summary["cycle_time"][1.0].count, 10)
+        self.assertEqual(summary["cycle_time"][1.0].minimum, 90)
+        self.assertEqual(summary["cycle_time"][10.0].count, 100)
+        self.assertEqual(summary["lipo_voltage"][10.0].stddev, 0.0)
+        self.assertIsNone(aggregator.summary(now=100.0)["i2c_errors"][1.0])
+
+class TestDownsampler(unittest.TestCase):
+    def test_averages_measurements_and_keeps_latest_state(self):
+        output = []
+        downsampler = stats.Downsampler(0.1, lambda sample, at: output.append((sample, at)))
+        sample = simulator.default_data()
+        for index in range(25):
+            downsampler.update(replace(sample, imu1_pitch=float(index), state=index), index * 0.01)
+
+        self.assertEqual(len(output), 2)
+        first, at = output[0]
+        self.assertAlmostEqual(at, 0.1)
+        self.assertEqual(first.imu1_pitch, 4.5)
+        self.assertEqual(first.state, 9)
+
+    def test_angles_average_on_the_circle(self):
+        output = []
+        downsampler = stats.Downsampler(0.1, lambda sample, at: output.append(sample))
+        sample = simulator.default_data()
+        for index in range(11):
+            yaw = 179.0 if index < 4 else -179.0
+            downsampler.update(replace(sample, imu1_yaw=yaw, imu2_yaw=yaw, pid_yaw=yaw), index * 0.01)
+
+        self.assertEqual(output[0].imu1_yaw, -179.8)
+        self.assertEqual(output[0].imu2_yaw, -179.8)
+        # PID outputs are not angles and keep the arithmetic mean
+        self.assertEqual(output[0].pid_yaw, -35.8)
+
+    def test_last_mode(self):
+        output = []
+        downsampler = stats.Downsampler(0.1, lambda sample, at: output.append(sample), mode="last")
+        sample = simulator.default_data()
+        for index in range(15):
+            downsampler.update(replace(sample, state=index), index * 0.01)
+
+        self.assertEqual([s.state for s in output], [9])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import os
+import struct
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from dataclasses import replace
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import simulator
+from storm32_gimbal_control import tracking
+
+class BiasedGimbal(simulator.SimulatedGimbal):
+    """Settles one degree short in pitch, like a gimbal fighting an unbalanced load."""
+    def __init__(self, delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+
+    def handle(self, command, payload):
+        if self.delay:
+            time.sleep(self.delay)
+        response = super().handle(command, payload)
+        if command == constants.CMD_SETANGLE:
+            self.data = replace(self.data, imu1_pitch=round(self.data.imu1_pitch - 1.0, 2))
+        return response
+
+def setpoints(device):
+    return [struct.unpack("<3f", payload[:12]) for command, payload in device.received
+            if command == constants.CMD_SETANGLE]
+
+class TestTrackingController(unittest.TestCase):
+    def test_feedforward(self):
+        device = simulator.SimulatedGimbal(timeout=0.1)
+        controller = tracking.TrackingController(device, period=0.01, poll_feedback=False,
+                                                 gains={"yaw": tracking.AxisGains(kp=0.0)})
+        controller.set_target(-10.0, 0.0, 179.0, yaw_rate=20.0, at=100.0)
+
+        pitch, roll, yaw = controller.step(100.1)
+
+        self.assertAlmostEqual(pitch, -10.0)
+        self.assertAlmostEqual(roll, 0.0)
+        # 179 + 20 deg/s * (0.1 s + 0.01 s lead), wrapped
+        self.assertAlmostEqual(yaw, -178.8, places=5)
+        self.assertEqual(len(setpoints(device)), 1)
+
+    def test_integral_removes_steady_error(self):
+        device = BiasedGimbal(timeout=0.1)
+        gains = {"pitch": tracking.AxisGains(kp=0.2, ki=20.0)}
+        # Generous exchange budgets: these tests check the control law, not timing
+        controller = tracking.TrackingController(device, period=0.01, gains=gains,
+                                                 feedback_timeout=0.1, command_timeout=0.1)
+        controller.set_target(20.0, 0.0, 0.0, at=0.0)
+
+        for tick in range(200):
+            controller.step(tick * 0.01)
+
+        self.assertAlmostEqual(device.data.imu1_pitch, 20.0, delta=0.05)
+        self.assertAlmostEqual(controller.setpoint[0], 21.0, delta=0.05)
+
+    def test_saturated_motor_freezes_integral(self):
+        device = BiasedGimbal(timeout=0.1, data=replace(simulator.default_data(), pid_pitch=50.0))
+        gains = {"pitch": tracking.AxisGains(kp=0.0, ki=20.0, pid_limit=40.0)}
+        # Generous exchange budgets: these tests check the control law, not timing
+        controller = tracking.TrackingController(device, period=0.01, gains=gains,
+                                                 feedback_timeout=0.1, command_timeout=0.1)
+        controller.set_target(20.0, 0.0, 0.0, at=0.0)
+
+        for tick in range(20):
+            controller.step(tick * 0.01)
+
+        self.assertEqual(controller.stats.saturated, 20)
+        self.assertAlmostEqual(controller.setpoint[0], 20.0)
+
+    def test_silent_link_does_not_stall(self):
+        device = simulator.SimulatedGimbal(timeout=1.0)
+        device.handle = lambda command, payload: b""
+        controller = tracking.TrackingController(device, period=0.01)
+        controller.set_target(5.0, 0.0, 0.0)
+
+        start = time.monotonic()
+        controller.step()
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.05)
+        self.assertEqual(controller.stats.feedback_errors, 1)
+        self.assertEqual(controller.stats.command_errors, 1)
+
+    def test_loop_timing_and_deadline_misses(self):
+        device = simulator.SimulatedGimbal(timeout=0.1)
+        with tracking.TrackingController(device, period=0.005) as controller:
+            time.sleep(0.2)
+        timing = controller.stats.timing()
+        self.assertGreater(controller.stats.iterations, 20)
+        self.assertAlmostEqual(timing["interval"].mean, 0.005, delta=0.002)
+        self.assertGreaterEqual(timing["busy"].count, 20)
+
+        slow = BiasedGimbal(delay=0.006, timeout=0.1)
+        controller = tracking.TrackingController(slow, period=0.005, feedback_timeout=0.05, command_timeout=0.05)
+        with controller:
+            time.sleep(0.1)
+        self.assertGreater(controller.stats.deadline_misses, 0)
+        self.assertGreaterEqual(controller.stats.skipped_ticks, controller.stats.deadline_misses)
+        self.assertGreater(controller.stats.max_busy, 0.01)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import constants
+from storm32_gimbal_control import core
+from storm32_gimbal_control import exceptions
+from storm32_gimbal_control import simulator
+from storm32_gimbal_control import transport
+
+class TestLoopback(unittest.TestCase):
+    def test_duplex(self):
+        host, device = transport.loopback_pair(timeout=0.5)
+        host.write(b"ping")
+        self.assertEqual(device.in_waiting, 4)
+        self.assertEqual(device.read(4), b"ping")
+
+        threading.Timer(0.02, device.write, (b"pong",)).start()
+        start = time.monotonic()
+        self.assertEqual(host.read(4), b"pong")
+        self.assertLess(time.monotonic() - start, 0.4)
+
+    def test_read_timeout(self):
+        host, device = transport.loopback_pair(timeout=0.05)
+        device.write(b"ab")
+
+        start = time.monotonic()
+        self.assertEqual(host.read(4), b"ab")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        host.timeout = 0
+        self.assertEqual(host.read(4), b"")
+        self.assertIsInstance(host, transport.Transport)
+
+class TestTransportWrapper(unittest.TestCase):
+    def test_delegates_to_wrapped_port(self):
+        device = simulator.SimulatedGimbal(timeout=0.5)
+        wrapper = transport.TransportWrapper(device)
+
+        wrapper.timeout = 0.2
+        self.assertEqual(device.timeout, 0.2)
+        self.assertIsInstance(wrapper, transport.Transport)
+        self.assertEqual(core.get_version(wrapper, timeout=0.5), device.version)
+        self.assertEqual(wrapper.in_waiting, 0)
+        self.assertEqual(len(wrapper.received), 1)
+
+class TestScriptedTransport(unittest.TestCase):
+    def test_script_then_responder(self):
+        port = transport.ScriptedTransport(timeout=0.1, responder=lambda command, payload: simulator.build_ack())
+        port.expect(simulator.build_ack(1), command=constants.CMD_SETPANMODE)
+        port.expect(lambda command, payload: simulator.build_response(command, payload + b"\x07\x00"))
+
+        with self.assertRaises(exceptions.AckError):
+            core.set_pan_mode(port, core.models.PanMode.OFF)
+        self.assertEqual(core.get_parameter(port, 5), 7)
+        self.assertEqual(core.set_standby(port, core.models.StandBySwitch.OFF), "SERIALRCCMD_ACK_OK")
+        self.assertEqual(port.unused, 0)
+        self.assertEqual([command for command, _ in port.received],
+                         [constants.CMD_SETPANMODE, constants.CMD_GETPARAMETER, constants.CMD_SETSTANDBY])
+
+    def test_silence_runs_into_deadline(self):
+        port = transport.ScriptedTransport([None], timeout=1.0)
+
+        start = time.monotonic()
+        with self.assertRaises(exceptions.DeadlineExceeded):
+            core.restore_all_parameters(port, timeout=0.05)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_unexpected_command(self):
+        port = transport.ScriptedTransport(timeout=0.1)
+        port.expect(simulator.build_ack(), command=constants.CMD_SETANGLE)
+
+        with self.assertRaises(AssertionError):
+            core.get_version(port)
+
+    def test_frames_split_across_writes(self):
+        port = transport.ScriptedTransport([simulator.build_ack()], timeout=0.1)
+        frame = bytes([0x00]) + bytes(core.utils.build_frame(constants.CMD_SETSTANDBY, [0x00]))
+        port.write(frame[:4])
+        self.assertEqual(port.received, [])
+        port.write(frame[4:])
+        self.assertEqual(port.received, [(constants.CMD_SETSTANDBY, b"\x00")])
+        self.assertEqual(port.read(6), simulator.build_ack())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+import threading
+import time
+from dataclasses import replace
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from storm32_gimbal_control import simulator
+from storm32_gimbal_control import triggers
+
+BASE = replace(simulator.default_data(), imu_acc_confidence=1.0)
+
+class TestTriggerEngine(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.record = lambda event: self.events.append((event.rule.name, event.active, event.time))
+
+    def run_engine(self, rules, samples):
+        engine = triggers.TriggerEngine(rules)
+        for index, sample in enumerate(samples):
+            engine.feed(sample, float(index))
+        engine.close()
+        return engine
+
+    def test_below_with_hysteresis(self):
+        rule = triggers.below("imu_acc_confidence", 0.5, self.record, hysteresis=0.1, on_clear=self.record, name="low")
+        values = [1.0, 0.4, 0.55, 0.45, 0.58, 0.61, 0.3]
+
+        self.run_engine([rule], [replace(BASE, imu_acc_confidence=v) for v in values])
+
+        self.assertEqual(self.events, [("low", True, 1.0), ("low", False, 5.0), ("low", True, 6.0)])
+
+    def test_debounce(self):
+        rule = triggers.outside("imu2_pitch", -10, 10, self.record, debounce=2.0, name="envelope")
+        values = [0, 20, 0, 20, 20, 20, 20]
+
+        engine = self.run_engine([rule], [replace(BASE, imu2_pitch=v) for v in values])
+
+        self.assertEqual(self.events, [("envelope", True, 5.0)])
+        self.assertTrue(engine.is_active("envelope"))
+
+    def test_edge_rules(self):
+        rules = [
+            triggers.changed("state", self.record, name="state"),
+            triggers.increased("i2c_errors", self.record, name="i2c"),
+        ]
+        samples = [replace(BASE, state=s, i2c_errors=e) for s, e in [(1, 0), (1, 0), (2, 1), (2, 1), (2, 3)]]
+
+        self.run_engine(rules, samples)
+
+        self.assertEqual(self.events, [("state", True, 2.0), ("i2c", True, 2.0), ("i2c", True, 4.0)])
+
+    def test_slow_callbacks_do_not_block_feeding(self):
+        release = threading.Event()
+        engine = triggers.TriggerEngine([triggers.changed("state", lambda event: release.wait(1))])
+
+        start = time.monotonic()
+        for index in range(100):
+            engine.feed(replace(BASE, state=index), float(index))
+        elapsed = time.monotonic() - start
+
+        release.set()
+        engine.close()
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(engine.stats["events"], 99)
+
+    def test_rejects_unknown_fields(self):
+        with self.assertRaises(ValueError):
+            triggers.TriggerEngine([triggers.changed("not_a_field", self.record)])
+
+    def test_rejects_rules_that_cannot_be_evaluated(self):
+        for rule in (triggers.above("imu1_pitch", float("inf"), self.record),
+                     triggers.outside("imu1_pitch", float("nan"), 10.0, self.record),
+                     triggers.below("imu1_pitch", 0.0, self.record, hysteresis=float("inf")),
+                     triggers.above("imu1_gyro", 10.0, self.record)):
+            with self.assertRaises(ValueError):
+                triggers.TriggerEngine([rule])
+
+if __name__ == "__main__":
+    unittest.main()